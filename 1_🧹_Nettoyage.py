@@ -1,39 +1,89 @@
 import streamlit as st
 import pandas as pd
+from exports import Deliverable, csv_bytes, offer_download
+from store import get_store, resolve, session_id
 
 st.title("Nettoyage & sélection (périmètre)")
 
-if "df" not in st.session_state or "dq" not in st.session_state:
+current = resolve(st.session_state)
+if current is None:
     st.warning("Retourne sur Home et lance le traitement.")
     st.stop()
 
-df = st.session_state["df"]
-dq = st.session_state["dq"]
+dataset, dq = current
+df = dataset.facts
+
+def profile_table(stage: str, source: str) -> pd.DataFrame:
+    # Profil par colonne (manquants, valeurs distinctes, mémoire); anciens rapports: manquants seuls
+    profile = getattr(dq, f"profile_{stage}").get(source)
+    if profile:
+        return pd.DataFrame.from_dict(profile, orient="index")
+    return pd.DataFrame.from_dict(getattr(dq, f"missing_{stage}")[source], orient="index", columns=["missing"])
 
 st.subheader("Rapport qualité (preuve attendue)")
 st.json({
     "rows_in": dq.rows_in,
     "rows_out": dq.rows_out,
     "duplicates_removed": dq.duplicates_removed,
+    "rejected": dq.rejected,
     "notes": dq.notes
 })
 
-st.subheader("Valeurs manquantes (avant)")
+validation = dq.validation  # vide pour les anciens snapshots
+if validation:
+    st.subheader("Contrôles de validation")
+    st.dataframe(pd.DataFrame(
+        [{"contrôle": r["label"], "source": r["source"], "anomalies": r["count"], "contrôlés": r["checked"]} for r in validation.values()]
+    ), use_container_width=True, hide_index=True)
+    with st.expander("Exemples de lignes en anomalie"):
+        for r in validation.values():
+            if r["samples"]:
+                st.caption(r["label"])
+                st.dataframe(pd.DataFrame(r["samples"]), use_container_width=True, hide_index=True)
+
+st.subheader("Valeurs manquantes & profil des colonnes (avant)")
 c1,c2,c3 = st.columns(3)
 with c1:
     st.caption("Leads")
-    st.dataframe(pd.DataFrame.from_dict(dq.missing_before["leads"], orient="index", columns=["missing"]))
+    st.dataframe(profile_table("before", "leads"))
 with c2:
     st.caption("CRM")
-    st.dataframe(pd.DataFrame.from_dict(dq.missing_before["crm"], orient="index", columns=["missing"]))
+    st.dataframe(profile_table("before", "crm"))
 with c3:
     st.caption("Campaigns")
-    st.dataframe(pd.DataFrame.from_dict(dq.missing_before["campaigns"], orient="index", columns=["missing"]))
+    st.dataframe(profile_table("before", "campaigns"))
+
+st.subheader("Valeurs manquantes & profil des colonnes (après)")
+st.dataframe(profile_table("after", "final"))
+
+st.subheader("Temps et mémoire par étape")
+if dq.stages:
+    stages = pd.DataFrame(dq.stages).rename(columns={
+        "stage": "étape", "rows_in": "lignes entrée", "rows_out": "lignes sortie", "seconds": "durée (s)", "peak_mb": "pic mémoire (Mo)",
+    })
+    st.dataframe(stages, use_container_width=True)
+    st.caption(f"Total : {stages['durée (s)'].sum():.2f} s — étapes en cache non rejouées lors des changements de périmètre.")
+else:
+    st.caption("Pas de mesures pour ce rapport (snapshot antérieur).")
+
+if dq.memory_bytes:
+    st.subheader("Empreinte mémoire du dataset")
+    memory = (pd.DataFrame(dq.memory_bytes) / 2**20).round(2).rename(columns={"before": "avant compactage (Mo)", "after": "après compactage (Mo)"})
+    st.dataframe(memory, use_container_width=True)
+    st.caption("Dimensions en catégories, entiers réduits au plus petit type; les valeurs et les exports CSV sont inchangés.")
 
-st.subheader("Valeurs manquantes (après)")
-st.dataframe(pd.DataFrame.from_dict(dq.missing_after["final"], orient="index", columns=["missing"]))
+store = get_store()
+usage, stats = store.session_usage(session_id()), store.stats()
+st.caption(
+    f"Mémoire partagée du serveur : {stats['datasets']} jeu(x) de données, {stats['used_bytes'] / 2**20:.1f} Mo "
+    f"+ {stats['cache_bytes'] / 2**20:.1f} Mo de caches intermédiaires sur {stats['budget_bytes'] / 2**20:.0f} Mo — cette session : {usage['bytes'] / 2**20:.1f} Mo référencés, "
+    f"{usage['attributed_bytes'] / 2**20:.1f} Mo imputés (partagés entre {stats['sessions']} session(s))."
+)
 
 st.subheader("Aperçu dataset final")
-st.dataframe(df.head(50), use_container_width=True)
+st.dataframe(dataset.wide(rows=50), use_container_width=True)
 
-st.download_button("Télécharger dataset final (CSV)", df.to_csv(index=False).encode("utf-8"), "leads_enrichis_clean.csv", "text/csv")
+offer_download(
+    st.session_state.get("dataset_version"),
+    Deliverable("Télécharger dataset final (CSV)", "leads_enrichis_clean.csv", "text/csv", lambda: csv_bytes(dataset.wide())),
+)
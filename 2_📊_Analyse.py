@@ -1,16 +1,29 @@
+import os
 import streamlit as st
 import plotly.express as px
 
-from src.analysis import compute_kpis_by_channel, freq, crosstab_percent, sector_client_rate
+from snapshot import list_snapshots, load_snapshot
+from store import publish, resolve
+from analysis import compute_kpis_by_channel, freq, crosstab_percent, sector_client_rate, rollup_for
 
 st.title("Analyse statistique (univariée & bivariée)")
 
-if "df" not in st.session_state:
+current = resolve(st.session_state)
+if current is None:
+    snapshots = list_snapshots()
+    if snapshots:
+        choice = st.selectbox("Ou ouvrir un snapshot enregistré", snapshots)
+        if st.button("📂 Ouvrir le snapshot"):
+            publish(st.session_state, os.path.basename(choice), load_snapshot(choice))
+            st.session_state["dataset_version"] = os.path.basename(choice)
+            st.rerun()
     st.warning("Retourne sur Home et lance le traitement.")
     st.stop()
 
-df = st.session_state["df"]
-kpi = compute_kpis_by_channel(df)
+dataset, _ = current
+df = dataset.facts
+cube = rollup_for(df, st.session_state.get("dataset_version"), dataset.campaigns)
+kpi = compute_kpis_by_channel(cube)
 
 st.subheader("Univariée — quantitatives (campagnes)")
 st.dataframe(kpi, use_container_width=True)
@@ -19,22 +32,22 @@ st.subheader("Univariée — qualitatives (fréquences)")
 c1,c2,c3 = st.columns(3)
 with c1:
     st.caption("Device")
-    st.dataframe(freq(df, "device"))
+    st.dataframe(freq(cube, "device"))
 with c2:
     st.caption("Status")
-    st.dataframe(freq(df, "status"))
+    st.dataframe(freq(cube, "status"))
 with c3:
     st.caption("Company size")
-    st.dataframe(freq(df, "company_size"))
+    st.dataframe(freq(cube, "company_size"))
 
 st.subheader("Bivariée — croisements métier")
 st.caption("Channel × Status (%, par canal)")
-st.dataframe(crosstab_percent(df, "channel", "status"), use_container_width=True)
+st.dataframe(crosstab_percent(cube, "channel", "status"), use_container_width=True)
 
 st.caption("Company size × Status (%, par taille)")
 if df["company_size"].notna().any():
-    st.dataframe(crosstab_percent(df, "company_size", "status"), use_container_width=True)
+    st.dataframe(crosstab_percent(cube, "company_size", "status"), use_container_width=True)
 
 st.caption("Sector × %Clients")
 if df["sector"].notna().any():
-    st.dataframe(sector_client_rate(df), use_container_width=True)
+    st.dataframe(sector_client_rate(cube), use_container_width=True)
@@ -1,27 +1,54 @@
 import streamlit as st
 import plotly.express as px
-from src.analysis import compute_kpis_by_channel
+from analysis import compute_kpis_by_channel, channel_status_counts, clients_by, rollup_for
+from charts import Chart, chart_data, show_chart
+from store import resolve
+from timeseries import WINDOWS, kpi_series
 
 st.title("Graphiques (3 à 6) — questions métier")
 
-if "df" not in st.session_state:
+current = resolve(st.session_state)
+if current is None:
     st.warning("Retourne sur Home et lance le traitement.")
     st.stop()
 
-df = st.session_state["df"]
-kpi = compute_kpis_by_channel(df)
+dataset, _ = current
+df = dataset.facts
+version = st.session_state.get("dataset_version")
+cube = rollup_for(df, version, dataset.campaigns)
 
-st.plotly_chart(px.bar(kpi, x="channel", y="CTR", title="CTR par canal — Quel canal capte le mieux l’attention ?"), use_container_width=True)
-st.plotly_chart(px.bar(kpi, x="channel", y="CPL", title="CPL par canal — Quel canal est le plus rentable ?"), use_container_width=True)
+show_chart(version, Chart("graphiques.ctr", lambda: compute_kpis_by_channel(cube), lambda d: px.bar(d, x="channel", y="CTR", title="CTR par canal — Quel canal capte le mieux l’attention ?")))
+show_chart(version, Chart("graphiques.cpl", lambda: compute_kpis_by_channel(cube), lambda d: px.bar(d, x="channel", y="CPL", title="CPL par canal — Quel canal est le plus rentable ?")))
 
-dist = df.groupby(["channel","status"]).size().reset_index(name="count")
-st.plotly_chart(px.bar(dist, x="channel", y="count", color="status", barmode="stack",
-                       title="Qualité des leads — Statut (MQL/SQL/Client) par canal"), use_container_width=True)
+# Trends: daily and trailing 7/28-day KPIs per channel or campaign (older snapshots have no daily data)
+if dataset.daily is not None and len(dataset.daily):
+    TREND_KPIS = {"CTR": "CTR", "conversion_rate": "Taux de conversion", "CPL": "CPL"}
+    LEVELS = {"channel": "Canal", "campaign_id": "Campagne"}
+    c1, c2, c3 = st.columns(3)
+    kpi_name = c1.selectbox("Indicateur", list(TREND_KPIS), format_func=TREND_KPIS.get)
+    window = c2.radio("Fenêtre", WINDOWS, format_func=lambda w: "jour" if w == 1 else f"{w} j glissants", horizontal=True)
+    level = c3.radio("Niveau", list(LEVELS), format_func=LEVELS.get, horizontal=True)
+    series = chart_data(version, Chart(f"graphiques.series.{level}", lambda: kpi_series(dataset.daily, level), lambda d: None))
+    picked = []
+    if level == "campaign_id":
+        by_cost = dataset.daily.groupby("campaign_id")["cost"].sum().sort_values(ascending=False).index.tolist()
+        picked = st.multiselect("Campagnes (les 5 plus coûteuses par défaut)", by_cost, default=by_cost[:5])
+    column = f"{kpi_name}_{window}d"
+    label = "par jour" if window == 1 else f"sur {window} jours glissants"
+    show_chart(version, Chart(
+        "graphiques.trend",
+        lambda: series[series["campaign_id"].isin(picked)] if picked else series,
+        lambda d: px.line(d, x="date", y=column, color=level, title=f"{TREND_KPIS[kpi_name]} {label} par {LEVELS[level].lower()} — Tendance"),
+    ), {"kpi": kpi_name, "window": window, "level": level, "campaigns": picked})
+
+show_chart(version, Chart("graphiques.status", lambda: channel_status_counts(cube), lambda d: px.bar(
+    d, x="channel", y="count", color="status", barmode="stack",
+    title="Qualité des leads — Statut (MQL/SQL/Client) par canal")))
 
 if df["sector"].notna().any():
-    cs = df[df["status"]=="Client"].groupby("sector").size().reset_index(name="clients").sort_values("clients", ascending=False)
-    st.plotly_chart(px.bar(cs, x="sector", y="clients", title="Clients par secteur — Quels segments prioriser ?"), use_container_width=True)
+    show_chart(version, Chart("graphiques.sector", lambda: clients_by(cube, "sector").reset_index(), lambda d: px.bar(
+        d, x="sector", y="clients", title="Clients par secteur — Quels segments prioriser ?")))
 
 if df["region"].notna().any():
-    cr = df[df["status"]=="Client"].groupby("region").size().reset_index(name="clients").sort_values("clients", ascending=False)
-    st.plotly_chart(px.bar(cr, x="region", y="clients", title="Clients par région — Où concentrer la prospection ?"), use_container_width=True)
+    show_chart(version, Chart("graphiques.region", lambda: clients_by(cube, "region").reset_index(), lambda d: px.bar(
+        d, x="region", y="clients", title="Clients par région — Où concentrer la prospection ?")))
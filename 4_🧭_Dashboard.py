@@ -1,26 +1,51 @@
+import os
 import streamlit as st
 import plotly.express as px
-from src.analysis import compute_kpis_by_channel, crm_kpis
+from snapshot import list_snapshots, load_snapshot
+from store import publish, resolve
+from bitmaps import bitmap_index_for, selection_kpis
+from charts import Chart, show_chart
 
 st.title("Dashboard décisionnel (3 à 6 KPI max)")
 
-if "df" not in st.session_state:
+current = resolve(st.session_state)
+if current is None:
+    snapshots = list_snapshots()
+    if snapshots:
+        choice = st.selectbox("Ou ouvrir un snapshot enregistré", snapshots)
+        if st.button("📂 Ouvrir le snapshot"):
+            publish(st.session_state, os.path.basename(choice), load_snapshot(choice))
+            st.session_state["dataset_version"] = os.path.basename(choice)
+            st.rerun()
     st.warning("Retourne sur Home et lance le traitement.")
     st.stop()
 
-df = st.session_state["df"]
-kpi = compute_kpis_by_channel(df)
-ck = crm_kpis(df)
+dataset, _ = current
+df = dataset.facts
+version = st.session_state.get("dataset_version")
+index = bitmap_index_for(df, version)
+
+# Drill-down: values OR-ed within a dimension, dimensions AND-ed; nothing selected = no filter
+FILTER_LABELS = {"channel": "Canal", "region": "Région", "sector": "Secteur", "company_size": "Taille entreprise", "device": "Appareil", "status": "Statut"}
+st.sidebar.subheader("Filtres")
+filters = {}
+for dim, label in FILTER_LABELS.items():
+    chosen = st.sidebar.multiselect(label, index.values(dim), key=f"dashboard_{dim}")
+    if chosen:
+        filters[dim] = chosen
+
+sel = selection_kpis(index, index.select(filters), dataset.campaigns)
+kpi = sel["kpi_by_channel"]
 
 # KPI cards (max 6)
 c1,c2,c3,c4,c5,c6 = st.columns(6)
-c1.metric("Leads", f"{ck['total_leads']:,}".replace(","," "))
-c2.metric("Clients", f"{ck['clients']:,}".replace(","," "))
-c3.metric("% Clients", f"{ck['client_rate']*100:.1f}%")
-c4.metric("CTR (meilleur canal)", f"{(kpi['CTR'].max()*100):.1f}%")
-c5.metric("CPL (meilleur canal)", f"{kpi['CPL'].min():.2f}")
-c6.metric("Canal + rentable", kpi.sort_values("CPL").iloc[0]["channel"])
+c1.metric("Leads", f"{sel['total_leads']:,}".replace(","," "))
+c2.metric("Clients", f"{sel['clients']:,}".replace(","," "))
+c3.metric("% Clients", f"{sel['client_rate']*100:.1f}%")
+c4.metric("CTR (meilleur canal)", f"{(kpi['CTR'].max()*100):.1f}%" if len(kpi) else "—")
+c5.metric("CPL (meilleur canal)", f"{kpi['CPL'].min():.2f}" if len(kpi) else "—")
+c6.metric("Canal + rentable", kpi.sort_values("CPL").iloc[0]["channel"] if len(kpi) else "—")
 
 st.divider()
-st.plotly_chart(px.bar(kpi, x="channel", y="CPL", title="CPL par canal"), use_container_width=True)
-st.plotly_chart(px.bar(kpi, x="channel", y="conversion_rate", title="Taux de conversion par canal"), use_container_width=True)
+show_chart(version, Chart("dashboard.cpl", lambda: kpi, lambda d: px.bar(d, x="channel", y="CPL", title="CPL par canal")), filters)
+show_chart(version, Chart("dashboard.conversion", lambda: kpi, lambda d: px.bar(d, x="channel", y="conversion_rate", title="Taux de conversion par canal")), filters)
@@ -1,18 +1,22 @@
-import io, json, zipfile
 import streamlit as st
 import pandas as pd
-from src.analysis import compute_kpis_by_channel, crm_kpis
+from analysis import compute_kpis_by_channel, crm_kpis, rollup_for
+from exports import Deliverable, csv_bytes, offer_download, offer_zip, report_json
+from store import resolve
 
 st.title("Exports (livrables)")
 
-if "df" not in st.session_state or "dq" not in st.session_state:
+current = resolve(st.session_state)
+if current is None:
     st.warning("Retourne sur Home et lance le traitement.")
     st.stop()
 
-df = st.session_state["df"]
-dq = st.session_state["dq"]
-kpi = compute_kpis_by_channel(df)
-ck = crm_kpis(df)
+dataset, dq = current
+df = dataset.facts
+version = st.session_state.get("dataset_version")
+cube = rollup_for(df, version, dataset.campaigns)
+kpi = compute_kpis_by_channel(cube)
+ck = crm_kpis(cube)
 
 best_cpl = kpi.sort_values("CPL").iloc[0]["channel"] if len(kpi) else "—"
 best_ctr = kpi.sort_values("CTR", ascending=False).iloc[0]["channel"] if len(kpi) else "—"
@@ -43,34 +47,26 @@ Objectif: évaluer la performance par canal (CTR, taux de conversion, CPL) et la
 """.strip()
 
 carnet = pd.DataFrame([
-    {"Problème":"Dates hors périmètre", "Solution":"Filtrage Octobre 2025", "Justification":"Respect consigne."},
+    {"Problème":"Dates hors périmètre", "Solution":f"Filtrage {dq.period or 'sur le périmètre'}", "Justification":"Respect consigne."},
     {"Problème":"Doublons lead_id", "Solution":"Déduplication (leads) + meilleur statut (CRM)", "Justification":"Évite biais."},
     {"Problème":"Valeurs manquantes", "Solution":"Conserver NA + reporting", "Justification":"Traçabilité (pas suppression globale)."},
     {"Problème":"Catégories incohérentes", "Solution":"Normalisation", "Justification":"Agrégations fiables."},
     {"Problème":"Multiples campagnes", "Solution":"Agrégation par canal", "Justification":"KPI comparables."},
 ])
 
-st.download_button("Dataset nettoyé (CSV)", df.to_csv(index=False).encode("utf-8"), "leads_enrichis_clean.csv", "text/csv")
-st.download_button("KPI par canal (CSV)", kpi.to_csv(index=False).encode("utf-8"), "kpi_by_channel.csv", "text/csv")
-st.download_button("Note métier (MD)", note.encode("utf-8"), "note_analyse_metier.md", "text/markdown")
-st.download_button("Carnet technique (CSV)", carnet.to_csv(index=False).encode("utf-8"), "carnet_technique.csv", "text/csv")
+# Rien n'est sérialisé tant qu'un livrable n'est pas demandé; les octets sont ensuite réutilisés
+# pour cette version du dataset (boutons individuels et ZIP)
+deliverables = [
+    Deliverable("Dataset nettoyé (CSV)", "leads_enrichis_clean.csv", "text/csv", lambda: csv_bytes(dataset.wide())),
+    Deliverable("KPI par canal (CSV)", "kpi_by_channel.csv", "text/csv", lambda: csv_bytes(kpi)),
+    Deliverable("Note métier (MD)", "note_analyse_metier.md", "text/markdown", lambda: note.encode("utf-8")),
+    Deliverable("Carnet technique (CSV)", "carnet_technique.csv", "text/csv", lambda: csv_bytes(carnet)),
+    Deliverable("Rapport qualité (JSON)", "rapport_qualite.json", "application/json", lambda: report_json(dq)),
+]
+for d in deliverables[:4]:
+    offer_download(version, d)
 
-buf = io.BytesIO()
-with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
-    z.writestr("exports/leads_enrichis_clean.csv", df.to_csv(index=False))
-    z.writestr("exports/kpi_by_channel.csv", kpi.to_csv(index=False))
-    z.writestr("exports/note_analyse_metier.md", note)
-    z.writestr("exports/carnet_technique.csv", carnet.to_csv(index=False))
-    z.writestr("exports/rapport_qualite.json", json.dumps({
-        "rows_in": dq.rows_in,
-        "rows_out": dq.rows_out,
-        "duplicates_removed": dq.duplicates_removed,
-        "missing_before": dq.missing_before,
-        "missing_after": dq.missing_after,
-        "notes": dq.notes,
-    }, ensure_ascii=False, indent=2))
-
-st.download_button("Tout exporter (ZIP)", buf.getvalue(), "novaretail_livrables.zip", "application/zip")
+offer_zip(version, deliverables, "Tout exporter (ZIP)", "novaretail_livrables.zip")
 
 st.subheader("Prévisualisation — note métier")
 st.code(note, language="markdown")
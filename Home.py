@@ -5,6 +5,7 @@
 
 import os
 import sys
+import uuid
 
 # --- FIX IMPORT PATH (OBLIGATOIRE POUR STREAMLIT CLOUD) ---
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,8 +17,16 @@ import streamlit as st
 import pandas as pd
 
 # --- IMPORTS PROJET ---
-from data_prep import load_raw_from_uploads, clean_and_prepare
-from analysis import compute_kpis
+from cache import content_hash
+from data_prep import (
+    DEFAULT_MONTH, IncrementalDataset, available_months, custom_period,
+    load_and_clean_cached, load_delta_from_uploads, load_raw_from_uploads,
+    month_period, prepare_cached, quarter_period, week_period
+)
+from snapshot import save_snapshot
+from store import get_store, publish, resolve
+from uploads import hold, spool_uploads
+from analysis import compute_kpis, rollup_for
 
 # ---------------------
 # CONFIG STREAMLIT
@@ -59,6 +68,12 @@ crm_file = st.sidebar.file_uploader(
     key="crm"
 )
 
+stream_leads = st.sidebar.checkbox(
+    "Lecture des leads par blocs (gros fichiers)",
+    value=False,
+    key="stream_leads"
+)
+
 # ---------------------
 # CONTROLE UPLOAD
 # ---------------------
@@ -71,31 +86,116 @@ if not (leads_file and campaign_file and crm_file):
     )
     st.stop()
 
+# Fichiers écrits une fois sur disque (dossier temporaire de la session) puis lus depuis le disque
+sources = spool_uploads(st.session_state, leads=leads_file, campaigns=campaign_file, crm=crm_file)
+
 # ---------------------
-# CHARGEMENT DONNÉES
+# PÉRIMÈTRE (mois, semaine, trimestre ou dates libres)
 # ---------------------
-with st.spinner("📥 Chargement des fichiers..."):
-    raw_data = load_raw_from_uploads(
-        leads_file=leads_file,
-        campaign_file=campaign_file,
-        crm_file=crm_file
-    )
+st.sidebar.header("🗓️ Périmètre")
 
-st.success("✅ Fichiers chargés avec succès")
+if stream_leads:
+    # La lecture par blocs filtre à la lecture : pas d'index complet pour lister les mois
+    months = [DEFAULT_MONTH]
+else:
+    prepared, _ = prepare_cached(*sources)
+    months = available_months(prepared.leads) or [DEFAULT_MONTH]
 
-# ---------------------
-# NETTOYAGE / PRÉPARATION
-# ---------------------
-with st.spinner("🧹 Nettoyage et préparation des données..."):
-    df_clean = clean_and_prepare(raw_data)
+granularity = st.sidebar.selectbox(
+    "Type de période",
+    ["Mois", "Semaine", "Trimestre", "Personnalisé"],
+    key="period_kind"
+)
+default_day = pd.Timestamp(DEFAULT_MONTH if DEFAULT_MONTH in months else months[-1]).date()
+
+if granularity == "Mois":
+    month = st.sidebar.selectbox(
+        "Mois",
+        months,
+        index=months.index(DEFAULT_MONTH) if DEFAULT_MONTH in months else len(months) - 1
+    )
+    period = month_period(month)
+elif granularity == "Semaine":
+    period = week_period(st.sidebar.date_input("Jour de la semaine", value=default_day))
+elif granularity == "Trimestre":
+    quarters = sorted({str(pd.Period(m, freq="Q")) for m in months})
+    period = quarter_period(st.sidebar.selectbox("Trimestre", quarters, index=len(quarters) - 1))
+else:
+    start = st.sidebar.date_input("Du", value=default_day)
+    end = st.sidebar.date_input("Au", value=max(start, default_day))
+    if end < start:
+        st.sidebar.error("La date de fin doit suivre la date de début.")
+        st.stop()
+    period = custom_period(start, end)
+
+# ---------------------
+# CHARGEMENT + NETTOYAGE (cache par contenu des fichiers)
+# ---------------------
+with st.spinner("📥 Chargement et 🧹 nettoyage des données..."):
+    dataset, dq, dataset_version = load_and_clean_cached(
+        *sources,
+        period=period,
+        stream_leads=stream_leads
+    )
 
-st.success("✅ Données prêtes à l’analyse")
+# ---------------------
+# AJOUT INCRÉMENTAL (extractions quotidiennes)
+# ---------------------
+st.sidebar.header("➕ Ajout incrémental")
+
+delta_leads = st.sidebar.file_uploader("Nouveaux leads (CSV)", type=["csv"], key="delta_leads")
+delta_campaign = st.sidebar.file_uploader("Nouvelles campagnes (JSON)", type=["json"], key="delta_campaign")
+delta_crm = st.sidebar.file_uploader("Mises à jour CRM (Excel)", type=["xlsx"], key="delta_crm")
+
+# L'historique est dans le store partagé (compté dans son budget) ; la session n'en garde qu'une référence
+incremental = resolve(st.session_state, "incremental")
+if incremental is not None and incremental.base != dataset_version:
+    # Autres fichiers ou autre période : l'historique repart des fichiers de base
+    st.session_state.pop("incremental_handle", None)
+    incremental = None
+
+# Extraits écrits sur disque comme les fichiers de base, gardés le temps de leur lecture
+delta_files = spool_uploads(st.session_state, delta_leads=delta_leads, delta_campaigns=delta_campaign, delta_crm=delta_crm)
+if st.sidebar.button("Ajouter à l’historique", disabled=not any(delta_files)):
+    with st.spinner("➕ Ajout des nouvelles lignes..."):
+        if incremental is None:
+            incremental = IncrementalDataset(
+                *load_raw_from_uploads(*sources),
+                period=period,
+                digest=dataset_version
+            )
+            publish(st.session_state, f"incremental:{uuid.uuid4().hex}", incremental, slot="incremental")
+        release = hold(*delta_files)
+        try:
+            new_leads, new_campaigns, new_crm = load_delta_from_uploads(*delta_files)
+        finally:
+            release()
+        delta_digest = content_hash(*(f.digest if f else None for f in delta_files))
+        if not incremental.append(new_leads, new_crm, new_campaigns, digest=delta_digest):
+            st.sidebar.info("Ces fichiers ont déjà été ajoutés.")
+        get_store().refresh(st.session_state["incremental_handle"].key)
+
+if incremental is not None:
+    dataset, dq = incremental.build()
+    dataset_version = incremental.version
+    st.sidebar.caption(f"{len(incremental.applied)} lot(s) ajouté(s) à l’historique")
+
+# Process-wide store keyed by content: sessions on the same files share one copy and keep a handle
+dataset, dq = publish(st.session_state, dataset_version, (dataset, dq))
+st.session_state["dataset_version"] = dataset_version
+df_clean = dataset.facts
+
+st.success(f"✅ Données prêtes à l’analyse — périmètre : {period.label}")
+
+if st.sidebar.button("💾 Sauvegarder un snapshot", help="Dataset nettoyé (Arrow) + rapport qualité, réouvrables sans les fichiers bruts"):
+    path = save_snapshot(dataset, dq, dataset_version[:16])
+    st.sidebar.success(f"Snapshot enregistré : {path}")
 
 # ---------------------
 # APERÇU DES DONNÉES
 # ---------------------
 with st.expander("🔍 Aperçu des données préparées", expanded=False):
-    st.dataframe(df_clean.head(20), use_container_width=True)
+    st.dataframe(dataset.wide(rows=20), use_container_width=True)
     st.write(f"**Nombre de lignes :** {len(df_clean)}")
 
 # ---------------------
@@ -103,7 +203,8 @@ with st.expander("🔍 Aperçu des données préparées", expanded=False):
 # ---------------------
 st.markdown("## 🎯 Indicateurs clés (KPI)")
 
-kpis = compute_kpis(df_clean)
+cube = rollup_for(df_clean, dataset_version, dataset.campaigns)
+kpis = compute_kpis(cube)
 
 c1, c2, c3, c4 = st.columns(4)
 
@@ -1,21 +1,68 @@
 from __future__ import annotations
 import pandas as pd
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
 
-def compute_kpis_by_channel(df: pd.DataFrame) -> pd.DataFrame:
-    ch = df.drop_duplicates(subset=["channel"])[["channel","cost","impressions","clicks","conversions"]].copy()
+from cache import CACHE_BUDGET_BYTES, stage_cache
+
+CUBE_DIMENSIONS = ["channel", "status", "device", "region", "sector", "company_size"]
+CAMPAIGN_MEASURES = ["cost", "impressions", "clicks", "conversions"]
+
+@dataclass
+class RollupCube:
+    counts: pd.DataFrame
+    campaigns: pd.DataFrame
+    dimensions: List[str]
+    total: int
+
+def build_rollup(df: pd.DataFrame, campaigns: Optional[pd.DataFrame] = None) -> RollupCube:
+    # One lead count per observed combination of dimensions (NA kept), in first-appearance order
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    counts = df.groupby(dims, dropna=False, sort=False, observed=True).size().reset_index(name="count")
+    if campaigns is None:
+        # Wide frame: campaign measures are repeated on every lead row
+        campaigns = df.drop_duplicates(subset=["channel"])[["channel"] + CAMPAIGN_MEASURES]
+    else:
+        # Star layout: channels in lead order, measures looked up in the campaign dimension
+        dim = campaigns.drop_duplicates(subset=["channel"]).set_index("channel")[CAMPAIGN_MEASURES]
+        campaigns = df.drop_duplicates(subset=["channel"])[["channel"]].join(dim, on="channel")
+    return RollupCube(counts, campaigns, dims, len(df))
+
+def rollup_for(df: pd.DataFrame, version: Optional[str] = None, campaigns: Optional[pd.DataFrame] = None) -> RollupCube:
+    if version is None:
+        return build_rollup(df, campaigns)
+    return stage_cache("rollup", maxsize=8, max_bytes=CACHE_BUDGET_BYTES).get_or_compute(version, lambda: build_rollup(df, campaigns))
+
+Data = Union[pd.DataFrame, RollupCube]
+
+def _cube(data: Data) -> RollupCube:
+    return data if isinstance(data, RollupCube) else build_rollup(data)
+
+def compute_kpis_by_channel(data: Data) -> pd.DataFrame:
+    ch = _cube(data).campaigns.copy()
     ch["CTR"] = ch["clicks"] / ch["impressions"]
     ch["conversion_rate"] = ch["conversions"] / ch["clicks"]
     ch["CPL"] = ch["cost"] / ch["conversions"]
     return ch.sort_values("CPL")
 
-def crm_kpis(df: pd.DataFrame) -> Dict[str, float]:
-    total = len(df)
-    clients = int((df["status"]=="Client").sum())
-    sql = int((df["status"]=="SQL").sum())
-    mql = int((df["status"]=="MQL").sum())
-    lost = int((df["status"]=="Lost").sum())
-    unknown = int(df["status"].isna().sum())
+def compute_kpis(data: Data) -> Dict[str, float]:
+    tot = _cube(data).campaigns[CAMPAIGN_MEASURES].sum()
+    return {
+        "ctr": float(tot["clicks"] / tot["impressions"]) if tot["impressions"] else 0.0,
+        "conversion_rate": float(tot["conversions"] / tot["clicks"]) if tot["clicks"] else 0.0,
+        "cpl": float(tot["cost"] / tot["conversions"]) if tot["conversions"] else 0.0,
+        "conversions": float(tot["conversions"]),
+    }
+
+def crm_kpis(data: Data) -> Dict[str, float]:
+    cube = _cube(data)
+    by_status = cube.counts.groupby("status", dropna=False, observed=True)["count"].sum()
+    total = cube.total
+    clients = int(by_status.get("Client", 0))
+    sql = int(by_status.get("SQL", 0))
+    mql = int(by_status.get("MQL", 0))
+    lost = int(by_status.get("Lost", 0))
+    unknown = int(cube.counts.loc[cube.counts["status"].isna(), "count"].sum())
     return {
         "total_leads": total,
         "clients": clients,
@@ -26,19 +73,35 @@ def crm_kpis(df: pd.DataFrame) -> Dict[str, float]:
         "client_rate": clients/total if total else 0.0
     }
 
-def freq(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    s = df[col].fillna("NA")
-    out = s.value_counts(dropna=False).rename("count").to_frame()
+def freq(data: Data, col: str) -> pd.DataFrame:
+    counts = _cube(data).counts
+    # Categorical dimensions have no "NA" category: fill on the plain values
+    s = counts[col].astype(object).fillna("NA")
+    out = counts["count"].groupby(s, sort=False).sum().sort_values(ascending=False).rename("count").to_frame()
     out["percent"] = out["count"] / out["count"].sum()
     return out
 
-def crosstab_percent(df: pd.DataFrame, a: str, b: str) -> pd.DataFrame:
-    return (pd.crosstab(df[a], df[b], normalize="index").fillna(0) * 100).round(1)
+def crosstab_percent(data: Data, a: str, b: str) -> pd.DataFrame:
+    counts = _cube(data).counts.dropna(subset=[a, b])
+    table = counts.pivot_table(index=a, columns=b, values="count", aggfunc="sum", fill_value=0, observed=True)
+    table = table.div(table.sum(axis=1), axis=0)
+    return (table.fillna(0) * 100).round(1)
+
+def channel_status_counts(data: Data) -> pd.DataFrame:
+    counts = _cube(data).counts.dropna(subset=["channel", "status"])
+    return counts.groupby(["channel", "status"], observed=True)["count"].sum().reset_index(name="count")
+
+def clients_by(data: Data, col: str) -> pd.DataFrame:
+    counts = _cube(data).counts
+    clients = counts[counts["status"].eq("Client")]
+    return clients.groupby(col, observed=True)["count"].sum().sort_values(ascending=False).rename("clients").to_frame()
 
-def sector_client_rate(df: pd.DataFrame) -> pd.DataFrame:
-    tmp = df.copy()
-    tmp["is_client"] = tmp["status"].eq("Client")
-    return (tmp.groupby("sector")["is_client"].mean().sort_values(ascending=False) * 100).to_frame("%Clients").round(1)
+def sector_client_rate(data: Data) -> pd.DataFrame:
+    counts = _cube(data).counts
+    total = counts.groupby("sector", observed=True)["count"].sum()
+    clients = counts[counts["status"].eq("Client")].groupby("sector", observed=True)["count"].sum()
+    rate = clients.reindex(total.index, fill_value=0) / total
+    return (rate.sort_values(ascending=False) * 100).to_frame("%Clients").round(1)
 
-def region_clients(df: pd.DataFrame) -> pd.DataFrame:
-    return df[df["status"].eq("Client")].groupby("region").size().sort_values(ascending=False).rename("clients").to_frame()
+def region_clients(data: Data) -> pd.DataFrame:
+    return clients_by(data, "region")
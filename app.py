@@ -1,403 +1,548 @@
-import io
-import json
-import zipfile
-from datetime import datetime
-
-import numpy as np
-import pandas as pd
-import streamlit as st
-import plotly.express as px
-
-# =========================
-# CONFIG
-# =========================
-st.set_page_config(page_title="NovaRetail — Bloc 2", page_icon="📊", layout="wide")
-
-VALID_CHANNELS = ["Emailing", "Google Ads", "LinkedIn Ads"]
-
-CHANNEL_NORMALIZATION = {
-    "googleads": "Google Ads",
-    "google ads": "Google Ads",
-    "linkedin": "LinkedIn Ads",
-    "linkedin ads": "LinkedIn Ads",
-    "e-mailing": "Emailing",
-    "emailing": "Emailing",
-}
-DEVICE_NORMALIZATION = {"desktop": "Desktop", "mobile": "Mobile", "tablet": "Tablet"}
-REGION_NORMALIZATION = {"Ile-de-France": "Île-de-France"}
-COMPANY_SIZE_NORMALIZATION = {"10 - 50": "10-50", "50- 100": "50-100"}
-
-STATUS_RANK = {"Client": 3, "SQL": 2, "MQL": 1, "Lost": 0}
-
-# =========================
-# UTILS
-# =========================
-def _count_missing(df: pd.DataFrame) -> pd.DataFrame:
-    rows = []
-    for c in df.columns:
-        s = df[c]
-        na = int(s.isna().sum())
-        empty = int((s.astype(str).str.strip() == "").sum())
-        rows.append({"variable": c, "missing_count": na + empty})
-    out = pd.DataFrame(rows).sort_values("missing_count", ascending=False)
-    return out
-
-def norm_channel(x):
-    if pd.isna(x):
-        return np.nan
-    s = str(x).strip()
-    if not s:
-        return np.nan
-    return CHANNEL_NORMALIZATION.get(s.lower(), s)
-
-def norm_device(x):
-    if pd.isna(x):
-        return np.nan
-    s = str(x).strip()
-    if not s:
-        return np.nan
-    return DEVICE_NORMALIZATION.get(s.lower(), s.title())
-
-def compute_campaign_kpis_by_channel(camp_agg: pd.DataFrame) -> pd.DataFrame:
-    out = camp_agg.copy()
-    out["CTR"] = out["clicks"] / out["impressions"]
-    out["conversion_rate"] = out["conversions"] / out["clicks"]
-    out["CPL"] = out["cost"] / out["conversions"]
-    return out
-
-def freq_table(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    s = df[col].fillna("NA")
-    out = s.value_counts(dropna=False).rename("count").to_frame()
-    out["percent"] = (out["count"] / out["count"].sum()).round(4)
-    return out
-
-def crosstab_percent(df: pd.DataFrame, a: str, b: str) -> pd.DataFrame:
-    return (pd.crosstab(df[a], df[b], normalize="index").fillna(0) * 100).round(1)
-
-# =========================
-# APP HEADER
-# =========================
-st.title("📊 NovaRetail — Bloc 2 : Sélection & Interprétation des Données (IA)")
-st.caption("Upload → Filtrage périmètre → Nettoyage → KPI → Analyses → Graphiques → Dashboard → Exports")
-
-st.sidebar.header("1) Upload des fichiers")
-leads_file = st.sidebar.file_uploader("leads (CSV)", type=["csv"])
-camp_file = st.sidebar.file_uploader("campaigns (JSON)", type=["json"])
-crm_file = st.sidebar.file_uploader("crm (XLSX)", type=["xlsx"])
-
-st.sidebar.header("2) Périmètre")
-month = st.sidebar.selectbox("Mois (périmètre imposé)", ["2025-10"], index=0)
-channels_sel = st.sidebar.multiselect("Canaux analysés", VALID_CHANNELS, default=VALID_CHANNELS)
-
-run = st.sidebar.button("🚀 Exécuter", type="primary")
-
-if not (leads_file and camp_file and crm_file):
-    st.info("⬅️ Importer les 3 fichiers pour commencer (CSV + JSON + XLSX).")
-    st.stop()
-
-if not run and "final_df" not in st.session_state:
-    st.warning("Clique sur **Exécuter**.")
-    st.stop()
-
-# =========================
-# PIPELINE
-# =========================
-if run:
-    with st.spinner("Traitement (chargement + nettoyage + KPI)..."):
-        # ---- Load
-        leads = pd.read_csv(leads_file)
-        campaigns = pd.read_json(camp_file)
-        crm = pd.read_excel(crm_file)
-
-        # ---- Report before
-        before = {
-            "leads_rows": len(leads),
-            "crm_rows": len(crm),
-            "campaign_rows": len(campaigns),
-            "missing_leads": _count_missing(leads),
-            "missing_crm": _count_missing(crm),
-            "missing_campaigns": _count_missing(campaigns),
-        }
-
-        # ---- Normalize / Types
-        leads = leads.copy()
-        crm = crm.copy()
-        campaigns = campaigns.copy()
-
-        leads["date"] = pd.to_datetime(leads["date"], errors="coerce")
-        leads["channel"] = leads["channel"].apply(norm_channel)
-        leads["device"] = leads["device"].apply(norm_device)
-
-        for col in ["company_size", "sector", "region", "status"]:
-            if col not in crm.columns:
-                crm[col] = np.nan
-
-        crm["company_size"] = crm["company_size"].astype(str).str.strip().replace(COMPANY_SIZE_NORMALIZATION)
-        crm["company_size"] = crm["company_size"].replace({"": np.nan, "nan": np.nan})
-        crm["sector"] = crm["sector"].astype(str).str.strip().replace({"": np.nan, "nan": np.nan})
-        crm["region"] = crm["region"].astype(str).str.strip().replace(REGION_NORMALIZATION).replace({"": np.nan, "nan": np.nan})
-        crm["status"] = crm["status"].astype(str).str.strip().replace({"": np.nan, "nan": np.nan})
-
-        # ---- Filter scope (Oct 2025)
-        month_start = pd.to_datetime(f"{month}-01")
-        month_end = month_start + pd.offsets.MonthEnd(1)
-        leads = leads[(leads["date"] >= month_start) & (leads["date"] <= month_end)]
-
-        # ---- Keep valid channels + selected channels
-        leads = leads[leads["channel"].isin(VALID_CHANNELS)]
-        leads = leads[leads["channel"].isin(channels_sel)]
-
-        # ---- Deduplicate leads by lead_id
-        leads_before = len(leads)
-        leads = leads.sort_values(["lead_id", "date"]).drop_duplicates(subset=["lead_id"], keep="first")
-        dup_leads_removed = leads_before - len(leads)
-
-        # ---- Deduplicate CRM keep best status
-        crm["_rank"] = crm["status"].map(STATUS_RANK).fillna(-1)
-        crm_before = len(crm)
-        crm = crm.sort_values(["lead_id", "_rank"], ascending=[True, False]).drop_duplicates(subset=["lead_id"], keep="first")
-        crm = crm.drop(columns=["_rank"])
-        dup_crm_removed = crm_before - len(crm)
-
-        # ---- Aggregate campaigns by channel (sum) for KPI
-        camp_agg = campaigns.groupby("channel", as_index=False).agg(
-            cost=("cost", "sum"),
-            impressions=("impressions", "sum"),
-            clicks=("clicks", "sum"),
-            conversions=("conversions", "sum"),
-        )
-        camp_agg = camp_agg[camp_agg["channel"].isin(channels_sel)]
-
-        # ---- Merge
-        df = leads.merge(crm, on="lead_id", how="left", validate="one_to_one")
-        df = df.merge(camp_agg, on="channel", how="left", validate="many_to_one")
-
-        # ---- After report
-        after = {
-            "final_rows": len(df),
-            "dup_leads_removed": int(dup_leads_removed),
-            "dup_crm_removed": int(dup_crm_removed),
-            "missing_final": _count_missing(df),
-        }
-
-        st.session_state["final_df"] = df
-        st.session_state["before"] = before
-        st.session_state["after"] = after
-        st.session_state["camp_agg"] = camp_agg
-
-df = st.session_state["final_df"]
-before = st.session_state["before"]
-after = st.session_state["after"]
-camp_agg = st.session_state["camp_agg"]
-
-# =========================
-# KPI / ANALYSES
-# =========================
-camp_kpi = compute_campaign_kpis_by_channel(camp_agg)
-
-total_leads = len(df)
-clients = int((df["status"] == "Client").sum())
-sql = int((df["status"] == "SQL").sum())
-mql = int((df["status"] == "MQL").sum())
-unknown = int(df["status"].isna().sum())
-client_rate = (clients / total_leads) if total_leads else 0.0
-
-best_cpl_channel = camp_kpi.sort_values("CPL").iloc[0]["channel"] if len(camp_kpi) else "—"
-best_ctr_channel = camp_kpi.sort_values("CTR", ascending=False).iloc[0]["channel"] if len(camp_kpi) else "—"
-
-# =========================
-# DASHBOARD (3–6 KPI)
-# =========================
-c1, c2, c3, c4, c5, c6 = st.columns(6)
-c1.metric("Leads (Oct 2025)", f"{total_leads:,}".replace(",", " "))
-c2.metric("Clients", f"{clients:,}".replace(",", " "))
-c3.metric("% Clients", f"{client_rate*100:.1f}%")
-c4.metric("SQL", f"{sql:,}".replace(",", " "))
-c5.metric("Meilleur CPL", f"{camp_kpi['CPL'].min():.2f} €" if len(camp_kpi) else "—")
-c6.metric("Canal + rentable", best_cpl_channel)
-
-st.divider()
-
-# =========================
-# TABS
-# =========================
-tab1, tab2, tab3, tab4 = st.tabs([
-    "1) Sélection & Nettoyage (preuves)",
-    "2) Analyse uni/bivariée",
-    "3) Graphiques (3–6)",
-    "4) Exports (livrables)",
-])
-
-with tab1:
-    st.subheader("1) Sélection des observations & variables (périmètre)")
-    st.markdown(
-        f"""
-- **Périmètre** : {month} uniquement (Octobre 2025)  
-- **Canaux** : {", ".join(channels_sel)}  
-- **Variables retenues (utiles métier)** :  
-  - Leads : `lead_id`, `date`, `channel`, `device` (identification + source acquisition + device)  
-  - CRM : `company_size`, `sector`, `region`, `status` (segmentation + qualité lead)  
-  - Campagnes : `cost`, `impressions`, `clicks`, `conversions` (KPI CTR/Conv/CPL)  
-- **Variables exclues** : non présentes / non utiles (pas de suppressions arbitraires).
-"""
-    )
-
-    st.write("### Preuves attendues — valeurs manquantes (avant)")
-    colA, colB, colC = st.columns(3)
-    with colA:
-        st.caption("Leads")
-        st.dataframe(before["missing_leads"], use_container_width=True, height=240)
-    with colB:
-        st.caption("CRM")
-        st.dataframe(before["missing_crm"], use_container_width=True, height=240)
-    with colC:
-        st.caption("Campaigns")
-        st.dataframe(before["missing_campaigns"], use_container_width=True, height=240)
-
-    st.write("### Nettoyage appliqué (résumé)")
-    st.json({
-        "filtrage_perimetre": month,
-        "canaux_valides": VALID_CHANNELS,
-        "doublons_supprimes_leads": after["dup_leads_removed"],
-        "doublons_supprimes_crm": after["dup_crm_removed"],
-        "normalisation": ["channel", "device", "region", "company_size"],
-        "campagnes": "agrégation par canal (sommes)",
-    })
-
-    st.write("### Preuves attendues — valeurs manquantes (après)")
-    st.dataframe(after["missing_final"], use_container_width=True, height=280)
-
-    st.write("### Aperçu dataset final (après filtrage + fusion)")
-    st.dataframe(df.head(30), use_container_width=True)
-
-with tab2:
-    st.subheader("2) Analyse univariée et bivariée")
-
-    st.write("### Quantitatives (campagnes par canal)")
-    st.dataframe(camp_kpi[["channel","cost","impressions","clicks","conversions","CTR","conversion_rate","CPL"]], use_container_width=True)
-
-    st.write("### Qualitatives (fréquences)")
-    f1, f2, f3, f4 = st.columns(4)
-    with f1:
-        st.caption("Channel")
-        st.dataframe(freq_table(df, "channel"), use_container_width=True, height=220)
-    with f2:
-        st.caption("Device")
-        st.dataframe(freq_table(df, "device"), use_container_width=True, height=220)
-    with f3:
-        st.caption("Status")
-        st.dataframe(freq_table(df, "status"), use_container_width=True, height=220)
-    with f4:
-        st.caption("Region")
-        st.dataframe(freq_table(df, "region"), use_container_width=True, height=220)
-
-    st.write("### Bivariée (croisements métier pertinents)")
-    st.caption("Channel × Status (% par canal) — qualité des leads par levier")
-    st.dataframe(crosstab_percent(df, "channel", "status"), use_container_width=True)
-
-    st.caption("Company size × Status (% par taille) — segments les plus ‘clients’")
-    if df["company_size"].notna().any():
-        st.dataframe(crosstab_percent(df, "company_size", "status"), use_container_width=True)
-    else:
-        st.info("company_size manquant après fusion/filtrage (selon CRM).")
-
-    st.caption("Sector × Status (% par secteur)")
-    if df["sector"].notna().any():
-        st.dataframe(crosstab_percent(df, "sector", "status"), use_container_width=True)
-    else:
-        st.info("sector manquant après fusion/filtrage (selon CRM).")
-
-with tab3:
-    st.subheader("3) Visualisations (5 graphiques) — chaque graphe répond à une question métier")
-
-    # 1) CTR
-    fig1 = px.bar(camp_kpi, x="channel", y="CTR",
-                  title="CTR par canal — Quel canal capte le mieux l’attention ?")
-    st.plotly_chart(fig1, use_container_width=True)
-
-    # 2) CPL
-    fig2 = px.bar(camp_kpi, x="channel", y="CPL",
-                  title="CPL par canal — Quel canal est le plus rentable ?")
-    st.plotly_chart(fig2, use_container_width=True)
-
-    # 3) Conversion rate
-    fig3 = px.bar(camp_kpi, x="channel", y="conversion_rate",
-                  title="Taux de conversion (clic → conversion) par canal — Qualité du trafic")
-    st.plotly_chart(fig3, use_container_width=True)
-
-    # 4) Status distribution per channel
-    dist = df.groupby(["channel","status"]).size().reset_index(name="count")
-    fig4 = px.bar(dist, x="channel", y="count", color="status", barmode="stack",
-                  title="Funnel marketing — Répartition MQL/SQL/Client par canal")
-    st.plotly_chart(fig4, use_container_width=True)
-
-    # 5) Clients by region (if possible)
-    if df["region"].notna().any():
-        clients_region = (df[df["status"]=="Client"]
-                          .groupby("region").size().reset_index(name="clients")
-                          .sort_values("clients", ascending=False))
-        fig5 = px.bar(clients_region, x="region", y="clients",
-                      title="Clients par région — Où concentrer la prospection ?")
-        st.plotly_chart(fig5, use_container_width=True)
-
-with tab4:
-    st.subheader("4) Livrables — Exports + Note métier + Carnet technique")
-
-    # Note métier (1–2 pages max, synthétique)
-    note = f"""
-# Note d’analyse métier — NovaRetail (Bloc 2)
-
-## Contexte & objectifs
-NovaRetail (SaaS B2B) a lancé plusieurs campagnes (Emailing, Google Ads, LinkedIn Ads) et alimente un CRM.
-L’objectif est de sélectionner les données du périmètre **octobre 2025**, nettoyer et fusionner les sources,
-calculer des KPI marketing (**CTR**, **taux de conversion**, **CPL**), analyser la qualité des leads (MQL/SQL/Client)
-et proposer des recommandations opérationnelles.
-
-## Résultats clés
-- Leads analysés (après nettoyage/fusion) : **{total_leads}**
-- Clients : **{clients}** (taux client : **{client_rate*100:.1f}%**)
-- Meilleur CTR : **{best_ctr_channel}**
-- Meilleur CPL (rentabilité) : **{best_cpl_channel}**
-
-## Interprétation métier
-- Un canal avec un CTR élevé n’est pas forcément le plus rentable : le **CPL** et la part de **Clients** sont critiques.
-- La distribution **MQL → SQL → Client** par canal indique la qualité du trafic et la performance commerciale.
-- Les segmentations (taille, secteur, région) permettent de cibler les segments les plus convertisseurs.
-
-## Recommandations opérationnelles
-1) Réallouer une partie du budget vers **{best_cpl_channel}** (meilleure rentabilité).
-2) Optimiser le canal le moins rentable : ciblage, message, landing page, nurturing CRM.
-3) Prioriser les segments (secteur/région/taille) qui présentent la plus forte proportion de **Clients**.
-4) Mettre en place un suivi hebdomadaire des KPI (dashboard) et un contrôle de qualité des données (doublons/manquants).
-""".strip()
-
-    # Carnet technique (problèmes + solutions)
-    carnet = pd.DataFrame([
-        {"Problème":"Lignes hors périmètre", "Solution":"Filtrer les dates sur Octobre 2025", "Justification":"Respect consigne, comparabilité des analyses."},
-        {"Problème":"Doublons lead_id", "Solution":"Déduplication leads (1 ligne/lead) + CRM (meilleur statut)", "Justification":"Évite biais sur volumes et taux."},
-        {"Problème":"Catégories incohérentes", "Solution":"Normalisation channel/device/region/company_size", "Justification":"Agrégations fiables (KPI & segmentations)."},
-        {"Problème":"Valeurs manquantes", "Solution":"Conserver NA + reporting des manquants", "Justification":"Traçabilité, pas de suppression globale interdite."},
-        {"Problème":"Campagnes multiples", "Solution":"Agrégation par canal (somme des coûts/impressions/clicks/conversions)", "Justification":"KPI comparables entre canaux."},
-    ])
-
-    st.download_button("📥 Dataset nettoyé (CSV)", df.to_csv(index=False).encode("utf-8"), "novaretail_clean.csv", "text/csv")
-    st.download_button("📥 KPI campagnes (CSV)", camp_kpi.to_csv(index=False).encode("utf-8"), "novaretail_kpi_campaigns.csv", "text/csv")
-    st.download_button("📥 Note métier (MD)", note.encode("utf-8"), "novaretail_note_metier.md", "text/markdown")
-    st.download_button("📥 Carnet technique (CSV)", carnet.to_csv(index=False).encode("utf-8"), "novaretail_carnet_technique.csv", "text/csv")
-
-    # Export ZIP complet
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
-        z.writestr("exports/novaretail_clean.csv", df.to_csv(index=False))
-        z.writestr("exports/novaretail_kpi_campaigns.csv", camp_kpi.to_csv(index=False))
-        z.writestr("exports/novaretail_note_metier.md", note)
-        z.writestr("exports/novaretail_carnet_technique.csv", carnet.to_csv(index=False))
-        z.writestr("exports/rapport_qualite_avant_missing.csv", before["missing_leads"].to_csv(index=False))
-        z.writestr("exports/rapport_qualite_apres_missing.csv", after["missing_final"].to_csv(index=False))
-    st.download_button("📦 Télécharger TOUS les livrables (ZIP)", buf.getvalue(), "novaretail_livrables.zip", "application/zip")
-
-    st.write("### Prévisualisation — Note métier")
-    st.code(note, language="markdown")
-
-    st.write("### Prévisualisation — Carnet technique")
-    st.dataframe(carnet, use_container_width=True)
+import json
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+
+from cache import content_hash
+from charts import Chart, show_chart
+from data_prep import (
+    CampaignsScan, DEFAULT_MONTH, VALID_CHANNELS, VALIDATION_RULES, LeadsScan, StarDataset, aggregate_campaigns,
+    available_months, custom_period, dedup_crm, index_normalized_leads, load_concurrently, load_raw_from_uploads,
+    month_period, normalize_crm, normalize_leads, quarter_period, read_crm_xlsx, scan_campaigns_json, scan_leads_csv,
+    slice_period, week_period,
+)
+from dedup import keep_best
+from exports import Deliverable, csv_bytes, offer_download, offer_zip
+from jobs import DONE, FAILED, QUEUED, JobRejected, get_runner
+from normalization import decategorize
+from pipeline import Pipeline, PipelineRun, Stage
+from profiling import profile_columns, profile_star
+from store import publish, resolve, session_id
+from uploads import hold, spool_uploads
+from validation import ValidationAccumulator
+
+# =========================
+# CONFIG
+# =========================
+st.set_page_config(page_title="NovaRetail — Bloc 2", page_icon="📊", layout="wide")
+
+# =========================
+# UTILS
+# =========================
+def _profile_frame(profile: dict) -> pd.DataFrame:
+    rows = [
+        {"variable": c, "missing_count": p["missing"], "distinct_count": p["distinct"], "memory_bytes": p["memory_bytes"]}
+        for c, p in profile.items()
+    ]
+    return pd.DataFrame(rows).sort_values("missing_count", ascending=False)
+
+def _profile_missing(df: pd.DataFrame) -> pd.DataFrame:
+    return _profile_frame(profile_columns(df))
+
+def compute_campaign_kpis_by_channel(camp_agg: pd.DataFrame) -> pd.DataFrame:
+    out = camp_agg.copy()
+    out["CTR"] = out["clicks"] / out["impressions"]
+    out["conversion_rate"] = out["conversions"] / out["clicks"]
+    out["CPL"] = out["cost"] / out["conversions"]
+    return out
+
+def freq_table(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    s = df[col].fillna("NA")
+    out = s.value_counts(dropna=False).rename("count").to_frame()
+    out["percent"] = (out["count"] / out["count"].sum()).round(4)
+    return out
+
+def crosstab_percent(df: pd.DataFrame, a: str, b: str) -> pd.DataFrame:
+    return (pd.crosstab(df[a], df[b], normalize="index").fillna(0) * 100).round(1)
+
+# =========================
+# APP HEADER
+# =========================
+st.title("📊 NovaRetail — Bloc 2 : Sélection & Interprétation des Données (IA)")
+st.caption("Upload → Filtrage périmètre → Nettoyage → KPI → Analyses → Graphiques → Dashboard → Exports")
+
+st.sidebar.header("1) Upload des fichiers")
+leads_file = st.sidebar.file_uploader("leads (CSV)", type=["csv"])
+camp_file = st.sidebar.file_uploader("campaigns (JSON)", type=["json"])
+crm_file = st.sidebar.file_uploader("crm (XLSX)", type=["xlsx"])
+
+st.sidebar.header("2) Périmètre")
+months = st.session_state.get("months") or [DEFAULT_MONTH]
+period_kind = st.sidebar.selectbox("Type de période", ["Mois", "Semaine", "Trimestre", "Personnalisé"])
+default_day = pd.Timestamp(DEFAULT_MONTH if DEFAULT_MONTH in months else months[-1]).date()
+if period_kind == "Mois":
+    month = st.sidebar.selectbox(
+        "Mois", months, index=months.index(DEFAULT_MONTH) if DEFAULT_MONTH in months else len(months) - 1
+    )
+    period = month_period(month)
+elif period_kind == "Semaine":
+    period = week_period(st.sidebar.date_input("Jour de la semaine", value=default_day))
+elif period_kind == "Trimestre":
+    quarters = sorted({str(pd.Period(m, freq="Q")) for m in months})
+    period = quarter_period(st.sidebar.selectbox("Trimestre", quarters, index=len(quarters) - 1))
+else:
+    start = st.sidebar.date_input("Du", value=default_day)
+    end = st.sidebar.date_input("Au", value=max(start, default_day))
+    if end < start:
+        st.sidebar.error("La date de fin doit suivre la date de début.")
+        st.stop()
+    period = custom_period(start, end)
+channels_sel = st.sidebar.multiselect("Canaux analysés", VALID_CHANNELS, default=VALID_CHANNELS)
+stream_leads = st.sidebar.checkbox("Lecture des leads par blocs (gros fichiers)", value=False)
+
+run = st.sidebar.button("🚀 Exécuter", type="primary")
+
+if not (leads_file and camp_file and crm_file):
+    st.info("⬅️ Importer les 3 fichiers pour commencer (CSV + JSON + XLSX).")
+    st.stop()
+
+if not run and resolve(st.session_state, "app") is None and "job_id" not in st.session_state:
+    st.warning("Clique sur **Exécuter**.")
+    st.stop()
+
+# =========================
+# PIPELINE
+# =========================
+# Declared stages: each one is cached on the fingerprint of its inputs, so a new period only
+# re-slices and a new channel selection only re-filters, dedups and merges
+def parse(files):
+    # The three files parsed concurrently
+    return load_raw_from_uploads(*files)
+
+def parse_scan(files, period, channels):
+    # Leads read in chunks with scope/channel filters + dedup pushed down per chunk, campaign
+    # totals streamed from the JSON, XLSX alongside
+    leads_file, camp_file, crm_file = files
+    return load_concurrently(
+        lambda: scan_leads_csv(leads_file, period, channels=list(channels)),
+        lambda: scan_campaigns_json(camp_file),
+        lambda: read_crm_xlsx(crm_file),
+    )
+
+def profile_sources(sources):
+    leads, campaigns, crm = sources
+    if isinstance(leads, LeadsScan):
+        leads_rows, missing_leads = leads.rows_in, _profile_frame(leads.profile)
+    else:
+        leads_rows, missing_leads = len(leads), _profile_missing(leads)
+    if isinstance(campaigns, CampaignsScan):
+        campaign_rows, missing_campaigns = campaigns.rows_in, _profile_frame(campaigns.profile)
+        rejected = dict(campaigns.rejected)
+    else:
+        campaign_rows, missing_campaigns, rejected = len(campaigns), _profile_missing(campaigns), {}
+    return {
+        "leads_rows": leads_rows,
+        "crm_rows": len(crm),
+        "campaign_rows": campaign_rows,
+        "missing_leads": missing_leads,
+        "missing_crm": _profile_missing(crm),
+        "missing_campaigns": missing_campaigns,
+        "campaigns_rejected": rejected,
+    }
+
+def best_crm(crm):
+    # Best status per lead_id, and the rows dropped
+    kept = dedup_crm(crm)
+    return kept, len(crm) - len(kept)
+
+def campaign_totals(sources):
+    # Campaigns by channel (sum) for KPI; a streamed scan already holds them
+    if isinstance(sources[1], CampaignsScan):
+        return sources[1].campaigns
+    return aggregate_campaigns(sources[1])
+
+def filter_channels(leads, channels):
+    return leads[leads["channel"].isin(channels)]
+
+def dedup_leads(leads):
+    # By lead_id, earliest date
+    kept = keep_best(leads, "lead_id", "date")
+    return kept, len(leads) - len(kept)
+
+def select_campaigns(camp_agg, channels):
+    return camp_agg[camp_agg["channel"].isin(channels)]
+
+def merge(leads, crm):
+    # CRM merged on lead_id; campaign totals stay in camp_agg, joined on channel only for the wide exports
+    leads = leads[0].assign(channel=decategorize(leads[0]["channel"]), device=decategorize(leads[0]["device"]))
+    return leads.merge(crm[0], on="lead_id", how="left", validate="one_to_one")
+
+def profile_final(df, camp_agg):
+    return _profile_frame(profile_star(df, camp_agg, "channel"))
+
+def validate(sources, leads, crm):
+    # Validation rules on the normalized sources (leads compared with the rows as read)
+    checks = ValidationAccumulator(VALIDATION_RULES)
+    checks.add("leads", leads, sources[0])
+    checks.add("crm", crm)
+    checks.add("campaigns", sources[1])
+    return checks.result()
+
+def validate_scan(sources, crm):
+    # Leads and campaigns were checked chunk by chunk while streamed
+    checks = ValidationAccumulator(VALIDATION_RULES)
+    for scan in sources[:2]:
+        if scan.validation is not None:
+            checks.merge(scan.validation)
+    checks.add("crm", crm)
+    return checks.result()
+
+COMMON_STAGES = [
+    Stage("profile_sources", ("parse",), profile_sources),
+    Stage("normalize_crm", ("parse",), lambda sources: normalize_crm(sources[2].copy())),
+    Stage("dedup_crm", ("normalize_crm",), best_crm),
+    Stage("aggregate_campaigns", ("parse",), campaign_totals),
+    Stage("select_campaigns", ("aggregate_campaigns", "channels"), select_campaigns),
+    Stage("merge", ("dedup_leads", "dedup_crm"), merge),
+    Stage("profile_final", ("merge", "select_campaigns"), profile_final),
+]
+PIPELINES = {
+    False: Pipeline("app", [
+        Stage("parse", ("files",), parse),
+        Stage("normalize_leads", ("parse",), lambda sources: normalize_leads(sources[0].copy())),
+        Stage("index_leads", ("normalize_leads",), index_normalized_leads),
+        Stage("scope", ("index_leads", "period"), slice_period),
+        Stage("filter_channels", ("scope", "channels"), filter_channels),
+        Stage("dedup_leads", ("filter_channels",), dedup_leads),
+        Stage("validate", ("parse", "normalize_leads", "normalize_crm"), validate),
+    ] + COMMON_STAGES),
+    True: Pipeline("app.stream", [
+        Stage("parse", ("files", "period", "channels"), parse_scan),
+        Stage("dedup_leads", ("parse",), lambda sources: (sources[0].leads, sources[0].duplicates_removed)),
+        Stage("validate", ("parse", "normalize_crm"), validate_scan),
+    ] + COMMON_STAGES),
+}
+# Stages whose values the app reads: only these (and the inputs of those missing from the cache)
+# are resolved, so a cached merge does not pull the raw parse back in
+RESULT_STAGES = ("merge", "dedup_leads", "dedup_crm", "profile_final", "validate", "profile_sources", "select_campaigns", "index_leads")
+
+# Uploads spooled once to the session's temporary directory; the parsers read them from disk
+sources = spool_uploads(st.session_state, leads=leads_file, campaigns=camp_file, crm=crm_file)
+digest = content_hash(*(f.digest for f in sources))
+scope_key = (digest, period, tuple(channels_sel), stream_leads)
+
+# Same files as the last run: a new period or channel selection re-slices without waiting for Exécuter
+rescope = st.session_state.get("digest") == digest and scope_key not in (st.session_state.get("scope_key"), st.session_state.get("job_scope"))
+if run or rescope:
+    pipeline = PIPELINES[stream_leads]
+    params = {"files": sources, "period": period, "channels": tuple(channels_sel)}
+
+    def process(progress, pipeline=pipeline, params=params, scope_key=scope_key):
+        # Runs on a worker thread: no st.* calls, the session picks the result up when it is done
+        targets = [n for n in RESULT_STAGES if n in pipeline.stages]
+        result = pipeline.run(params, targets, known={"files": digest}, progress=progress)
+        values = result.values
+        df = values["merge"]
+        after = {
+            "final_rows": len(df),
+            "dup_leads_removed": int(values["dedup_leads"][1]),
+            "dup_crm_removed": int(values["dedup_crm"][1]),
+            "missing_final": values["profile_final"],
+            "validation": values["validate"],
+            "stages": result.stages,
+        }
+        months = available_months(values["index_leads"]) if "index_leads" in values else None
+        # The graph view only needs what ran, not the intermediate values
+        last_run = PipelineRun({}, result.fingerprints, result.computed, result.reused, result.stages)
+        return scope_key, pipeline, last_run, (df, values["profile_sources"], after, values["select_campaigns"]), months
+
+    try:
+        # Same key from a rerun or another session joins the job already running. The spooled files
+        # stay on disk until the job is over, even if the session replaces them or closes meanwhile.
+        job = get_runner().submit(session_id(), content_hash(*scope_key), process, cleanup=hold(*sources))
+        st.session_state["job_id"] = job.id
+        st.session_state["job_scope"] = scope_key
+    except JobRejected as exc:
+        st.warning(str(exc))
+
+if st.session_state.pop("job_cancelled", False):
+    st.info("Traitement annulé.")
+job = get_runner().get(st.session_state.get("job_id"))
+if job is not None and not job.active:
+    del st.session_state["job_id"]
+    if job.status == DONE:
+        done_scope, pipeline, last_run, shared, months = get_runner().collect(job.id, session_id())
+        # Shared store keyed by content + scope: the session keeps a handle, not the frames
+        st.session_state["dataset_version"] = content_hash(*done_scope)
+        publish(st.session_state, st.session_state["dataset_version"], shared, slot="app")
+        st.session_state["pipeline"] = pipeline
+        st.session_state["pipeline_run"] = last_run
+        st.session_state["digest"] = done_scope[0]
+        st.session_state["scope_key"] = done_scope
+        st.session_state["period"] = done_scope[1]
+        if months is not None:
+            st.session_state["months"] = months or [DEFAULT_MONTH]
+    elif job.status == FAILED:
+        st.error(f"Traitement en échec : {job.error}")
+    else:
+        st.info("Traitement annulé.")
+elif job is not None:
+    # Polled without rerunning the page: the previous result stays usable while the job runs
+    @st.fragment(run_every=0.5)
+    def job_progress():
+        if not job.active:
+            st.rerun()
+        label = "En attente d'un worker…" if job.status == QUEUED else f"Traitement : {job.stage} ({job.done}/{job.total})"
+        st.progress(job.fraction, text=label)
+        if st.button("⏹️ Annuler", key="cancel_job"):
+            get_runner().cancel(job.id, session_id())
+            # Forget the job even if another session keeps it running: its result must not land here.
+            # job_scope stays so the cancelled scope is not resubmitted on the next rerun.
+            st.session_state.pop("job_id", None)
+            st.session_state["job_cancelled"] = True
+            st.rerun()
+
+    job_progress()
+
+if resolve(st.session_state, "app") is None:
+    st.stop()
+
+period = st.session_state["period"]
+
+df, before, after, camp_agg = resolve(st.session_state, "app")
+dataset = StarDataset(df, camp_agg)
+
+# =========================
+# KPI / ANALYSES
+# =========================
+camp_kpi = compute_campaign_kpis_by_channel(camp_agg)
+
+total_leads = len(df)
+clients = int((df["status"] == "Client").sum())
+sql = int((df["status"] == "SQL").sum())
+mql = int((df["status"] == "MQL").sum())
+unknown = int(df["status"].isna().sum())
+client_rate = (clients / total_leads) if total_leads else 0.0
+
+best_cpl_channel = camp_kpi.sort_values("CPL").iloc[0]["channel"] if len(camp_kpi) else "—"
+best_ctr_channel = camp_kpi.sort_values("CTR", ascending=False).iloc[0]["channel"] if len(camp_kpi) else "—"
+
+# =========================
+# DASHBOARD (3–6 KPI)
+# =========================
+c1, c2, c3, c4, c5, c6 = st.columns(6)
+c1.metric(f"Leads ({period.label})", f"{total_leads:,}".replace(",", " "))
+c2.metric("Clients", f"{clients:,}".replace(",", " "))
+c3.metric("% Clients", f"{client_rate*100:.1f}%")
+c4.metric("SQL", f"{sql:,}".replace(",", " "))
+c5.metric("Meilleur CPL", f"{camp_kpi['CPL'].min():.2f} €" if len(camp_kpi) else "—")
+c6.metric("Canal + rentable", best_cpl_channel)
+
+st.divider()
+
+# =========================
+# TABS
+# =========================
+tab1, tab2, tab3, tab4 = st.tabs([
+    "1) Sélection & Nettoyage (preuves)",
+    "2) Analyse uni/bivariée",
+    "3) Graphiques (3–6)",
+    "4) Exports (livrables)",
+])
+
+with tab1:
+    st.subheader("1) Sélection des observations & variables (périmètre)")
+    st.markdown(
+        f"""
+- **Périmètre** : {period.label} ({period.start:%Y-%m-%d} → {period.end:%Y-%m-%d})  
+- **Canaux** : {", ".join(channels_sel)}  
+- **Variables retenues (utiles métier)** :  
+  - Leads : `lead_id`, `date`, `channel`, `device` (identification + source acquisition + device)  
+  - CRM : `company_size`, `sector`, `region`, `status` (segmentation + qualité lead)  
+  - Campagnes : `cost`, `impressions`, `clicks`, `conversions` (KPI CTR/Conv/CPL)  
+- **Variables exclues** : non présentes / non utiles (pas de suppressions arbitraires).
+"""
+    )
+
+    st.write("### Preuves attendues — valeurs manquantes (avant)")
+    colA, colB, colC = st.columns(3)
+    with colA:
+        st.caption("Leads")
+        st.dataframe(before["missing_leads"], use_container_width=True, height=240)
+    with colB:
+        st.caption("CRM")
+        st.dataframe(before["missing_crm"], use_container_width=True, height=240)
+    with colC:
+        st.caption("Campaigns")
+        st.dataframe(before["missing_campaigns"], use_container_width=True, height=240)
+
+    st.write("### Nettoyage appliqué (résumé)")
+    st.json({
+        "filtrage_perimetre": period.label,
+        "canaux_valides": VALID_CHANNELS,
+        "doublons_supprimes_leads": after["dup_leads_removed"],
+        "doublons_supprimes_crm": after["dup_crm_removed"],
+        "campagnes_rejetees": before["campaigns_rejected"],
+        "normalisation": ["channel", "device", "region", "company_size"],
+        "campagnes": "agrégation par canal (sommes)",
+    })
+
+    st.write("### Contrôles de validation")
+    st.dataframe(pd.DataFrame(
+        [{"contrôle": r["label"], "source": r["source"], "anomalies": r["count"], "contrôlés": r["checked"]} for r in after["validation"].values()]
+    ), use_container_width=True, hide_index=True)
+    with st.expander("Exemples de lignes en anomalie"):
+        for r in after["validation"].values():
+            if r["samples"]:
+                st.caption(r["label"])
+                st.dataframe(pd.DataFrame(r["samples"]), use_container_width=True, hide_index=True)
+
+    st.write("### Preuves attendues — valeurs manquantes (après)")
+    st.dataframe(after["missing_final"], use_container_width=True, height=280)
+
+    st.write("### Temps et mémoire par étape")
+    st.dataframe(pd.DataFrame(after["stages"]), use_container_width=True)
+
+    if "pipeline_run" in st.session_state:
+        with st.expander("Graphe des étapes (débogage)"):
+            pipeline, last_run = st.session_state["pipeline"], st.session_state["pipeline_run"]
+            st.graphviz_chart(pipeline.to_dot(last_run))
+            st.caption(
+                f"Rejouées : {', '.join(last_run.computed) or '—'} · reprises du cache : {', '.join(last_run.reused) or '—'}"
+            )
+            st.dataframe(pd.DataFrame(
+                [{"paramètre": p, "étapes rejouées s'il change": ", ".join(pipeline.downstream([p]))} for p in pipeline.params]
+            ), use_container_width=True, hide_index=True)
+
+    st.write("### Aperçu dataset final (après filtrage + fusion)")
+    st.dataframe(dataset.wide(rows=30), use_container_width=True)
+
+with tab2:
+    st.subheader("2) Analyse univariée et bivariée")
+
+    st.write("### Quantitatives (campagnes par canal)")
+    st.dataframe(camp_kpi[["channel","cost","impressions","clicks","conversions","CTR","conversion_rate","CPL"]], use_container_width=True)
+
+    st.write("### Qualitatives (fréquences)")
+    f1, f2, f3, f4 = st.columns(4)
+    with f1:
+        st.caption("Channel")
+        st.dataframe(freq_table(df, "channel"), use_container_width=True, height=220)
+    with f2:
+        st.caption("Device")
+        st.dataframe(freq_table(df, "device"), use_container_width=True, height=220)
+    with f3:
+        st.caption("Status")
+        st.dataframe(freq_table(df, "status"), use_container_width=True, height=220)
+    with f4:
+        st.caption("Region")
+        st.dataframe(freq_table(df, "region"), use_container_width=True, height=220)
+
+    st.write("### Bivariée (croisements métier pertinents)")
+    st.caption("Channel × Status (% par canal) — qualité des leads par levier")
+    st.dataframe(crosstab_percent(df, "channel", "status"), use_container_width=True)
+
+    st.caption("Company size × Status (% par taille) — segments les plus ‘clients’")
+    if df["company_size"].notna().any():
+        st.dataframe(crosstab_percent(df, "company_size", "status"), use_container_width=True)
+    else:
+        st.info("company_size manquant après fusion/filtrage (selon CRM).")
+
+    st.caption("Sector × Status (% par secteur)")
+    if df["sector"].notna().any():
+        st.dataframe(crosstab_percent(df, "sector", "status"), use_container_width=True)
+    else:
+        st.info("sector manquant après fusion/filtrage (selon CRM).")
+
+with tab3:
+    st.subheader("3) Visualisations (5 graphiques) — chaque graphe répond à une question métier")
+
+    version = st.session_state["dataset_version"]
+
+    # 1) CTR
+    show_chart(version, Chart("app.ctr", lambda: camp_kpi, lambda d: px.bar(
+        d, x="channel", y="CTR", title="CTR par canal — Quel canal capte le mieux l’attention ?")))
+
+    # 2) CPL
+    show_chart(version, Chart("app.cpl", lambda: camp_kpi, lambda d: px.bar(
+        d, x="channel", y="CPL", title="CPL par canal — Quel canal est le plus rentable ?")))
+
+    # 3) Conversion rate
+    show_chart(version, Chart("app.conversion", lambda: camp_kpi, lambda d: px.bar(
+        d, x="channel", y="conversion_rate", title="Taux de conversion (clic → conversion) par canal — Qualité du trafic")))
+
+    # 4) Status distribution per channel
+    show_chart(version, Chart("app.status", lambda: df.groupby(["channel","status"]).size().reset_index(name="count"), lambda d: px.bar(
+        d, x="channel", y="count", color="status", barmode="stack",
+        title="Funnel marketing — Répartition MQL/SQL/Client par canal")))
+
+    # 5) Clients by region (if possible)
+    if df["region"].notna().any():
+        def clients_region():
+            return (df[df["status"]=="Client"]
+                    .groupby("region").size().reset_index(name="clients")
+                    .sort_values("clients", ascending=False))
+        show_chart(version, Chart("app.region", clients_region, lambda d: px.bar(
+            d, x="region", y="clients", title="Clients par région — Où concentrer la prospection ?")))
+
+with tab4:
+    st.subheader("4) Livrables — Exports + Note métier + Carnet technique")
+
+    # Note métier (1–2 pages max, synthétique)
+    note = f"""
+# Note d’analyse métier — NovaRetail (Bloc 2)
+
+## Contexte & objectifs
+NovaRetail (SaaS B2B) a lancé plusieurs campagnes (Emailing, Google Ads, LinkedIn Ads) et alimente un CRM.
+L’objectif est de sélectionner les données du périmètre **{period.label}**, nettoyer et fusionner les sources,
+calculer des KPI marketing (**CTR**, **taux de conversion**, **CPL**), analyser la qualité des leads (MQL/SQL/Client)
+et proposer des recommandations opérationnelles.
+
+## Résultats clés
+- Leads analysés (après nettoyage/fusion) : **{total_leads}**
+- Clients : **{clients}** (taux client : **{client_rate*100:.1f}%**)
+- Meilleur CTR : **{best_ctr_channel}**
+- Meilleur CPL (rentabilité) : **{best_cpl_channel}**
+
+## Interprétation métier
+- Un canal avec un CTR élevé n’est pas forcément le plus rentable : le **CPL** et la part de **Clients** sont critiques.
+- La distribution **MQL → SQL → Client** par canal indique la qualité du trafic et la performance commerciale.
+- Les segmentations (taille, secteur, région) permettent de cibler les segments les plus convertisseurs.
+
+## Recommandations opérationnelles
+1) Réallouer une partie du budget vers **{best_cpl_channel}** (meilleure rentabilité).
+2) Optimiser le canal le moins rentable : ciblage, message, landing page, nurturing CRM.
+3) Prioriser les segments (secteur/région/taille) qui présentent la plus forte proportion de **Clients**.
+4) Mettre en place un suivi hebdomadaire des KPI (dashboard) et un contrôle de qualité des données (doublons/manquants).
+""".strip()
+
+    # Carnet technique (problèmes + solutions)
+    carnet = pd.DataFrame([
+        {"Problème":"Lignes hors périmètre", "Solution":f"Filtrer les dates sur le périmètre ({period.label})", "Justification":"Respect consigne, comparabilité des analyses."},
+        {"Problème":"Doublons lead_id", "Solution":"Déduplication leads (1 ligne/lead) + CRM (meilleur statut)", "Justification":"Évite biais sur volumes et taux."},
+        {"Problème":"Catégories incohérentes", "Solution":"Normalisation channel/device/region/company_size", "Justification":"Agrégations fiables (KPI & segmentations)."},
+        {"Problème":"Valeurs manquantes", "Solution":"Conserver NA + reporting des manquants", "Justification":"Traçabilité, pas de suppression globale interdite."},
+        {"Problème":"Campagnes multiples", "Solution":"Agrégation par canal (somme des coûts/impressions/clicks/conversions)", "Justification":"KPI comparables entre canaux."},
+    ])
+
+    # Rendered on demand and cached per dataset version: page reruns no longer serialize anything
+    version = st.session_state["dataset_version"]
+    deliverables = [
+        Deliverable("📥 Dataset nettoyé (CSV)", "novaretail_clean.csv", "text/csv", lambda: csv_bytes(dataset.wide())),
+        Deliverable("📥 KPI campagnes (CSV)", "novaretail_kpi_campaigns.csv", "text/csv", lambda: csv_bytes(camp_kpi)),
+        Deliverable("📥 Note métier (MD)", "novaretail_note_metier.md", "text/markdown", lambda: note.encode("utf-8")),
+        Deliverable("📥 Carnet technique (CSV)", "novaretail_carnet_technique.csv", "text/csv", lambda: csv_bytes(carnet)),
+        Deliverable("Rapport qualité avant (CSV)", "rapport_qualite_avant_missing.csv", "text/csv", lambda: csv_bytes(before["missing_leads"])),
+        Deliverable("Rapport qualité après (CSV)", "rapport_qualite_apres_missing.csv", "text/csv", lambda: csv_bytes(after["missing_final"])),
+        Deliverable("Rapport qualité (JSON)", "rapport_qualite.json", "application/json", lambda: json.dumps({
+            "rows_in": {"leads": before["leads_rows"], "crm": before["crm_rows"], "campaigns": before["campaign_rows"]},
+            "rows_out": {"final": after["final_rows"]},
+            "duplicates_removed": {"leads": after["dup_leads_removed"], "crm": after["dup_crm_removed"]},
+            "rejected": {"campaigns": before["campaigns_rejected"]},
+            "validation": after["validation"],
+            "stages": after["stages"],
+        }, ensure_ascii=False, indent=2).encode("utf-8")),
+    ]
+    for d in deliverables[:4]:
+        offer_download(version, d)
+
+    # Export ZIP complet
+    offer_zip(version, deliverables, "📦 Télécharger TOUS les livrables (ZIP)", "novaretail_livrables.zip")
+
+    st.write("### Prévisualisation — Note métier")
+    st.code(note, language="markdown")
+
+    st.write("### Prévisualisation — Carnet technique")
+    st.dataframe(carnet, use_container_width=True)
@@ -0,0 +1,110 @@
+"""Jeu de données NovaRetail synthétique (leads CSV, campagnes JSON, CRM XLSX) à taille réglable.
+
+    python -m benchmarks.generate --leads 100000 --out bench_data/
+"""
+from __future__ import annotations
+import argparse
+import os
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Spellings seen in the real extracts, valid and dirty, with rough frequencies
+CHANNELS = {
+    "Emailing": 0.22, "Google Ads": 0.25, "LinkedIn Ads": 0.2, "googleads": 0.06, " google ads ": 0.03,
+    "linkedin": 0.05, "E-mailing": 0.05, "emailing": 0.04, "Facebook Ads": 0.05, "": 0.03, None: 0.02,
+}
+DEVICES = {"Desktop": 0.35, "desktop": 0.1, "Mobile": 0.25, "MOBILE": 0.08, "mobile": 0.07, "Tablet": 0.08, "tablet ": 0.03, "": 0.02, None: 0.02}
+COMPANY_SIZES = {"1-10": 0.2, "10-50": 0.25, "10 - 50": 0.08, "50-100": 0.2, "50- 100": 0.07, "100+": 0.15, "": 0.03, None: 0.02}
+SECTORS = {"Retail": 0.25, "Tech": 0.25, "Finance": 0.18, " Santé": 0.12, "Industrie": 0.12, "": 0.04, None: 0.04}
+REGIONS = {
+    "Île-de-France": 0.25, "Ile-de-France": 0.1, "Auvergne-Rhône-Alpes": 0.15, "Bretagne": 0.1,
+    "Occitanie": 0.12, "PACA ": 0.1, "Hauts-de-France": 0.1, "": 0.04, None: 0.04,
+}
+STATUSES = {"MQL": 0.45, "SQL": 0.2, "Client": 0.1, "Lost": 0.17, "": 0.04, None: 0.04}
+CAMPAIGN_CHANNELS = ["Emailing", "Google Ads", "LinkedIn Ads"]
+
+XLSX_MAX_ROWS = 1_048_575  # one sheet, header row excluded
+
+def _pick(rng: np.random.Generator, weights: dict, n: int) -> np.ndarray:
+    values = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return values[rng.choice(len(values), size=n, p=p / p.sum())]
+
+def generate(n_leads: int, seed: int = 0, start: str = "2025-08-01", months: int = 5, duplicate_rate: float = 0.04) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    n_unique = max(1, int(n_leads * (1 - duplicate_rate)))
+
+    # Leads: duplicated lead_ids, dates over several months (some unparseable), dirty categories
+    ids = np.concatenate([np.arange(1, n_unique + 1), rng.integers(1, n_unique + 1, n_leads - n_unique)])
+    rng.shuffle(ids)
+    first = pd.Timestamp(start)
+    span = int(((first + pd.DateOffset(months=months)) - first).total_seconds())
+    dates = pd.to_datetime(first.value + rng.integers(0, span, n_leads) * 10**9)
+    dates = pd.Series(dates.strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    broken = rng.random(n_leads)
+    dates[broken < 0.005] = "not a date"
+    dates[(broken >= 0.005) & (broken < 0.01)] = ""
+    leads = pd.DataFrame({
+        "lead_id": ids,
+        "date": dates.to_numpy(),
+        "channel": _pick(rng, CHANNELS, n_leads),
+        "device": _pick(rng, DEVICES, n_leads),
+    })
+
+    # CRM: most leads, some twice with a different status; capped at one XLSX sheet
+    n_crm = min(int(n_unique * 0.95), XLSX_MAX_ROWS)
+    crm_ids = rng.choice(np.arange(1, n_unique + 1), size=n_crm, replace=n_crm > n_unique)
+    dup = rng.random(n_crm) < duplicate_rate
+    crm_ids[dup] = rng.choice(crm_ids, size=int(dup.sum()))
+    crm = pd.DataFrame({
+        "lead_id": crm_ids,
+        "company_size": _pick(rng, COMPANY_SIZES, n_crm),
+        "sector": _pick(rng, SECTORS, n_crm),
+        "region": _pick(rng, REGIONS, n_crm),
+        "status": _pick(rng, STATUSES, n_crm),
+    })
+
+    # Campaigns: a few per channel and month, scaled mildly with the lead volume
+    n_campaigns = max(12, int(np.sqrt(n_leads)))
+    impressions = rng.integers(1_000, 200_000, n_campaigns)
+    clicks = (impressions * rng.uniform(0.002, 0.05, n_campaigns)).astype(int)
+    campaigns = pd.DataFrame({
+        "campaign_id": [f"CMP-{i:05d}" for i in range(n_campaigns)],
+        "channel": rng.choice(CAMPAIGN_CHANNELS, n_campaigns),
+        "date": (first + pd.to_timedelta(rng.integers(0, months * 30, n_campaigns), unit="D")).strftime("%Y-%m-%d"),
+        "cost": rng.uniform(50, 5_000, n_campaigns).round(2),
+        "impressions": impressions,
+        "clicks": clicks,
+        "conversions": (clicks * rng.uniform(0.01, 0.2, n_campaigns)).astype(int),
+    })
+    return leads, campaigns, crm
+
+def write_files(out_dir: str, n_leads: int, seed: int = 0) -> Tuple[str, str, str]:
+    leads, campaigns, crm = generate(n_leads, seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = tuple(os.path.join(out_dir, f) for f in ("leads.csv", "campaigns.json", "crm.xlsx"))
+    leads.to_csv(paths[0], index=False)
+    campaigns.to_json(paths[1], orient="records", force_ascii=False)
+    crm.to_excel(paths[2], index=False)
+    return paths
+
+def dataset_dir(root: str, n_leads: int, seed: int = 0) -> str:
+    # Generated once per (size, seed) and reused by the benchmark runs
+    path = os.path.join(root, f"{n_leads}_{seed}")
+    if not all(os.path.isfile(os.path.join(path, f)) for f in ("leads.csv", "campaigns.json", "crm.xlsx")):
+        write_files(path, n_leads, seed)
+    return path
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Génère un jeu NovaRetail synthétique")
+    parser.add_argument("--leads", type=int, default=10_000, help="nombre de lignes leads (10k → 10M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_data")
+    args = parser.parse_args()
+    for path in write_files(args.out, args.leads, args.seed):
+        print(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Temps et pic mémoire du pipeline sur données synthétiques, comparés à des références enregistrées.
+
+    python -m benchmarks.run --sizes 10000 100000              # compare aux références
+    python -m benchmarks.run --sizes 10000 --save-baseline     # enregistre les références
+
+Les références dépendent de la machine : aucune n'est livrée avec le dépôt. Sans référence pour une
+taille, la comparaison est impossible et le code de sortie vaut 2.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import analysis  # noqa: E402
+from benchmarks.generate import dataset_dir  # noqa: E402
+from data_prep import clean_and_prepare, load_raw_from_uploads  # noqa: E402
+from exports import Deliverable, csv_bytes, export_zip, report_json  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+NOISE_FLOOR_SECONDS = 0.005
+
+Case = Tuple[str, Callable[[], object]]
+
+def build_cases(path: str) -> List[Case]:
+    files = []
+    for name in ("leads.csv", "campaigns.json", "crm.xlsx"):
+        with open(os.path.join(path, name), "rb") as f:
+            files.append(f.read())
+    leads, campaigns, crm = load_raw_from_uploads(*files)
+    dataset, dq = clean_and_prepare(leads, campaigns, crm)
+    cube = analysis.build_rollup(dataset.facts, dataset.campaigns)
+
+    cases: List[Case] = [
+        ("load_raw_from_uploads", lambda: load_raw_from_uploads(*files)),
+        ("clean_and_prepare", lambda: clean_and_prepare(leads, campaigns, crm)),
+        ("build_rollup", lambda: analysis.build_rollup(dataset.facts, dataset.campaigns)),
+        ("compute_kpis_by_channel", lambda: analysis.compute_kpis_by_channel(cube)),
+        ("compute_kpis", lambda: analysis.compute_kpis(cube)),
+        ("crm_kpis", lambda: analysis.crm_kpis(cube)),
+        ("channel_status_counts", lambda: analysis.channel_status_counts(cube)),
+        ("sector_client_rate", lambda: analysis.sector_client_rate(cube)),
+        ("region_clients", lambda: analysis.region_clients(cube)),
+    ]
+    for col in ("channel", "device", "status", "region"):
+        cases.append((f"freq[{col}]", lambda col=col: analysis.freq(cube, col)))
+    for col in ("sector", "region"):
+        cases.append((f"clients_by[{col}]", lambda col=col: analysis.clients_by(cube, col)))
+    for a, b in (("channel", "status"), ("company_size", "status"), ("sector", "status")):
+        cases.append((f"crosstab_percent[{a}x{b}]", lambda a=a, b=b: analysis.crosstab_percent(cube, a, b)))
+
+    deliverables = [
+        Deliverable("dataset", "leads_enrichis_clean.csv", "text/csv", lambda: csv_bytes(dataset.wide())),
+        Deliverable("kpi", "kpi_by_channel.csv", "text/csv", lambda: csv_bytes(analysis.compute_kpis_by_channel(cube))),
+        Deliverable("rapport", "rapport_qualite.json", "application/json", lambda: report_json(dq)),
+    ]
+    # version=None: nothing cached, every run serializes and compresses from scratch
+    cases.append(("export_zip", lambda: export_zip(None, deliverables).read()))
+    return cases
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    # Best wall-clock over `repeat` runs, then one traced run for the allocation peak
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_mb": round(peak / 2**20, 3)}
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, cur in current.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        slow = cur["seconds"] > ref["seconds"] * (1 + tolerance) and cur["seconds"] - ref["seconds"] > NOISE_FLOOR_SECONDS
+        heavy = cur["peak_mb"] > ref["peak_mb"] * (1 + tolerance) and cur["peak_mb"] - ref["peak_mb"] > 1
+        if slow:
+            regressions.append(f"{name}: {ref['seconds']:.4f}s → {cur['seconds']:.4f}s")
+        if heavy:
+            regressions.append(f"{name}: {ref['peak_mb']:.1f} Mo → {cur['peak_mb']:.1f} Mo")
+    return regressions
+
+def _report(size: int, results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]]) -> None:
+    print(f"\n== {size:,} leads ==".replace(",", " "))
+    print(f"{'cas':<40}{'temps (s)':>12}{'pic (Mo)':>12}{'réf. (s)':>12}{'Δ temps':>10}")
+    for name, r in results.items():
+        ref = (baseline or {}).get(name)
+        delta = f"{(r['seconds'] / ref['seconds'] - 1) * 100:+.0f}%" if ref and ref["seconds"] else ""
+        ref_s = f"{ref['seconds']:.4f}" if ref else "—"
+        print(f"{name:<40}{r['seconds']:>12.4f}{r['peak_mb']:>12.1f}{ref_s:>12}{delta:>10}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks NovaRetail")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="tailles (nombre de leads)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="ne garder que les cas dont le nom contient ce texte")
+    parser.add_argument("--data-dir", default=os.path.join(ROOT_DIR, "bench_data"), help="jeux générés (réutilisés)")
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les mesures comme références")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="dégradation tolérée (0.25 = +25 %%)")
+    args = parser.parse_args(argv)
+
+    regressions: List[str] = []
+    missing: List[str] = []
+    for size in args.sizes:
+        path = dataset_dir(args.data_dir, size, args.seed)
+        results = {
+            name: measure(fn, args.repeat)
+            for name, fn in build_cases(path)
+            if not args.only or args.only in name
+        }
+        baseline_path = os.path.join(args.baseline_dir, f"{size}_{args.seed}.json")
+        baseline = None
+        if os.path.isfile(baseline_path):
+            with open(baseline_path, encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        _report(size, results, baseline)
+
+        if args.save_baseline:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            meta = {"python": platform.python_version(), "pandas": pd.__version__, "machine": platform.platform(), "cpus": os.cpu_count()}
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump({"meta": meta, "results": {**(baseline or {}), **results}}, f, indent=2)
+            print(f"références enregistrées : {baseline_path}")
+        elif baseline is not None:
+            regressions += [f"[{size}] {r}" for r in compare(results, baseline, args.tolerance)]
+        else:
+            missing.append(baseline_path)
+
+    if regressions:
+        print("\nRégressions :", *regressions, sep="\n  ")
+        return 1
+    if missing:
+        print("\nAucune référence, rien n'a été comparé :", *missing, sep="\n  ", file=sys.stderr)
+        print("Lancer d'abord la même commande avec --save-baseline sur cette machine.", file=sys.stderr)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis import CAMPAIGN_MEASURES, compute_kpis_by_channel
+from cache import CACHE_BUDGET_BYTES, stage_cache
+
+FILTER_DIMENSIONS = ["channel", "region", "sector", "company_size", "device", "status"]
+MISSING_LABEL = "NA"  # same label as analysis.freq
+
+Bitmap = np.ndarray  # np.packbits layout: one bit per lead, 8 leads per byte
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(bits: Bitmap) -> int:
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(bits: Bitmap) -> int:
+        return int(_BYTE_COUNTS[bits].sum(dtype=np.int64))
+
+@dataclass
+class BitmapIndex:
+    # One packed bitmap per (dimension, value) over the fact rows, built once per dataset
+    size: int
+    bitmaps: Dict[str, Dict[str, Bitmap]]
+
+    def values(self, dim: str) -> List[str]:
+        return list(self.bitmaps.get(dim, {}))
+
+    def all(self) -> Bitmap:
+        # Padding bits past `size` stay 0, so counts never include them
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def select(self, filters: Optional[Mapping[str, Iterable[str]]] = None) -> Bitmap:
+        # OR within a dimension, AND across dimensions; an empty selection does not filter
+        mask = self.all()
+        for dim, values in (filters or {}).items():
+            values = list(values)
+            if not values or dim not in self.bitmaps:
+                continue
+            union = np.zeros_like(mask)
+            for v in values:
+                bits = self.bitmaps[dim].get(v)
+                if bits is not None:
+                    np.bitwise_or(union, bits, out=union)
+            np.bitwise_and(mask, union, out=mask)
+        return mask
+
+    def count(self, mask: Bitmap, dim: Optional[str] = None, value: Optional[str] = None) -> int:
+        if dim is None:
+            return _popcount(mask)
+        bits = self.bitmaps.get(dim, {}).get(value)
+        return 0 if bits is None else _popcount(mask & bits)
+
+    def rows(self, mask: Bitmap) -> np.ndarray:
+        # Boolean row mask for the fact table
+        return np.unpackbits(mask, count=self.size).view(bool)
+
+def _codes(s: pd.Series):
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), s.cat.categories
+    return pd.factorize(s, sort=True, use_na_sentinel=True)
+
+def build_bitmap_index(df: pd.DataFrame, dimensions: List[str] = FILTER_DIMENSIONS) -> BitmapIndex:
+    bitmaps: Dict[str, Dict[str, Bitmap]] = {}
+    for dim in dimensions:
+        if dim not in df.columns:
+            continue
+        codes, uniques = _codes(df[dim])
+        per_value: Dict[str, Bitmap] = {}
+        for code, value in enumerate(uniques):
+            bits = codes == code
+            if bits.any():
+                per_value[str(value)] = np.packbits(bits)
+        missing = codes < 0
+        if missing.any():
+            # Merged with a real "NA" value (e.g. a region code), as freq's fillna("NA") does
+            bits = np.packbits(missing)
+            per_value[MISSING_LABEL] = per_value[MISSING_LABEL] | bits if MISSING_LABEL in per_value else bits
+        bitmaps[dim] = per_value
+    return BitmapIndex(len(df), bitmaps)
+
+def bitmap_index_for(df: pd.DataFrame, version: Optional[str] = None) -> BitmapIndex:
+    if version is None:
+        return build_bitmap_index(df)
+    return stage_cache("bitmaps", maxsize=4, max_bytes=CACHE_BUDGET_BYTES).get_or_compute(version, lambda: build_bitmap_index(df))
+
+def selection_kpis(index: BitmapIndex, mask: Bitmap, campaigns: pd.DataFrame) -> Dict[str, object]:
+    # Dashboard cards for the selected leads; campaign KPIs cover the channels still present
+    total = index.count(mask)
+    clients = index.count(mask, "status", "Client")
+    channels = [c for c in index.values("channel") if index.count(mask, "channel", c)]
+    per_channel = campaigns.drop_duplicates(subset=["channel"])
+    per_channel = per_channel[per_channel["channel"].astype(object).isin(channels)][["channel"] + CAMPAIGN_MEASURES]
+    return {
+        "total_leads": total,
+        "clients": clients,
+        "client_rate": clients / total if total else 0.0,
+        "kpi_by_channel": compute_kpis_by_channel(per_channel.reset_index(drop=True)),
+    }
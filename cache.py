@@ -0,0 +1,152 @@
+from __future__ import annotations
+import dataclasses
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Byte bound of each cache holding intermediate results (pipeline stages, prepared sources, rollup
+# cubes, bitmap indexes, charts, rendered exports)
+CACHE_BUDGET_BYTES = int(float(os.environ.get("NOVARETAIL_CACHE_MB", "512")) * 2**20)
+
+def content_hash(*parts: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        if isinstance(p, (bytes, bytearray, memoryview)):
+            h.update(b"b%d:" % len(p))
+            h.update(p)
+        else:
+            r = repr(p).encode("utf-8")
+            h.update(b"r%d:" % len(r))
+            h.update(r)
+    return h.hexdigest()
+
+def nbytes(value: Any) -> int:
+    # Deep size of the frames and arrays held by a value (tuples, dicts, dataclasses walked)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        # Object arrays: the strings they point to as well
+        return int(pd.Series(value, copy=False).memory_usage(index=False, deep=True)) if value.dtype == object else int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sum(nbytes(getattr(value, f.name)) for f in dataclasses.fields(value))
+    # Other containers report their own size (e.g. IncrementalDataset.nbytes, SpooledExport.nbytes,
+    # ChartSpec.nbytes)
+    size = getattr(value, "nbytes", None)
+    return size if isinstance(size, int) else 0
+
+class LRUCache:
+    # Bounded by entry count and, with `max_bytes`, by the nbytes() of the values: the least
+    # recently used entries go first. A value larger than the whole bound is not kept, and the
+    # entries already cached stay
+    def __init__(self, maxsize: int = 8, max_bytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def used_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = nbytes(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            while self._data and (len(self._data) > self.maxsize or (self.max_bytes is not None and self.used_bytes() > self.max_bytes)):
+                old, _ = self._data.popitem(last=False)
+                self._sizes.pop(old, None)
+        if size and _budget_hook is not None:
+            _budget_hook()
+
+    def trim(self, excess: int) -> int:
+        # Drops least recently used entries until `excess` bytes are freed; returns the bytes freed
+        freed = 0
+        with self._lock:
+            while self._data and freed < excess:
+                old, _ = self._data.popitem(last=False)
+                freed += self._sizes.pop(old, 0)
+        return freed
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            # Computed outside the lock so a slow stage does not block other sessions
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+
+# Process-wide registry: survives Streamlit reruns because this module is only imported once
+_CACHES: Dict[str, LRUCache] = {}
+_CACHES_LOCK = threading.Lock()
+# Called after a byte-bounded cache grows: the dataset store counts these caches against its budget
+_budget_hook: Optional[Callable[[], None]] = None
+
+def set_budget_hook(hook: Optional[Callable[[], None]]) -> None:
+    global _budget_hook
+    _budget_hook = hook
+
+def _sized_caches() -> List[LRUCache]:
+    with _CACHES_LOCK:
+        return [c for c in _CACHES.values() if c.max_bytes is not None]
+
+def cache_bytes() -> int:
+    return sum(c.used_bytes() for c in _sized_caches())
+
+def trim_caches(excess: int) -> int:
+    # Intermediate results go first: they are recomputed from their inputs when needed again
+    freed = 0
+    for c in _sized_caches():
+        if freed >= excess:
+            break
+        freed += c.trim(excess - freed)
+    return freed
+
+def stage_cache(name: str, maxsize: int = 8, max_bytes: Optional[int] = None) -> LRUCache:
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            _CACHES[name] = LRUCache(maxsize, max_bytes)
+        return _CACHES[name]
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        name: {"size": len(c), "maxsize": c.maxsize, "bytes": c.used_bytes(), "hits": c.hits, "misses": c.misses}
+        for name, c in _CACHES.items()
+    }
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from cache import CACHE_BUDGET_BYTES, stage_cache
+
+CHART_CACHE_SIZE = 64
+
+Filters = Optional[Mapping[str, Any]]
+
+@dataclass(frozen=True)
+class Chart:
+    # Aggregation and figure built on first display, then cached per dataset version and filters
+    name: str
+    data: Callable[[], pd.DataFrame]
+    figure: Callable[[pd.DataFrame], Any]
+
+class ChartSpec:
+    # A figure serialized once, as the plain dict st.plotly_chart takes; nbytes is the length of
+    # its JSON (cache budget)
+    def __init__(self, figure: Any):
+        import plotly.io
+
+        text = plotly.io.to_json(figure, validate=False)
+        self.spec: Dict[str, Any] = json.loads(text)
+        self.nbytes = len(text)
+
+def _charts_cache():
+    return stage_cache("charts", maxsize=CHART_CACHE_SIZE, max_bytes=CACHE_BUDGET_BYTES)
+
+def _filter_value(value: Any) -> Hashable:
+    if isinstance(value, (str, bytes)) or not isinstance(value, Iterable):
+        return value
+    # Selections are sets: the order values were picked in does not change the chart
+    return tuple(sorted(map(str, value)))
+
+def filter_key(filters: Filters) -> Tuple[Tuple[str, Hashable], ...]:
+    return tuple(sorted((k, _filter_value(v)) for k, v in (filters or {}).items()))
+
+def chart_data(version: Optional[str], chart: Chart, filters: Filters = None) -> pd.DataFrame:
+    if version is None:
+        return chart.data()
+    return _charts_cache().get_or_compute((version, filter_key(filters), chart.name, "data"), chart.data)
+
+def chart_figure(version: Optional[str], chart: Chart, filters: Filters = None) -> Dict[str, Any]:
+    # Serialized figure: the cache keeps the dict, not the go.Figure, so reruns do not rebuild it
+    if version is None:
+        return ChartSpec(chart.figure(chart.data())).spec
+    return _charts_cache().get_or_compute(
+        (version, filter_key(filters), chart.name, "figure"),
+        lambda: ChartSpec(chart.figure(chart_data(version, chart, filters))),
+    ).spec
+
+def show_chart(version: Optional[str], chart: Chart, filters: Filters = None) -> None:
+    import streamlit as st
+
+    st.plotly_chart(chart_figure(version, chart, filters), use_container_width=True, key=f"chart_{chart.name}")
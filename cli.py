@@ -0,0 +1,148 @@
+"""Traitement NovaRetail sans interface : chargement → nettoyage → KPI → exports.
+
+Exemples :
+    python cli.py --leads leads.csv --campaigns campaigns.json --crm crm.xlsx --period 2025-10
+    python cli.py --inputs extraits/ --period 2025-01..2025-12 --out sorties/ --workers 8
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from analysis import build_rollup, compute_kpis, compute_kpis_by_channel, crm_kpis
+from data_prep import (
+    DEFAULT_MONTH, Period, load_concurrently, load_raw_from_uploads, parse_period,
+    prepare_sources, read_crm_xlsx, scan_campaigns_json, scan_leads_csv, scope_dataset,
+)
+from exports import csv_bytes, report_json, write_zip
+
+@dataclass(frozen=True)
+class InputSet:
+    name: str
+    leads: str
+    campaigns: str
+    crm: str
+
+def expand_periods(values: Sequence[str]) -> List[Period]:
+    # "2025-01..2025-12" expands to one period per month
+    periods: List[Period] = []
+    for value in values:
+        if ".." in value:
+            first, last = value.split("..", 1)
+            periods.extend(parse_period(str(m)) for m in pd.period_range(first, last, freq="M"))
+        else:
+            periods.append(parse_period(value))
+    return periods
+
+def find_input_set(directory: str) -> InputSet:
+    # One CSV (leads), one JSON (campagnes) and one XLSX (CRM) per directory
+    found: Dict[str, List[str]] = {".csv": [], ".json": [], ".xlsx": []}
+    for name in sorted(os.listdir(directory)):
+        ext = os.path.splitext(name)[1].lower()
+        if ext in found:
+            found[ext].append(os.path.join(directory, name))
+    for ext, paths in found.items():
+        if len(paths) != 1:
+            raise ValueError(f"{directory}: {len(paths)} fichier(s) {ext} trouvé(s), 1 attendu")
+    name = os.path.basename(os.path.normpath(directory))
+    return InputSet(name, found[".csv"][0], found[".json"][0], found[".xlsx"][0])
+
+def write_outputs(out_dir: str, dataset, dq, zip_archive: bool = False) -> Dict[str, object]:
+    cube = build_rollup(dataset.facts, dataset.campaigns)
+    kpis = {**compute_kpis(cube), **crm_kpis(cube)}
+    files = {
+        "leads_enrichis_clean.csv": csv_bytes(dataset.wide()),
+        "kpi_by_channel.csv": csv_bytes(compute_kpis_by_channel(cube)),
+        "kpis.json": json.dumps(kpis, ensure_ascii=False, indent=2, default=float).encode("utf-8"),
+        "rapport_qualite.json": report_json(dq),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    for name, data in files.items():
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(data)
+    if zip_archive:
+        with open(os.path.join(out_dir, "novaretail_livrables.zip"), "wb") as f:
+            write_zip(((f"exports/{name}", data) for name, data in files.items()), f)
+    return kpis
+
+def run_job(inputs: InputSet, periods: Sequence[Period], out_root: str, per_set_dirs: bool, stream: bool, zip_archive: bool) -> List[Tuple[str, str, int, float]]:
+    # One worker per (input set, group of periods): files are parsed once, each period only re-slices
+    results = []
+    if stream:
+        campaigns, crm = load_concurrently(lambda: scan_campaigns_json(inputs.campaigns), lambda: read_crm_xlsx(inputs.crm))
+    else:
+        prepared = prepare_sources(*load_raw_from_uploads(inputs.leads, inputs.campaigns, inputs.crm))
+    for period in periods:
+        t0 = time.perf_counter()
+        if stream:
+            # The period is pushed into the chunked read, so each period scans the CSV again
+            prepared = prepare_sources(scan_leads_csv(inputs.leads, period), campaigns, crm)
+        dataset, dq = scope_dataset(prepared, period)
+        out_dir = os.path.join(out_root, inputs.name, period.slug) if per_set_dirs else os.path.join(out_root, period.slug)
+        write_outputs(out_dir, dataset, dq, zip_archive)
+        results.append((inputs.name, period.label, len(dataset.facts), time.perf_counter() - t0))
+    return results
+
+def _split(periods: Sequence[Period], parts: int) -> List[List[Period]]:
+    parts = max(1, min(parts, len(periods)))
+    return [list(periods[i::parts]) for i in range(parts)]
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="NovaRetail — nettoyage, KPI et exports sans Streamlit")
+    parser.add_argument("--leads", help="leads (CSV)")
+    parser.add_argument("--campaigns", help="campagnes (JSON)")
+    parser.add_argument("--crm", help="CRM (XLSX)")
+    parser.add_argument("--inputs", action="append", default=[], metavar="DIR",
+                        help="dossier contenant un CSV, un JSON et un XLSX (répétable)")
+    parser.add_argument("--period", action="append", default=[], metavar="PERIODE",
+                        help="2025-10, 2025Q4, 2025-10-06:2025-10-19 ou 2025-01..2025-12 (répétable)")
+    parser.add_argument("--out", default="sorties", help="dossier de sortie (un sous-dossier par période)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="nombre de processus")
+    parser.add_argument("--stream", action="store_true", help="lecture des leads par blocs, périmètre appliqué à la lecture")
+    parser.add_argument("--zip", action="store_true", help="ajoute l'archive ZIP des livrables")
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    input_sets = [find_input_set(d) for d in args.inputs]
+    if args.leads or args.campaigns or args.crm:
+        if not (args.leads and args.campaigns and args.crm):
+            parser.error("--leads, --campaigns et --crm vont ensemble")
+        input_sets.append(InputSet("donnees", args.leads, args.campaigns, args.crm))
+    if not input_sets:
+        parser.error("indiquer --inputs DIR ou --leads/--campaigns/--crm")
+    periods = expand_periods(args.period or [DEFAULT_MONTH])
+    per_set_dirs = len(input_sets) > 1
+
+    # Periods of one input set are spread over the workers that set gets
+    share = max(1, args.workers // len(input_sets))
+    jobs = [(s, group) for s in input_sets for group in _split(periods, share)]
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        futures = {
+            pool.submit(run_job, s, group, args.out, per_set_dirs, args.stream, args.zip): (s, group)
+            for s, group in jobs
+        }
+        for future in as_completed(futures):
+            s, group = futures[future]
+            try:
+                for name, label, rows, seconds in future.result():
+                    print(f"{name}\t{label}\t{rows} lignes\t{seconds:.1f}s")
+            except Exception:
+                failures += 1
+                print(f"ÉCHEC {s.name} ({', '.join(p.label for p in group)})", file=sys.stderr)
+                traceback.print_exc()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
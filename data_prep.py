@@ -1,11 +1,31 @@
 from __future__ import annotations
+import io
+import os
 import pandas as pd
 import numpy as np
-from dataclasses import dataclass
-from typing import Dict, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple, List, Optional, Union
+
+from cache import CACHE_BUDGET_BYTES, content_hash, nbytes, stage_cache
+from dedup import best_positions, keep_best
+from instrumentation import recording, stage
+from profiling import ProfileAccumulator, missing_counts, profile_columns, profile_star
+from normalization import lookup_rule, strip_replace_rule, normalize_categorical, normalize_values, decategorize
+from store import get_store
+from json_stream import batches, iter_json_records
+from timeseries import MEASURES, campaign_daily, sum_measures
+from validation import ReferenceRule, RowRule, ValidationAccumulator
 
 VALID_CHANNELS = ["Emailing", "Google Ads", "LinkedIn Ads"]
 
+DEFAULT_MONTH = "2025-10"
+
+LEADS_COLUMNS = ["lead_id", "date", "channel", "device"]
+
+# Fields kept from each campaign record: per-channel totals plus what the daily trend needs
+CAMPAIGN_FIELDS = ["campaign_id", "channel", "date"] + MEASURES
+
 CHANNEL_NORMALIZATION = {
     "googleads": "Google Ads",
     "google ads": "Google Ads",
@@ -34,6 +54,32 @@ REGION_NORMALIZATION = {
 
 STATUS_RANK = {"Client": 3, "SQL": 2, "MQL": 1, "Lost": 0}
 
+# Low-cardinality lead dimensions held as categoricals in the final dataset
+COMPACT_DIMENSIONS = ["channel", "device", "company_size", "sector", "region", "status"]
+
+# "auto": calamine when python-calamine is installed, openpyxl otherwise
+XLSX_ENGINE = os.environ.get("NOVARETAIL_XLSX_ENGINE", "auto")
+
+norm_channel = lookup_rule(CHANNEL_NORMALIZATION)
+norm_device = lookup_rule(DEVICE_NORMALIZATION, fallback=str.title)
+norm_company_size = strip_replace_rule(COMPANY_SIZE_NORMALIZATION)
+norm_region = strip_replace_rule(REGION_NORMALIZATION)
+norm_blank = strip_replace_rule()
+
+# Checks reported with sample rows in DataQualityReport.validation (nothing is dropped by them).
+# Leads row rules compare the rows as read (`raw`) with their normalized form.
+VALIDATION_RULES = [
+    RowRule("unparseable_dates", "leads", "Dates illisibles (mises à NaT)", ("date",),
+            lambda f, raw: raw["date"].notna().to_numpy() & f["date"].isna().to_numpy()),
+    RowRule("unknown_channels", "leads", "Canaux hors VALID_CHANNELS (écartés)", ("channel",),
+            lambda f, raw: raw["channel"].notna().to_numpy() & ~f["channel"].isin(VALID_CHANNELS).to_numpy()),
+    RowRule("clicks_over_impressions", "campaigns", "Clics > impressions", ("clicks", "impressions"),
+            lambda f, raw: (f["clicks"] > f["impressions"]).to_numpy()),
+    ReferenceRule("leads_without_crm", "leads", "lead_id", "crm", "lead_id", "lead_id des leads sans ligne CRM"),
+    ReferenceRule("crm_orphans", "crm", "lead_id", "leads", "lead_id", "lead_id du CRM sans lead"),
+    ReferenceRule("campaign_channels_without_leads", "campaigns", "channel", "leads", "channel", "Canaux de campagne sans lead"),
+]
+
 @dataclass
 class DataQualityReport:
     rows_in: Dict[str, int]
@@ -42,114 +88,721 @@ class DataQualityReport:
     missing_before: Dict[str, Dict[str, int]]
     missing_after: Dict[str, Dict[str, int]]
     notes: List[str]
+    profile_before: Dict[str, Dict[str, Dict[str, int]]] = field(default_factory=dict)
+    profile_after: Dict[str, Dict[str, Dict[str, int]]] = field(default_factory=dict)
+    stages: List[Dict[str, object]] = field(default_factory=list)
+    memory_bytes: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Source -> reason -> rows rejected by validation (streamed campaigns)
+    rejected: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Rule -> {source, label, count, checked, samples} (VALIDATION_RULES)
+    validation: Dict[str, Dict[str, object]] = field(default_factory=dict)
+    # Period label (empty in old snapshots)
+    period: str = ""
+
+def _xlsx_engines() -> List[str]:
+    if XLSX_ENGINE != "auto":
+        return [XLSX_ENGINE]
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return ["openpyxl"]
+    return ["calamine", "openpyxl"]
+
+# Raw bytes, or a path (spooled upload, CLI input) parsed straight from disk
+Source = Union[bytes, str, "os.PathLike[str]"]
+
+def _buffer(source: Source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def source_digest(source: Source) -> str:
+    # Spooled uploads carry the digest of their content, so files are not hashed again
+    if isinstance(source, (bytes, bytearray)):
+        return content_hash(source)
+    digest = getattr(source, "digest", None)
+    if digest is not None:
+        return digest
+    info = os.stat(source)
+    return content_hash(os.fspath(source), info.st_size, info.st_mtime_ns)
 
-def _count_missing(df: pd.DataFrame) -> Dict[str, int]:
-    out = {}
-    for c in df.columns:
-        s = df[c]
-        na = int(s.isna().sum())
-        empty = int((s.astype(str).str.strip() == "").sum())
-        out[c] = na + empty
-    return out
-
-def load_raw_from_uploads(leads_bytes: bytes, campaigns_bytes: bytes, crm_bytes: bytes) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    import io
-    leads = pd.read_csv(io.BytesIO(leads_bytes))
-    campaigns = pd.read_json(io.BytesIO(campaigns_bytes))
-    crm = pd.read_excel(io.BytesIO(crm_bytes), sheet_name=0)
+def read_leads_csv(source: Source, **kwargs: Any):
+    # A path is read by the C parser in buffered blocks, never held whole in memory (memory_map
+    # was tried: the mapped pages count in the process RSS, which is what the memory budget watches)
+    if isinstance(source, (bytes, bytearray)):
+        return pd.read_csv(io.BytesIO(source), **kwargs)
+    return pd.read_csv(source, **kwargs)
+
+def read_crm_xlsx(source: Source) -> pd.DataFrame:
+    engines = _xlsx_engines()
+    for engine in engines:
+        try:
+            return pd.read_excel(_buffer(source), sheet_name=0, engine=engine)
+        except Exception:
+            # pandas < 2.2 has no calamine engine, and calamine rejects some workbooks openpyxl reads
+            if engine == engines[-1]:
+                raise
+
+def load_concurrently(*loaders: Callable[[], Any]) -> List[Any]:
+    # The CSV/JSON parsers and calamine release the GIL for most of their work, so the
+    # wall-clock time is bounded by the slowest file rather than the sum of the three
+    with ThreadPoolExecutor(max_workers=len(loaders)) as pool:
+        futures = [pool.submit(load) for load in loaders]
+        return [f.result() for f in futures]
+
+def load_raw_from_uploads(leads_bytes: Source, campaigns_bytes: Source, crm_bytes: Source) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    leads, campaigns, crm = load_concurrently(
+        lambda: read_leads_csv(leads_bytes),
+        lambda: pd.read_json(_buffer(campaigns_bytes)),
+        lambda: read_crm_xlsx(crm_bytes),
+    )
     return leads, campaigns, crm
 
-def clean_and_prepare(leads: pd.DataFrame, campaigns: pd.DataFrame, crm: pd.DataFrame, month: str = "2025-10") -> Tuple[pd.DataFrame, DataQualityReport]:
-    notes: List[str] = []
-    rows_in = {"leads": len(leads), "campaigns": len(campaigns), "crm": len(crm)}
-    duplicates_removed = {"leads": 0, "crm": 0}
+def load_delta_from_uploads(leads_bytes: Optional[Source] = None, campaigns_bytes: Optional[Source] = None, crm_bytes: Optional[Source] = None) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    # Daily extracts: any of the three files may be missing
+    leads, campaigns, crm = load_concurrently(
+        lambda: read_leads_csv(leads_bytes) if leads_bytes else None,
+        lambda: pd.read_json(_buffer(campaigns_bytes)) if campaigns_bytes else None,
+        lambda: read_crm_xlsx(crm_bytes) if crm_bytes else None,
+    )
+    return leads, campaigns, crm
+
+@dataclass
+class StarDataset:
+    # Lead-level facts (leads + CRM) and the per-channel campaign dimension, joined on demand
+    facts: pd.DataFrame
+    campaigns: pd.DataFrame
+    key: str = "channel"
+    # Campaign x day measures behind the trend view (timeseries.kpi_series); None in old snapshots
+    daily: Optional[pd.DataFrame] = None
+
+    def wide(self, rows: Optional[int] = None) -> pd.DataFrame:
+        facts = self.facts if rows is None else self.facts.head(rows)
+        # Integers narrowed by compact_frame go back to int64: exported and displayed as before
+        narrowed = {c: "int64" for c, t in facts.dtypes.items() if t.kind == "i" and t.itemsize < 8}
+        return facts.astype(narrowed).merge(self.campaigns, on=self.key, how="left", validate="many_to_one")
+
+@dataclass(frozen=True)
+class Period:
+    # Whole days: `end` is the last day included (00:00); rows are kept up to `stop`, exclusive,
+    # so timestamps during the last day stay in scope
+    start: pd.Timestamp
+    end: pd.Timestamp
+    label: str
+
+    @property
+    def stop(self) -> pd.Timestamp:
+        return self.end + pd.Timedelta(days=1)
 
-    leads = leads.copy()
-    crm = crm.copy()
-    campaigns = campaigns.copy()
+    @property
+    def slug(self) -> str:
+        # File-system safe name (output directories, snapshot names)
+        return self.label if self.label.replace("-", "").isalnum() else f"{self.start:%Y-%m-%d}_{self.end:%Y-%m-%d}"
 
+def month_period(month: str) -> Period:
+    start = pd.to_datetime(f"{month}-01")
+    return Period(start, start + pd.offsets.MonthEnd(1), month)
+
+def week_period(day) -> Period:
+    start = pd.Timestamp(day).normalize()
+    start = start - pd.Timedelta(days=start.weekday())
+    return Period(start, start + pd.Timedelta(days=6), f"semaine du {start:%Y-%m-%d}")
+
+def quarter_period(quarter: str) -> Period:
+    q = pd.Period(quarter, freq="Q")
+    return Period(q.start_time, q.end_time.normalize(), str(q))
+
+def custom_period(start, end) -> Period:
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    return Period(start, end, f"{start:%Y-%m-%d} → {end:%Y-%m-%d}")
+
+def as_period(scope: Union[str, Period]) -> Period:
+    return scope if isinstance(scope, Period) else month_period(scope)
+
+def parse_period(text: str) -> Period:
+    # "2025-10" (mois), "2025Q4" (trimestre), "2025-10-06:2025-10-19" (dates incluses)
+    text = text.strip()
+    if ":" in text:
+        start, end = text.split(":", 1)
+        return custom_period(start, end)
+    if "Q" in text.upper():
+        return quarter_period(text.upper())
+    return month_period(text)
+
+@dataclass
+class LeadsScan:
+    leads: pd.DataFrame
+    rows_in: int
+    profile: Dict[str, Dict[str, int]]
+    duplicates_removed: int
+    validation: Optional[ValidationAccumulator] = None
+
+@dataclass
+class CampaignsScan:
+    # Streaming alternative to the campaigns frame: only the totals are kept, per channel
+    # (as aggregate_campaigns) and per campaign and day (as campaign_daily)
+    campaigns: pd.DataFrame
+    daily: pd.DataFrame
+    rows_in: int
+    profile: Dict[str, Dict[str, int]]
+    rejected: Dict[str, int]
+    validation: Optional[ValidationAccumulator] = None
+
+@dataclass
+class LeadsIndex:
+    # Normalized leads on valid channels, sorted by date so any period is a searchsorted slice
+    leads: pd.DataFrame
+    dates: np.ndarray
+    rows_in: int
+    profile: Dict[str, Dict[str, int]]
+
+def normalize_leads(leads: pd.DataFrame) -> pd.DataFrame:
     # Types
     leads["date"] = pd.to_datetime(leads.get("date"), errors="coerce")
 
-    # Normalize leads
-    def norm_channel(x):
-        if pd.isna(x):
-            return np.nan
-        s = str(x).strip()
-        if not s:
-            return np.nan
-        return CHANNEL_NORMALIZATION.get(s.lower(), s)
-
-    def norm_device(x):
-        if pd.isna(x):
-            return np.nan
-        s = str(x).strip()
-        if not s:
-            return np.nan
-        return DEVICE_NORMALIZATION.get(s.lower(), s.title())
-
-    leads["channel"] = leads.get("channel").apply(norm_channel)
-    leads["device"] = leads.get("device").apply(norm_device)
-
-    # Normalize CRM
+    # Normalize leads (categoricals while filtering, object columns on output)
+    leads["channel"] = normalize_categorical(leads.get("channel"), norm_channel)
+    leads["device"] = normalize_categorical(leads.get("device"), norm_device)
+    return leads
+
+def _scope_leads(leads: pd.DataFrame, period: Period, channels: List[str]) -> pd.DataFrame:
+    # Scope filter
+    leads = leads[(leads["date"] >= period.start) & (leads["date"] < period.stop)]
+
+    # Keep valid channels only
+    return leads[leads["channel"].isin(channels)]
+
+def _dedup_leads(leads: pd.DataFrame) -> pd.DataFrame:
+    # Earliest row per lead_id, sorted by lead_id
+    return keep_best(leads, "lead_id", "date")
+
+def index_leads(leads: pd.DataFrame, channels: List[str] = VALID_CHANNELS, validation: Optional[ValidationAccumulator] = None) -> LeadsIndex:
+    raw = leads
+    with stage("normalize_leads", len(leads)) as s:
+        leads = normalize_leads(leads.copy())
+        s["rows_out"] = len(leads)
+    if validation is not None:
+        with stage("validate_leads", len(leads)) as s:
+            validation.add("leads", leads, raw)
+            s["rows_out"] = len(leads)
+    return index_normalized_leads(leads, channels)
+
+def index_normalized_leads(leads: pd.DataFrame, channels: List[str] = VALID_CHANNELS) -> LeadsIndex:
+    with stage("profile_leads", len(leads)) as s:
+        profile = profile_columns(leads)
+        s["rows_out"] = len(leads)
+    with stage("index_leads", len(leads)) as s:
+        kept = leads[leads["channel"].isin(channels) & leads["date"].notna()]
+        # Stable sort: rows sharing a date keep their file order, so dedup ties resolve as before
+        kept = kept.sort_values("date", kind="stable")
+        s["rows_out"] = len(kept)
+    return LeadsIndex(kept, kept["date"].to_numpy(), len(leads), profile)
+
+def slice_period(index: LeadsIndex, period: Period) -> pd.DataFrame:
+    lo = np.searchsorted(index.dates, period.start.to_datetime64(), side="left")
+    hi = np.searchsorted(index.dates, period.stop.to_datetime64(), side="left")
+    return index.leads.iloc[lo:hi]
+
+def available_months(index: LeadsIndex) -> List[str]:
+    if not len(index.dates):
+        return []
+    first, last = pd.Timestamp(index.dates[0]), pd.Timestamp(index.dates[-1])
+    return [str(p) for p in pd.period_range(first, last, freq="M")]
+
+def scan_leads_csv(source: Union[Source, io.IOBase], period: Union[str, Period] = DEFAULT_MONTH, channels: List[str] = VALID_CHANNELS, chunksize: int = 250_000) -> LeadsScan:
+    # Streaming alternative to index_leads: only the used columns are parsed, and the scope,
+    # channel and per-chunk dedup filters run before anything is kept in memory
+    period = as_period(period)
+    rows_in = 0
+    in_scope = 0
+    profile = ProfileAccumulator()
+    validation = ValidationAccumulator(VALIDATION_RULES)
+    kept: List[pd.DataFrame] = []
+    for raw in read_leads_csv(source, usecols=LEADS_COLUMNS, chunksize=chunksize):
+        chunk = normalize_leads(raw.copy(deep=False))
+        rows_in += len(chunk)
+        profile.add(chunk)
+        validation.add("leads", chunk, raw)
+        scoped = _scope_leads(chunk, period, channels)
+        in_scope += len(scoped)
+        scoped = _dedup_leads(scoped)
+        scoped["channel"] = decategorize(scoped["channel"])
+        scoped["device"] = decategorize(scoped["device"])
+        kept.append(scoped)
+    # Chunks are concatenated in file order, so the stable sort keeps the same winner on date ties
+    leads = _dedup_leads(pd.concat(kept)) if kept else pd.DataFrame(columns=LEADS_COLUMNS)
+    return LeadsScan(leads, rows_in, profile.result(), in_scope - len(leads), validation)
+
+def _is_number(values: pd.Series) -> np.ndarray:
+    # JSON numbers only: a column the constructor already typed as int/float is all numbers;
+    # otherwise (strings, booleans, mixed) each value's type is checked
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return np.ones(len(values), dtype=bool)
+    return values.map(type).isin([int, float]).to_numpy() | values.isna().to_numpy()
+
+def _validate_campaigns(batch: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    # Measures must be JSON numbers (or missing) and cost non-negative; a row is counted under
+    # the first rule it breaks
+    rejected: Dict[str, int] = {}
+    bad = np.zeros(len(batch), dtype=bool)
+    for m in MEASURES:
+        wrong = ~_is_number(batch[m]) & ~bad
+        if wrong.any():
+            rejected[f"non_numeric_{m}"] = int(wrong.sum())
+            bad |= wrong
+    negative = (pd.to_numeric(batch["cost"].where(~bad), errors="coerce") < 0).to_numpy() & ~bad
+    if negative.any():
+        rejected["negative_cost"] = int(negative.sum())
+        bad |= negative
+    if not bad.any():
+        return batch, rejected
+    valid = batch[~bad]
+    return valid.assign(**{m: pd.to_numeric(valid[m]) for m in MEASURES}), rejected
+
+def _fold_campaigns(agg: List[pd.DataFrame], daily: List[pd.DataFrame]) -> None:
+    # Partial totals summed in place: one frame per level left
+    agg[:] = [aggregate_campaigns(pd.concat(agg))]
+    daily[:] = [campaign_daily(pd.concat(daily))]
+
+def scan_campaigns_json(source: Union[Source, io.IOBase], batch_rows: int = 50_000, fold_rows: int = 1_000_000) -> CampaignsScan:
+    # Records are parsed one at a time, projected on CAMPAIGN_FIELDS per batch, validated and
+    # reduced to per-batch totals, folded together once `fold_rows` partial rows are pending:
+    # memory follows the number of channels and campaign days, not the file size
+    rows_in = 0
+    seen: set = set()
+    rejected: Dict[str, int] = {}
+    profile = ProfileAccumulator()
+    validation = ValidationAccumulator(VALIDATION_RULES)
+    agg: List[pd.DataFrame] = []
+    daily: List[pd.DataFrame] = []
+    for records in batches(iter_json_records(_buffer(source)), batch_rows):
+        rows_in += len(records)
+        objects = [r for r in records if isinstance(r, dict)]
+        if len(objects) < len(records):
+            rejected["not_an_object"] = rejected.get("not_an_object", 0) + len(records) - len(objects)
+        batch = pd.DataFrame(objects, columns=CAMPAIGN_FIELDS)
+        present = batch.notna().any()
+        seen.update(present[present].index)
+        if not present["campaign_id"]:
+            batch["campaign_id"] = batch["channel"]
+        profile.add(batch)
+        valid, batch_rejected = _validate_campaigns(batch)
+        for reason, n in batch_rejected.items():
+            rejected[reason] = rejected.get(reason, 0) + n
+        validation.add("campaigns", valid)
+        agg.append(aggregate_campaigns(valid))
+        daily.append(campaign_daily(valid))
+        if sum(len(d) for d in daily) > fold_rows:
+            _fold_campaigns(agg, daily)
+    if not agg:
+        empty = pd.DataFrame(columns=CAMPAIGN_FIELDS)
+        agg, daily = [aggregate_campaigns(empty)], [campaign_daily(empty)]
+    _fold_campaigns(agg, daily)
+    profile_result = {c: p for c, p in profile.result().items() if c in seen}
+    return CampaignsScan(agg[0], daily[0], rows_in, profile_result, rejected, validation)
+
+@dataclass
+class PreparedSources:
+    # Everything that does not depend on the period: re-scoping only slices, dedups and merges
+    leads: Union[LeadsIndex, LeadsScan]
+    crm: pd.DataFrame
+    campaigns: pd.DataFrame
+    rows_in: Dict[str, int]
+    crm_duplicates_removed: int
+    profile_before: Dict[str, Dict[str, Dict[str, int]]]
+    stages: List[Dict[str, object]] = field(default_factory=list)
+    daily: Optional[pd.DataFrame] = None
+    rejected: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    validation: Dict[str, Dict[str, object]] = field(default_factory=dict)
+
+def normalize_crm(crm: pd.DataFrame) -> pd.DataFrame:
     for col in ["company_size","sector","region","status"]:
         if col not in crm.columns:
             crm[col] = np.nan
 
-    crm["company_size"] = crm["company_size"].astype(str).str.strip().replace(COMPANY_SIZE_NORMALIZATION)
-    crm["company_size"] = crm["company_size"].replace({"": np.nan, "nan": np.nan})
-    crm["sector"] = crm["sector"].astype(str).str.strip().replace({"": np.nan, "nan": np.nan})
-    crm["region"] = crm["region"].astype(str).str.strip().replace(REGION_NORMALIZATION)
-    crm["region"] = crm["region"].replace({"": np.nan, "nan": np.nan})
-    crm["status"] = crm["status"].astype(str).str.strip().replace({"": np.nan, "nan": np.nan})
-
-    missing_before = {"leads": _count_missing(leads), "crm": _count_missing(crm), "campaigns": _count_missing(campaigns)}
+    crm["company_size"] = normalize_values(crm["company_size"], norm_company_size)
+    crm["sector"] = normalize_values(crm["sector"], norm_blank)
+    crm["region"] = normalize_values(crm["region"], norm_region)
+    crm["status"] = normalize_values(crm["status"], norm_blank)
+    return crm
 
-    # Scope filter
-    month_start = pd.to_datetime(f"{month}-01")
-    month_end = month_start + pd.offsets.MonthEnd(1)
-    leads = leads[(leads["date"] >= month_start) & (leads["date"] <= month_end)]
+def _status_rank(status: pd.Series) -> pd.Series:
+    return status.map(STATUS_RANK).fillna(-1)
 
-    # Keep valid channels only
-    leads = leads[leads["channel"].isin(VALID_CHANNELS)]
-
-    # Dedup leads
-    before_leads = len(leads)
-    leads = leads.sort_values(["lead_id", "date"]).drop_duplicates(subset=["lead_id"], keep="first")
-    duplicates_removed["leads"] = before_leads - len(leads)
-
-    # Dedup CRM keeping best status
-    crm["_rank"] = crm["status"].map(STATUS_RANK).fillna(-1)
-    before_crm = len(crm)
-    crm = crm.sort_values(["lead_id","_rank"], ascending=[True, False]).drop_duplicates(subset=["lead_id"], keep="first")
-    crm = crm.drop(columns=["_rank"])
-    duplicates_removed["crm"] = before_crm - len(crm)
-
-    # Aggregate campaigns per channel (multiple campaigns allowed)
-    agg = campaigns.groupby("channel", as_index=False).agg(
-        cost=("cost","sum"),
-        impressions=("impressions","sum"),
-        clicks=("clicks","sum"),
-        conversions=("conversions","sum"),
-    )
+def dedup_crm(crm: pd.DataFrame) -> pd.DataFrame:
+    # Keep the best status per lead_id
+    return crm.iloc[best_positions(crm["lead_id"], _status_rank(crm["status"]), ascending=False)]
 
-    # Merge
-    df = leads.merge(crm, on="lead_id", how="left", validate="one_to_one")
-    df = df.merge(agg, on="channel", how="left", validate="many_to_one")
+def aggregate_campaigns(campaigns: pd.DataFrame) -> pd.DataFrame:
+    # Per-channel sums (multiple campaigns allowed); also folds already aggregated frames together
+    return sum_measures(campaigns, "channel", as_index=False)
 
-    notes += [
-        f"Périmètre appliqué: {month} (Octobre 2025).",
-        "Exclusions: dates hors octobre + canaux invalides + doublons lead_id.",
+def _scope_notes(period: Period) -> List[str]:
+    return [
+        f"Périmètre appliqué: {period.label} ({period.start:%Y-%m-%d} → {period.end:%Y-%m-%d}).",
+        "Exclusions: dates hors périmètre + canaux invalides + doublons lead_id.",
         "Normalisation: channel/device/company_size/region.",
         "Campagnes: agrégation par canal (sommes).",
     ]
 
+def prepare_sources(leads: Union[pd.DataFrame, LeadsScan], campaigns: Union[pd.DataFrame, CampaignsScan], crm: pd.DataFrame) -> PreparedSources:
+    with recording() as rec:
+        validation = ValidationAccumulator(VALIDATION_RULES)
+        if isinstance(leads, LeadsScan):
+            validation.merge(leads.validation or ValidationAccumulator(VALIDATION_RULES))
+        else:
+            leads = index_leads(leads, validation=validation)
+        scanned = isinstance(campaigns, CampaignsScan)
+        campaign_rows = campaigns.rows_in if scanned else len(campaigns)
+        rows_in = {"leads": leads.rows_in, "campaigns": campaign_rows, "crm": len(crm)}
+
+        with stage("normalize_crm", len(crm)) as s:
+            crm = normalize_crm(crm.copy())
+            campaigns = campaigns if scanned else campaigns.copy()
+            s["rows_out"] = len(crm)
+
+        with stage("profile_sources", len(crm) + campaign_rows) as s:
+            campaign_profile = campaigns.profile if scanned else profile_columns(campaigns)
+            profile_before = {"leads": leads.profile, "crm": profile_columns(crm), "campaigns": campaign_profile}
+            s["rows_out"] = len(crm) + campaign_rows
+
+        with stage("dedup_crm", len(crm)) as s:
+            deduped = dedup_crm(crm)
+            s["rows_out"] = len(deduped)
+
+        if scanned:
+            # Totals were folded while reading
+            agg, daily = campaigns.campaigns, campaigns.daily
+            rejected = {"campaigns": dict(campaigns.rejected)}
+        else:
+            with stage("aggregate_campaigns", len(campaigns)) as s:
+                agg = aggregate_campaigns(campaigns)
+                s["rows_out"] = len(agg)
+
+            with stage("campaign_daily", len(campaigns)) as s:
+                daily = campaign_daily(campaigns)
+                s["rows_out"] = len(daily)
+            rejected = {}
+
+        with stage("validate_sources", len(crm) + campaign_rows) as s:
+            # Leads were checked while normalized; CRM and campaigns here, then the cross-source keys
+            validation.add("crm", crm)
+            if scanned:
+                validation.merge(campaigns.validation or ValidationAccumulator(VALIDATION_RULES))
+            else:
+                validation.add("campaigns", campaigns)
+            checks = validation.result()
+            s["rows_out"] = sum(int(r["count"]) for r in checks.values())
+        stages = list(rec.stages)
+    return PreparedSources(leads, deduped, agg, rows_in, len(crm) - len(deduped), profile_before, stages, daily, rejected, checks)
+
+def _compact_column(s: pd.Series, categorical: bool) -> pd.Series:
+    # Lossless only: categories are the sorted distinct strings (same groupby and sort order as
+    # the plain column), integers take the narrowest type holding their range. Floats stay
+    # 64-bit so their CSV rendering is unchanged.
+    if categorical and (s.dtype == object or pd.api.types.is_string_dtype(s.dtype)):
+        return s.astype("category")
+    if pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+def compact_frame(df: pd.DataFrame, dimensions: List[str] = COMPACT_DIMENSIONS) -> pd.DataFrame:
+    return df.assign(**{c: _compact_column(df[c], c in dimensions) for c in df.columns})
+
+def _footprint(dataset: StarDataset) -> Dict[str, int]:
+    return {
+        "facts": int(dataset.facts.memory_usage(index=True, deep=True).sum()),
+        "campaigns": int(dataset.campaigns.memory_usage(index=True, deep=True).sum()),
+    }
+
+def compact_dataset(dataset: StarDataset) -> Tuple[StarDataset, Dict[str, Dict[str, int]]]:
+    # Facts dimensions to categoricals and narrowed integers. The campaign table is a handful of
+    # rows: it keeps its dtypes, so the KPI and wide frames built from it keep int64 measures
+    compact = StarDataset(compact_frame(dataset.facts), dataset.campaigns, dataset.key, dataset.daily)
+    return compact, {"before": _footprint(dataset), "after": _footprint(compact)}
+
+def scope_dataset(prepared: PreparedSources, period: Period) -> Tuple[StarDataset, DataQualityReport]:
+    with recording() as rec:
+        if isinstance(prepared.leads, LeadsScan):
+            # Streaming scans already applied their period while reading
+            leads = prepared.leads.leads
+            dup_leads = prepared.leads.duplicates_removed
+        else:
+            with stage("scope", len(prepared.leads.leads)) as s:
+                scoped = slice_period(prepared.leads, period)
+                s["rows_out"] = len(scoped)
+            with stage("dedup_leads", len(scoped)) as s:
+                leads = _dedup_leads(scoped)
+                s["rows_out"] = len(leads)
+            dup_leads = len(scoped) - len(leads)
+
+        # Merge CRM into the lead facts; campaigns stay a channel dimension (StarDataset.wide joins them)
+        agg = prepared.campaigns
+        with stage("merge", len(leads)) as s:
+            leads = leads.assign(channel=decategorize(leads["channel"]), device=decategorize(leads["device"]))
+            df = leads.merge(prepared.crm, on="lead_id", how="left", validate="one_to_one")
+            s["rows_out"] = len(df)
+        with stage("compact", len(df)) as s:
+            dataset, memory = compact_dataset(StarDataset(df, agg, daily=prepared.daily))
+            df, agg = dataset.facts, dataset.campaigns
+            s["rows_out"] = len(df)
+
+        with stage("profile_final", len(df)) as s:
+            profile_after = {"final": profile_star(df, agg, "channel")}
+            s["rows_out"] = len(df)
+        stages = prepared.stages + rec.stages
     dq = DataQualityReport(
-        rows_in=rows_in,
+        rows_in=dict(prepared.rows_in),
         rows_out={"final": len(df)},
-        duplicates_removed=duplicates_removed,
-        missing_before=missing_before,
-        missing_after={"final": _count_missing(df)},
-        notes=notes,
+        duplicates_removed={"leads": dup_leads, "crm": prepared.crm_duplicates_removed},
+        missing_before={k: missing_counts(p) for k, p in prepared.profile_before.items()},
+        missing_after={k: missing_counts(p) for k, p in profile_after.items()},
+        notes=_scope_notes(period),
+        period=period.label,
+        profile_before=prepared.profile_before,
+        profile_after=profile_after,
+        stages=stages,
+        memory_bytes=memory,
+        rejected=dict(prepared.rejected),
+        validation=dict(prepared.validation),
     )
-    return df, dq
+    return dataset, dq
+
+def clean_and_prepare(leads: Union[pd.DataFrame, LeadsScan], campaigns: Union[pd.DataFrame, CampaignsScan], crm: pd.DataFrame, month: Union[str, Period] = DEFAULT_MONTH) -> Tuple[StarDataset, DataQualityReport]:
+    return scope_dataset(prepare_sources(leads, campaigns, crm), as_period(month))
+
+def prepare_cached(leads_bytes: Source, campaigns_bytes: Source, crm_bytes: Source, stream_period: Optional[Period] = None) -> Tuple[PreparedSources, str]:
+    # Period-independent stage keyed on the uploaded content; streaming pushes the period into the read
+    key = _prepare_key(leads_bytes, campaigns_bytes, crm_bytes, stream_period)
+
+    def prepare():
+        with recording():
+            if stream_period is not None:
+                # Chunked leads scan (parse + normalize + scope + dedup) and streamed campaign totals
+                # alongside the XLSX
+                with stage("parse_scan_leads") as s:
+                    scan, campaigns, crm = load_concurrently(
+                        lambda: scan_leads_csv(leads_bytes, stream_period),
+                        lambda: scan_campaigns_json(campaigns_bytes),
+                        lambda: read_crm_xlsx(crm_bytes),
+                    )
+                    s["rows_out"] = scan.rows_in + campaigns.rows_in + len(crm)
+                return prepare_sources(scan, campaigns, crm)
+            with stage("parse") as s:
+                sources = load_raw_from_uploads(leads_bytes, campaigns_bytes, crm_bytes)
+                s["rows_out"] = sum(len(df) for df in sources)
+            return prepare_sources(*sources)
+
+    # Byte-bounded, and counted against the dataset store's budget
+    return stage_cache("prepare", maxsize=4, max_bytes=CACHE_BUDGET_BYTES).get_or_compute(key, prepare), key
+
+def _prepare_key(leads_bytes: Source, campaigns_bytes: Source, crm_bytes: Source, stream_period: Optional[Period]) -> str:
+    return content_hash(*map(source_digest, (leads_bytes, campaigns_bytes, crm_bytes)), stream_period)
+
+def load_and_clean_cached(leads_bytes: Source, campaigns_bytes: Source, crm_bytes: Source, period: Union[str, Period] = DEFAULT_MONTH, stream_leads: bool = False) -> Tuple[StarDataset, DataQualityReport, str]:
+    # Reruns on identical files skip parsing and cleaning; a new period only re-slices. Scoped
+    # datasets live in the dataset store itself (sessions then publish the same key), so evicting
+    # one there frees it.
+    period = as_period(period)
+    stream_period = period if stream_leads else None
+    version = content_hash(_prepare_key(leads_bytes, campaigns_bytes, crm_bytes, stream_period), period)
+    store = get_store()
+    scoped = store.get(version)
+    if scoped is None:
+        prepared, _ = prepare_cached(leads_bytes, campaigns_bytes, crm_bytes, stream_period)
+        scoped = store.put(version, scope_dataset(prepared, period))
+    dataset, dq = scoped
+    return dataset, dq, version
+
+def frames_digest(*frames: pd.DataFrame) -> str:
+    # Content digest of parsed frames, for callers that have no digest of the files they came from
+    return content_hash(*(
+        part for df in frames
+        for part in (tuple(df.columns), pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    ))
+
+class _KeyedTable:
+    # One row per key: rows are addressed through a dict and columns are numpy arrays grown by
+    # doubling, so upserting k rows costs O(k) amortized whatever the number of stored rows
+    def __init__(self, df: pd.DataFrame, key: str):
+        self.key = key
+        self._dtypes = dict(df.dtypes)
+        self._cols = {c: df[c].to_numpy(copy=True) for c in df.columns}
+        self._rows = {k: i for i, k in enumerate(df[key].tolist())}
+        self._size = len(df)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def positions(self, keys: pd.Series) -> np.ndarray:
+        return np.fromiter((self._rows.get(k, -1) for k in keys.tolist()), dtype=np.int64, count=len(keys))
+
+    def column(self, name: str, positions: np.ndarray) -> np.ndarray:
+        return self._cols[name][positions]
+
+    def _values(self, name: str, rows: pd.DataFrame) -> np.ndarray:
+        values = rows[name].to_numpy() if name in rows.columns else np.full(len(rows), np.nan, dtype=object)
+        if not np.can_cast(values.dtype, self._cols[name].dtype, casting="same_kind"):
+            # e.g. a missing value landing in an integer column: widen once, dtype re-inferred on output
+            self._cols[name] = self._cols[name].astype(object)
+            self._dtypes.pop(name, None)
+        return values
+
+    def update(self, positions: np.ndarray, rows: pd.DataFrame) -> None:
+        for c in list(self._cols):
+            values = self._values(c, rows)
+            self._cols[c][positions] = values
+
+    def append(self, rows: pd.DataFrame) -> None:
+        end = self._size + len(rows)
+        for c in list(self._cols):
+            values = self._values(c, rows)
+            arr = self._cols[c]
+            if end > len(arr):
+                grown = np.empty(max(end, 2 * len(arr), 16), dtype=arr.dtype)
+                grown[:self._size] = arr[:self._size]
+                self._cols[c] = arr = grown
+            arr[self._size:end] = values
+        for i, k in enumerate(rows[self.key].tolist(), start=self._size):
+            self._rows[k] = i
+        self._size = end
+
+    def frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({c: arr[:self._size] for c, arr in self._cols.items()})
+        return df.astype(self._dtypes).infer_objects()
+
+class IncrementalDataset:
+    # Period-scoped dataset that daily lead / CRM / campaign extracts are appended to. The cleaning
+    # rules only run on the delta rows: earliest lead per lead_id, best CRM status per STATUS_RANK
+    # (ties keep the row ingested first, as a full rerun on the concatenated history would),
+    # campaign sums and report counters. Facts and report are rebuilt on demand.
+    # `digest` identifies the base files (load_and_clean_cached's version); the version of the
+    # dataset chains it with every extract appended, so different bases never share a version.
+    def __init__(self, leads: pd.DataFrame, campaigns: pd.DataFrame, crm: pd.DataFrame, period: Union[str, Period] = DEFAULT_MONTH, digest: Optional[str] = None):
+        self.period = as_period(period)
+        self.base = digest or frames_digest(leads, campaigns, crm)
+        self.version = content_hash("incremental", self.period)
+        self.applied: List[str] = []
+        self._rows_in = {"leads": 0, "campaigns": 0, "crm": 0}
+        self._duplicates = {"leads": 0, "crm": 0}
+        self._profiles = {k: ProfileAccumulator() for k in ("leads", "crm", "campaigns")}
+        self._validation = ValidationAccumulator(VALIDATION_RULES)
+        self._leads: Optional[_KeyedTable] = None
+        self._crm: Optional[_KeyedTable] = None
+        self._campaigns = aggregate_campaigns(campaigns.iloc[:0])
+        self._daily = campaign_daily(campaigns.iloc[:0])
+        self._built: Optional[Tuple[StarDataset, DataQualityReport]] = None
+        self._stages: List[Dict[str, object]] = []
+        self._ingest(leads, crm, campaigns, self.base)
+
+    @property
+    def nbytes(self) -> int:
+        # What the dataset store counts for the session holding it (the built dataset is published
+        # on its own)
+        tables = [t for t in (self._leads, self._crm) if t is not None]
+        return sum(nbytes(list(t._cols.values())) for t in tables) + nbytes((self._campaigns, self._daily))
+
+    def append(self, leads: Optional[pd.DataFrame] = None, crm: Optional[pd.DataFrame] = None, campaigns: Optional[pd.DataFrame] = None, digest: Optional[str] = None) -> bool:
+        # digest identifies the extract: appending the same files twice is a no-op
+        digest = digest or frames_digest(*(df for df in (leads, crm, campaigns) if df is not None))
+        if digest in self.applied:
+            return False
+        self.applied.append(digest)
+        self._ingest(leads, crm, campaigns, digest)
+        return True
+
+    def _ingest(self, leads: Optional[pd.DataFrame], crm: Optional[pd.DataFrame], campaigns: Optional[pd.DataFrame], digest: str) -> None:
+        with recording() as rec:
+            if leads is not None:
+                with stage("append_leads", len(leads)) as s:
+                    s["rows_out"] = self._append_leads(leads)
+            if crm is not None:
+                with stage("append_crm", len(crm)) as s:
+                    s["rows_out"] = self._append_crm(crm)
+            if campaigns is not None:
+                with stage("append_campaigns", len(campaigns)) as s:
+                    self._rows_in["campaigns"] += len(campaigns)
+                    self._profiles["campaigns"].add(campaigns)
+                    self._validation.add("campaigns", campaigns)
+                    self._campaigns = aggregate_campaigns(pd.concat([self._campaigns, aggregate_campaigns(campaigns)]))
+                    self._daily = campaign_daily(pd.concat([self._daily, campaign_daily(campaigns)]))
+                    s["rows_out"] = len(self._campaigns)
+            self._stages.extend(rec.stages)
+        self.version = content_hash(self.version, digest, self._rows_in)
+        self._built = None
+
+    def _append_leads(self, leads: pd.DataFrame) -> int:
+        raw = leads
+        leads = normalize_leads(leads.copy())
+        self._rows_in["leads"] += len(leads)
+        self._profiles["leads"].add(leads)
+        self._validation.add("leads", leads, raw)
+        scoped = _scope_leads(leads, self.period, VALID_CHANNELS)
+        delta = _dedup_leads(scoped)
+        delta = delta.assign(channel=decategorize(delta["channel"]), device=decategorize(delta["device"]))
+        if self._leads is None:
+            self._leads = _KeyedTable(delta, "lead_id")
+            new = np.ones(len(delta), dtype=bool)
+        else:
+            pos = self._leads.positions(delta["lead_id"])
+            new = pos < 0
+            # Earliest date wins; on equal dates the lead already ingested stays
+            earlier = np.zeros(len(delta), dtype=bool)
+            earlier[~new] = delta["date"].to_numpy()[~new] < self._leads.column("date", pos[~new])
+            self._leads.update(pos[earlier], delta[earlier])
+            self._leads.append(delta[new])
+        self._duplicates["leads"] += len(scoped) - int(new.sum())
+        return len(self._leads)
+
+    def _append_crm(self, crm: pd.DataFrame) -> int:
+        crm = normalize_crm(crm.copy())
+        self._rows_in["crm"] += len(crm)
+        self._profiles["crm"].add(crm)
+        self._validation.add("crm", crm)
+        delta = dedup_crm(crm)
+        if self._crm is None:
+            self._crm = _KeyedTable(delta, "lead_id")
+            new = np.ones(len(delta), dtype=bool)
+        else:
+            pos = self._crm.positions(delta["lead_id"])
+            new = pos < 0
+            # Status only moves up the STATUS_RANK ladder
+            upgrade = np.zeros(len(delta), dtype=bool)
+            current = _status_rank(pd.Series(self._crm.column("status", pos[~new]), dtype=object)).to_numpy()
+            upgrade[~new] = _status_rank(delta["status"]).to_numpy()[~new] > current
+            self._crm.update(pos[upgrade], delta[upgrade])
+            self._crm.append(delta[new])
+        self._duplicates["crm"] += len(crm) - int(new.sum())
+        return len(self._crm)
+
+    def build(self) -> Tuple[StarDataset, DataQualityReport]:
+        if self._built is None:
+            with recording() as rec:
+                # Same row order as a full rerun: leads sorted by lead_id, CRM merged on the left
+                with stage("merge", len(self._leads)) as s:
+                    leads = self._leads.frame().sort_values("lead_id", kind="stable", ignore_index=True)
+                    df = leads.merge(self._crm.frame(), on="lead_id", how="left", validate="one_to_one")
+                    s["rows_out"] = len(df)
+                with stage("compact", len(df)) as s:
+                    dataset, memory = compact_dataset(StarDataset(df, self._campaigns, daily=self._daily))
+                    df, agg = dataset.facts, dataset.campaigns
+                    s["rows_out"] = len(df)
+                with stage("profile_final", len(df)) as s:
+                    profile_before = {k: p.result() for k, p in self._profiles.items()}
+                    profile_after = {"final": profile_star(df, agg, "channel")}
+                    s["rows_out"] = len(df)
+                stages = self._stages + rec.stages
+            dq = DataQualityReport(
+                rows_in=dict(self._rows_in),
+                rows_out={"final": len(df)},
+                duplicates_removed=dict(self._duplicates),
+                missing_before={k: missing_counts(p) for k, p in profile_before.items()},
+                missing_after={k: missing_counts(p) for k, p in profile_after.items()},
+                notes=_scope_notes(self.period) + [f"Ingestion incrémentale: {len(self.applied)} lot(s) ajouté(s) à l'historique."],
+                profile_before=profile_before,
+                profile_after=profile_after,
+                stages=stages,
+                memory_bytes=memory,
+                validation=self._validation.result(),
+                period=self.period.label,
+            )
+            self._built = (dataset, dq)
+        return self._built
@@ -0,0 +1,36 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+_MAX = np.iinfo(np.int64).max
+
+def _as_int64(values: pd.Series, ascending: bool) -> np.ndarray:
+    # Order-preserving int64 view where the wanted row has the smallest value and missing
+    # values rank last, as sort_values(na_position="last") leaves them
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        out = values.to_numpy().view(np.int64).copy()
+    elif pd.api.types.is_integer_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        out = values.to_numpy(dtype=np.int64, na_value=0)
+    else:
+        # IEEE-754 bits flipped so that integer order follows float order (negatives included)
+        bits = values.to_numpy(dtype=np.float64, na_value=0.0).view(np.int64)
+        out = bits ^ ((bits >> 63) & _MAX)
+    if not ascending:
+        out = -out
+    out[missing] = _MAX
+    return out
+
+def best_positions(keys: pd.Series, values: pd.Series, ascending: bool = True) -> np.ndarray:
+    # Positions of the row sort_values([key, value]).drop_duplicates(key, keep="first") keeps,
+    # in key order, from grouped min reductions over factorized keys instead of a full sort.
+    # Ties go to the earliest row, like the stable multi-column sort.
+    codes, _ = pd.factorize(keys, sort=True, use_na_sentinel=False)
+    v = _as_int64(values, ascending)
+    best = pd.Series(v).groupby(codes, sort=False).transform("min").to_numpy()
+    hit = np.flatnonzero(v == best)
+    return pd.Series(hit).groupby(codes[hit], sort=True).min().to_numpy()
+
+def keep_best(df: pd.DataFrame, key: str, by: str, ascending: bool = True) -> pd.DataFrame:
+    # One row per key: smallest `by` (largest when ascending=False), sorted by key
+    return df.iloc[best_positions(df[key], df[by], ascending)]
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from cache import CACHE_BUDGET_BYTES, stage_cache
+from data_prep import DataQualityReport
+
+Render = Callable[[], bytes]
+
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+BLOCK_BYTES = 1024 * 1024
+ZIP_LEVEL = 6
+ZIP_WORKERS = min(8, os.cpu_count() or 1)
+# Without ZIP64, sizes and offsets are 32-bit and the entry count 16-bit
+ZIP_MAX_BYTES = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+@dataclass(frozen=True)
+class Deliverable:
+    # Rendered only when asked for; the rendered file is cached per dataset version under filename
+    label: str
+    filename: str
+    mime: str
+    render: Render
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+def report_json(dq: DataQualityReport) -> bytes:
+    return json.dumps({
+        "rows_in": dq.rows_in,
+        "rows_out": dq.rows_out,
+        "duplicates_removed": dq.duplicates_removed,
+        "missing_before": dq.missing_before,
+        "missing_after": dq.missing_after,
+        "profile_before": dq.profile_before,
+        "profile_after": dq.profile_after,
+        "stages": dq.stages,
+        "rejected": dq.rejected,
+        "validation": dq.validation,
+        "notes": dq.notes,
+    }, ensure_ascii=False, indent=2).encode("utf-8")
+
+class SpooledExport:
+    # Rendered file kept in memory up to SPOOL_MAX_BYTES, then on disk; shared by sessions through
+    # the cache. Readers take the lock, the position of the file being shared.
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self.size = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, data: bytes) -> "SpooledExport":
+        spooled = cls()
+        spooled.file.write(data)
+        spooled.size = len(data)
+        return spooled
+
+    @property
+    def nbytes(self) -> int:
+        # Memory held (cache budget): nothing once the file has rolled over to disk
+        return 0 if self.file._rolled else self.size
+
+    def read(self) -> bytes:
+        # Only called when the file is downloaded (deferred download_button data)
+        with self._lock:
+            self.file.seek(0)
+            return self.file.read()
+
+    def chunks(self, size: int = BLOCK_BYTES) -> Iterator[bytes]:
+        offset = 0
+        while True:
+            with self._lock:
+                self.file.seek(offset)
+                chunk = self.file.read(size)
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+def _exports_cache():
+    return stage_cache("exports", maxsize=16, max_bytes=CACHE_BUDGET_BYTES)
+
+def is_rendered(version: Optional[str], filename: str) -> bool:
+    return version is not None and (version, filename) in _exports_cache()
+
+def export_file(version: Optional[str], deliverable: Deliverable) -> SpooledExport:
+    # The rendered bytes only live while they are written out
+    render = lambda: SpooledExport.of(deliverable.render())
+    if version is None:
+        return render()
+    return _exports_cache().get_or_compute((version, deliverable.filename), render)
+
+# ---- ZIP: members cut into blocks deflated in parallel, written in order to a spooled temp file
+
+def _deflate_block(block: bytes, last: bool) -> bytes:
+    # Each block is an independent raw deflate run; a sync flush ends it on a byte boundary
+    # without the final bit, so the concatenation is one valid deflate stream (as pigz does)
+    c = zlib.compressobj(ZIP_LEVEL, zlib.DEFLATED, -15)
+    return c.compress(block) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def _chunks(data: bytes) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for start in range(0, len(view), BLOCK_BYTES):
+        yield view[start:start + BLOCK_BYTES]
+
+def _blocks(chunks: Iterable[bytes]) -> Iterator[Tuple[bytes, bool]]:
+    # One chunk of lookahead to flag the last block (an empty member is one empty last block)
+    it = iter(chunks)
+    block = next(it, b"")
+    for following in it:
+        yield block, False
+        block = following
+    yield block, True
+
+def _dos_datetime(ts: float) -> Tuple[int, int]:
+    t = time.localtime(ts)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def _member_too_large(arcname: str) -> ValueError:
+    return ValueError(f"{arcname}: membre trop volumineux pour une archive ZIP sans ZIP64")
+
+def _archive_too_large() -> ValueError:
+    return ValueError("Archive trop volumineuse pour une archive ZIP sans ZIP64")
+
+def write_zip(members: Iterable[Tuple[str, Union[bytes, Iterable[bytes]]]], sink, workers: int = ZIP_WORKERS) -> None:
+    # Minimal ZIP writer (deflate, UTF-8 names, data descriptors, no ZIP64): zipfile cannot
+    # take members compressed outside its own write path. A member is its bytes or an iterable
+    # of chunks (e.g. SpooledExport.chunks()), read as it is compressed. The 32-bit limits are
+    # checked before each header and as the data goes out, so a struct field never overflows.
+    dos_time, dos_date = _dos_datetime(time.time())
+    central: List[bytes] = []
+    offset = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for arcname, data in members:
+            if offset >= ZIP_MAX_BYTES or len(central) >= ZIP_MAX_ENTRIES:
+                raise _archive_too_large()
+            chunks = _chunks(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+            name = arcname.encode("utf-8")
+            flags = 0x0808
+            header = struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, 8, dos_time, dos_date, 0, 0, 0, len(name), 0) + name
+            sink.write(header)
+            crc, raw, size = 0, 0, 0
+            # Blocks compress in parallel and are written in order; at most 2 x workers blocks
+            # are read ahead
+            pending: Deque[Future] = deque()
+            for block, last in _blocks(chunks):
+                crc, raw = zlib.crc32(block, crc), raw + len(block)
+                pending.append(pool.submit(_deflate_block, block, last))
+                while len(pending) > 2 * workers or (last and pending):
+                    chunk = pending.popleft().result()
+                    size += len(chunk)
+                    if size >= ZIP_MAX_BYTES:
+                        raise _member_too_large(arcname)
+                    sink.write(chunk)
+                if raw >= ZIP_MAX_BYTES:
+                    raise _member_too_large(arcname)
+            sink.write(struct.pack("<IIII", 0x08074B50, crc, size, raw))
+            central.append(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, 8, dos_time, dos_date,
+                crc, size, raw, len(name), 0, 0, 0, 0, 0o644 << 16, offset,
+            ) + name)
+            offset += len(header) + size + 16
+    directory = b"".join(central)
+    if offset >= ZIP_MAX_BYTES or len(directory) >= ZIP_MAX_BYTES:
+        raise _archive_too_large()
+    sink.write(directory)
+    sink.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0))
+
+def _zip_key(version: Optional[str], deliverables: Sequence[Deliverable]) -> Tuple[Optional[str], str]:
+    return version, "zip:" + "|".join(d.filename for d in deliverables)
+
+def export_zip(version: Optional[str], deliverables: Sequence[Deliverable], folder: str = "exports") -> SpooledExport:
+    def build():
+        archive = SpooledExport()
+        # Members are read block by block from the per-deliverable files: the dataset CSV is
+        # serialized once and never held whole again
+        members = ((f"{folder}/{d.filename}", export_file(version, d).chunks()) for d in deliverables)
+        write_zip(members, archive.file)
+        archive.file.flush()
+        archive.size = archive.file.tell()
+        return archive
+
+    if version is None:
+        return build()
+    return _exports_cache().get_or_compute(_zip_key(version, deliverables), build)
+
+def offer_download(version: Optional[str], deliverable: Deliverable, key: Optional[str] = None) -> None:
+    # "Préparer" first, download button once the file is cached for this dataset version; its
+    # bytes are only read when the button is clicked (callable data, streamlit >= 1.52)
+    import streamlit as st
+
+    key = key or deliverable.filename
+    if not is_rendered(version, deliverable.filename):
+        if not st.button(f"⚙️ Préparer — {deliverable.label}", key=f"prepare_{key}"):
+            return
+    st.download_button(deliverable.label, export_file(version, deliverable).read, deliverable.filename, deliverable.mime, key=f"download_{key}")
+
+def offer_zip(version: Optional[str], deliverables: Sequence[Deliverable], label: str, filename: str, key: str = "zip") -> None:
+    import streamlit as st
+
+    if version is None or _zip_key(version, deliverables) not in _exports_cache():
+        if not st.button(f"⚙️ Préparer — {label}", key=f"prepare_{key}"):
+            return
+    with st.spinner("Compression des livrables..."):
+        archive = export_zip(version, deliverables)
+    st.download_button(label, archive.read, filename, "application/zip", key=f"download_{key}")
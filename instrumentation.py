@@ -0,0 +1,134 @@
+from __future__ import annotations
+import contextvars
+import os
+import socket
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+StageRecord = Dict[str, object]
+MetricsSink = Callable[[StageRecord], None]
+
+# Stage memory peak: "rss" samples the resident size in a side thread (Linux, near free),
+# "tracemalloc" counts Python/numpy allocations exactly but makes object-heavy stages several
+# times slower, "off" skips it
+MEMORY_MODE = os.environ.get("NOVARETAIL_STAGE_MEMORY", "rss")
+RSS_SAMPLE_SECONDS = 0.005
+
+_recorder: contextvars.ContextVar[Optional["StageRecorder"]] = contextvars.ContextVar("stage_recorder", default=None)
+_sink: Optional[MetricsSink] = None
+
+class StageRecorder:
+    def __init__(self):
+        self.stages: List[StageRecord] = []
+
+_PAGE_BYTES = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_BYTES
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _RssPeak:
+    # Highest resident size seen while the stage runs, relative to its start
+    def __init__(self):
+        self.base = _rss_bytes()
+        self.peak = self.base
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        if self.base is not None:
+            self._thread.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, _rss_bytes() or 0)
+
+    def stop(self) -> Optional[float]:
+        if self.base is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes() or 0)
+        return round((self.peak - self.base) / 2**20, 3)
+
+@contextmanager
+def recording() -> Iterator[StageRecorder]:
+    # Joins the recorder already active in this context, so nested pipeline steps share one list
+    current = _recorder.get()
+    if current is not None:
+        yield current
+        return
+    recorder = StageRecorder()
+    token = _recorder.set(recorder)
+    started = MEMORY_MODE == "tracemalloc" and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield recorder
+    finally:
+        if started:
+            tracemalloc.stop()
+        _recorder.reset(token)
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None) -> Iterator[StageRecord]:
+    # Wall time, rows in/out (rows_out set by the caller) and memory peak of one step;
+    # a no-op outside recording(). The peak is process-wide: concurrent sessions add to it.
+    record: StageRecord = {"stage": name, "rows_in": rows_in, "rows_out": None}
+    recorder = _recorder.get()
+    if recorder is None:
+        yield record
+        return
+    tracing = MEMORY_MODE == "tracemalloc" and tracemalloc.is_tracing()
+    rss = _RssPeak() if MEMORY_MODE == "rss" else None
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = round(time.perf_counter() - t0, 6)
+        if tracing:
+            record["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - base) / 2**20, 3)
+        else:
+            record["peak_mb"] = rss.stop() if rss is not None else None
+        recorder.stages.append(record)
+        _emit(record)
+
+# ---- Optional metrics hook
+
+def set_metrics_sink(sink: Optional[MetricsSink]) -> None:
+    global _sink
+    _sink = sink
+
+def _emit(record: StageRecord) -> None:
+    if _sink is None:
+        return
+    try:
+        _sink(record)
+    except Exception:
+        # Metrics must never break a run
+        pass
+
+def statsd_sink(host: str = "127.0.0.1", port: int = 8125, prefix: str = "novaretail") -> MetricsSink:
+    # Fire-and-forget UDP in the StatsD line format: timers in ms, gauges for rows and memory
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def sink(record: StageRecord) -> None:
+        name = f"{prefix}.{record['stage']}"
+        lines = [f"{name}.duration:{record['seconds'] * 1000:.3f}|ms"]
+        for key in ("rows_in", "rows_out", "peak_mb"):
+            if record.get(key) is not None:
+                lines.append(f"{name}.{key}:{record[key]}|g")
+        sock.sendto("\n".join(lines).encode("ascii"), (host, port))
+    return sink
+
+# NOVARETAIL_STATSD=host:port sends every stage to a local StatsD agent
+if os.environ.get("NOVARETAIL_STATSD"):
+    _host, _, _port = os.environ["NOVARETAIL_STATSD"].partition(":")
+    set_metrics_sink(statsd_sink(_host or "127.0.0.1", int(_port or 8125)))
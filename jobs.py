@@ -0,0 +1,173 @@
+from __future__ import annotations
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Worker pool shared by every session: at most JOB_WORKERS pipelines run at once, at most
+# JOB_QUEUE_LIMIT more wait; past that a submission is refused instead of piling up
+JOB_WORKERS = int(os.environ.get("NOVARETAIL_JOB_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+JOB_QUEUE_LIMIT = int(os.environ.get("NOVARETAIL_JOB_QUEUE", str(2 * JOB_WORKERS)))
+FINISHED_KEEP = 32  # finished jobs kept until their sessions collect the result
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+class JobCancelled(Exception):
+    pass
+
+class JobRejected(RuntimeError):
+    pass
+
+class Job:
+    # `fn` receives a progress callback (stage, done, total); the callback raises JobCancelled once
+    # cancellation is requested, so a job stops between two stages. `cleanup` runs once the job is
+    # over, whatever its outcome (releases what the job kept alive, e.g. spooled upload files).
+    def __init__(self, key: str, fn: Callable[[Callable[[str, int, int], None]], Any],
+                 cleanup: Optional[Callable[[], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.sessions: Set[str] = set()
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._fn = fn
+        self._cleanup = cleanup
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    @property
+    def fraction(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return self.done / self.total if self.total else 0.0
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.stage, self.done, self.total = stage, done, total
+
+    def _run(self) -> None:
+        try:
+            if self._cancel.is_set():
+                self.status, self.finished = CANCELLED, time.monotonic()
+                return
+            self.status, self.started = RUNNING, time.monotonic()
+            try:
+                self.result = self._fn(self.progress)
+                self.status = DONE
+            except JobCancelled:
+                self.status = CANCELLED
+            except Exception as exc:
+                self.error = f"{type(exc).__name__}: {exc}"
+                self.status = FAILED
+            finally:
+                self.finished = time.monotonic()
+        finally:
+            if self._cleanup is not None:
+                self._cleanup()
+
+class JobRunner:
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="novaretail-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def submit(self, session: str, key: str, fn: Callable[[Callable[[str, int, int], None]], Any],
+               cleanup: Optional[Callable[[], None]] = None) -> Job:
+        # Same key already queued or running (rerun of the same session, or another session on the
+        # same files and scope): join that job instead of starting over. The session's previous
+        # job for another key is dropped. `cleanup` runs right away when no new job is started.
+        job: Optional[Job] = None
+        with self._lock:
+            joined = next((j for j in self._jobs.values() if j.key == key and j.active and not j._cancel.is_set()), None)
+            if joined is not None:
+                joined.sessions.add(session)
+            else:
+                self._drop_session(session)
+                if sum(1 for j in self._jobs.values() if j.active) < self.workers + self.queue_limit:
+                    job = Job(key, fn, cleanup)
+                    job.sessions.add(session)
+                    self._jobs[job.id] = job
+                    self._prune()
+                else:
+                    self.rejected += 1
+        if job is None:
+            if cleanup is not None:
+                cleanup()
+            if joined is None:
+                raise JobRejected("Trop de traitements en cours, réessayer dans un instant.")
+            return joined
+        self._pool.submit(job._run)
+        return job
+
+    def collect(self, job_id: str, session: str) -> Any:
+        # Hands a finished job's result to one of its sessions. Once every session has it the job
+        # is forgotten, so FINISHED_KEEP does not pin the result frames in memory.
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.active:
+                return None
+            result = job.result
+            job.sessions.discard(session)
+            if not job.sessions:
+                job.result = None
+                del self._jobs[job_id]
+            return result
+
+    def cancel(self, job_id: str, session: str) -> None:
+        # A shared job only stops when no session waits for it any more
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.sessions.discard(session)
+                if not job.sessions:
+                    job._cancel.set()
+
+    def _drop_session(self, session: str) -> None:
+        for job in self._jobs.values():
+            if job.active and session in job.sessions:
+                job.sessions.discard(session)
+                if not job.sessions:
+                    job._cancel.set()
+
+    def _prune(self) -> None:
+        finished = [i for i, j in self._jobs.items() if not j.active]
+        for job_id in finished[:max(0, len(finished) - FINISHED_KEEP)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs: List[Job] = list(self._jobs.values())
+        return {
+            "workers": self.workers,
+            "running": sum(1 for j in jobs if j.status == RUNNING),
+            "queued": sum(1 for j in jobs if j.status == QUEUED),
+            "queue_limit": self.queue_limit,
+            "rejected": self.rejected,
+        }
+
+# Process-wide, like the stage caches and the dataset store
+_RUNNER = JobRunner()
+
+def get_runner() -> JobRunner:
+    return _RUNNER
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import io
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+READ_CHARS = 1 << 20
+
+JsonSource = Union[bytes, str, "os.PathLike[str]", io.IOBase]
+
+def _open_text(source: JsonSource) -> io.TextIOBase:
+    if isinstance(source, (bytes, bytearray)):
+        return io.TextIOWrapper(io.BytesIO(source), encoding="utf-8-sig")
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, encoding="utf-8-sig")
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding="utf-8-sig")
+
+def _records(fh: io.TextIOBase, read_chars: int) -> Iterator[Any]:
+    # Top-level values one at a time: the elements of a `[...]` array, or whitespace-separated
+    # documents (JSON Lines). Only the text of the pending values is buffered, never the file.
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    first, array, fast = True, False, True
+    while True:
+        while pos < len(buf) and (buf[pos] in " \t\r\n,]" or (first and buf[pos] == "[")):
+            if first and buf[pos] == "[":
+                first, array = False, True
+            pos += 1
+        if array and fast and pos < len(buf):
+            # Fast path: every complete element of the buffer in one json.loads. The cut is the
+            # last "}"; if it falls inside an element the slice is not a valid array, and this
+            # buffer is decoded one element at a time instead.
+            cut = buf.rfind("}", pos) + 1
+            try:
+                values = json.loads("[" + buf[pos:cut] + "]") if cut > pos else None
+            except json.JSONDecodeError:
+                values = None
+            fast = False
+            if values is not None:
+                pos = cut
+                yield from values
+                continue
+        if pos < len(buf):
+            try:
+                value, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Value cut at the end of the buffer: read on, unless the file is over
+                if eof:
+                    raise
+            else:
+                first = False
+                yield value
+                continue
+        elif eof:
+            return
+        more = fh.read(read_chars)
+        eof, fast = not more, True
+        buf, pos = buf[pos:] + more, 0
+
+def iter_json_records(source: JsonSource, read_chars: int = READ_CHARS) -> Iterator[Dict[str, Any]]:
+    # Records of an array-of-objects (orient="records") or JSON Lines file. A single
+    # column-oriented object ({"col": {"0": ...}}) has no record boundaries to stream on: it is
+    # decoded whole and its rows are yielded.
+    fh = _open_text(source)
+    try:
+        values = _records(fh, read_chars)
+        first = next(values, None)
+        if isinstance(first, dict) and first and all(isinstance(v, (dict, list)) for v in first.values()):
+            yield from _column_records(first)
+        elif first is not None:
+            yield first
+        yield from values
+    finally:
+        if fh is not source:
+            fh.close()
+
+def _column_records(columns: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    keyed = {c: v if isinstance(v, dict) else dict(enumerate(v)) for c, v in columns.items()}
+    index = list(dict.fromkeys(k for v in keyed.values() for k in v))
+    for i in index:
+        yield {c: v[i] for c, v in keyed.items() if i in v}
+
+def batches(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(records)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
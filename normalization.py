@@ -0,0 +1,49 @@
+from __future__ import annotations
+import pandas as pd
+import numpy as np
+from typing import Callable, Dict, Optional
+
+Rule = Callable[[object], object]
+
+def lookup_rule(mapping: Dict[str, str], lower: bool = True, fallback: Optional[Callable[[str], str]] = None) -> Rule:
+    # Same semantics as the historical row-by-row norm_channel / norm_device
+    def rule(x):
+        if pd.isna(x):
+            return np.nan
+        s = str(x).strip()
+        if not s:
+            return np.nan
+        default = fallback(s) if fallback else s
+        return mapping.get(s.lower() if lower else s, default)
+    return rule
+
+def strip_replace_rule(mapping: Optional[Dict[str, str]] = None) -> Rule:
+    # Same semantics as astype(str).str.strip().replace(mapping).replace({"": nan, "nan": nan}),
+    # except for None (and pd.NA / NaT): missing like NaN here, whereas pandas 2's astype(str)
+    # kept them as the strings "None", "<NA>", "NaT" (pandas 3 keeps them missing too)
+    mapping = mapping or {}
+    def rule(x):
+        if pd.isna(x):
+            return np.nan
+        s = mapping.get(str(x).strip(), str(x).strip())
+        if s in ("", "nan"):
+            return np.nan
+        return s
+    return rule
+
+def normalize_categorical(s: pd.Series, rule: Rule) -> pd.Series:
+    # The rule only runs once per distinct value, results are mapped back through the codes
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    mapped = pd.Index([rule(v) for v in uniques], dtype=object)
+    categories = mapped.dropna().unique()
+    remap = categories.get_indexer(mapped)
+    na_code = categories.get_indexer(pd.Index([rule(np.nan)], dtype=object))[0]
+    new_codes = np.where(codes >= 0, remap[codes] if len(remap) else -1, na_code).astype(np.int64)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=categories), index=s.index, name=s.name)
+
+def decategorize(s: pd.Series) -> pd.Series:
+    # Back to the plain dtype pandas infers for s.apply(rule)
+    return s.astype(object).infer_objects()
+
+def normalize_values(s: pd.Series, rule: Rule) -> pd.Series:
+    return decategorize(normalize_categorical(s, rule))
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+
+from cache import CACHE_BUDGET_BYTES, content_hash, stage_cache
+from instrumentation import recording, stage
+
+@dataclass(frozen=True)
+class Stage:
+    # One declared step: `fn` receives the values of `inputs` (parameters or other stages) in order
+    name: str
+    inputs: Tuple[str, ...]
+    fn: Callable[..., Any]
+
+@dataclass
+class PipelineRun:
+    values: Dict[str, Any]
+    fingerprints: Dict[str, str]
+    computed: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)
+    stages: List[Dict[str, object]] = field(default_factory=list)
+
+def _rows(value: Any) -> Optional[int]:
+    # Row count shown in the stage table: frames, (frame, ...) tuples and LeadsIndex/LeadsScan
+    value = getattr(value, "leads", value)
+    if isinstance(value, tuple) and value:
+        value = getattr(value[0], "leads", value[0])
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+class Pipeline:
+    # Stage outputs are cached under a fingerprint hashed from the stage name and the fingerprints
+    # of its inputs, so a changed parameter only re-executes the stages downstream of it. The cache
+    # is bounded by bytes as well as entries: evicted stages are recomputed from their inputs.
+    def __init__(self, name: str, stages: Sequence[Stage], maxsize: int = 64, max_bytes: int = CACHE_BUDGET_BYTES):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.stages: Dict[str, Stage] = {}
+        for s in stages:
+            if s.name in self.stages:
+                raise ValueError(f"Étape déclarée deux fois : {s.name}")
+            self.stages[s.name] = s
+        self.params = sorted({i for s in stages for i in s.inputs if i not in self.stages})
+        self.order = self._topological_order()
+        # Stages no other stage consumes: what run() resolves when no targets are given
+        consumed = {i for s in stages for i in s.inputs}
+        self.sinks = [n for n in self.order if n not in consumed]
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle dans le pipeline {self.name} autour de {name}")
+            state[name] = 1
+            for i in self.stages[name].inputs:
+                if i in self.stages:
+                    visit(i)
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def fingerprints(self, params: Mapping[str, Any], known: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+        # `known` lets the caller pass digests it already has (e.g. of the uploaded bytes)
+        known = known or {}
+        fps = {p: known[p] if p in known else content_hash(params[p]) for p in self.params}
+        for name in self.order:
+            fps[name] = content_hash(self.name, name, *(fps[i] for i in self.stages[name].inputs))
+        return fps
+
+    def downstream(self, changed: Iterable[str]) -> List[str]:
+        # Stages re-executed when any of `changed` (parameters or stages) changes, in run order
+        dirty: Set[str] = set(changed)
+        out = []
+        for name in self.order:
+            if any(i in dirty for i in self.stages[name].inputs):
+                dirty.add(name)
+                out.append(name)
+        return out
+
+    def run(
+        self,
+        params: Mapping[str, Any],
+        targets: Optional[Iterable[str]] = None,
+        known: Optional[Mapping[str, str]] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> PipelineRun:
+        # Resolves `targets` (default: the sink stages) and only the inputs of stages missing from
+        # the cache. `progress(stage, done, total)` is called before each stage is fetched or executed; an
+        # exception raised from it (cancellation) stops the run, finished stages stay cached
+        missing = [p for p in self.params if p not in params]
+        if missing:
+            raise KeyError(f"Paramètres manquants pour {self.name} : {missing}")
+        fps = self.fingerprints(params, known)
+        run = PipelineRun({}, fps)
+        cache = stage_cache(f"pipeline.{self.name}", maxsize=self.maxsize, max_bytes=self.max_bytes)
+        records: Dict[str, Dict[str, object]] = {}
+
+        def resolve(name: str) -> Any:
+            if name not in self.stages:
+                return params[name]
+            if name in run.values:
+                return run.values[name]
+            if progress is not None:
+                progress(name, len(records), len(self.order))
+            sentinel = object()
+            hit = cache.get(fps[name], sentinel)
+            if hit is not sentinel:
+                # Only what is needed is fetched: a cached stage never pulls its inputs back in
+                value, record = hit
+                records[name] = {**record, "cached": True}
+                run.reused.append(name)
+            else:
+                step = self.stages[name]
+                args = [resolve(i) for i in step.inputs]
+                first = next((i for i in step.inputs if i in self.stages), None)
+                with stage(name, _rows(run.values[first]) if first else None) as s:
+                    value = step.fn(*args)
+                    s["rows_out"] = _rows(value)
+                record = dict(s)
+                cache.put(fps[name], (value, record))
+                records[name] = {**record, "cached": False}
+                run.computed.append(name)
+            run.values[name] = value
+            return value
+
+        with recording():
+            for name in targets or self.sinks:
+                resolve(name)
+        run.stages = [records[n] for n in self.order if n in records]
+        return run
+
+    def to_dot(self, run: Optional[PipelineRun] = None) -> str:
+        # Graphviz source (st.graphviz_chart): parameters as ellipses, stages as boxes colored by
+        # what the last run did with them
+        lines = [f'digraph "{self.name}" {{', "  rankdir=LR;", '  node [fontname="Helvetica", fontsize=10];']
+        for p in self.params:
+            lines.append(f'  "{p}" [shape=ellipse, style=dashed];')
+        for name in self.order:
+            color = "white"
+            if run is not None and name in run.computed:
+                color = "#f6bd60"
+            elif run is not None and name in run.reused:
+                color = "#b5e2fa"
+            lines.append(f'  "{name}" [shape=box, style="rounded,filled", fillcolor="{color}"];')
+        for name in self.order:
+            for i in self.stages[name].inputs:
+                lines.append(f'  "{i}" -> "{name}";')
+        lines.append("}")
+        return "\n".join(lines)
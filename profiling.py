@@ -0,0 +1,82 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+ColumnProfile = Dict[str, int]
+
+def _blank_counts(uniques, counts: np.ndarray) -> int:
+    # Blank strings are looked up among the distinct values only, then weighted by their counts
+    blank = np.fromiter((str(u).strip() == "" for u in uniques), dtype=bool, count=len(uniques))
+    return int(counts[blank].sum()) if len(blank) else 0
+
+def profile_column(s: pd.Series) -> ColumnProfile:
+    memory = int(s.memory_usage(index=False, deep=True))
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories))
+        missing = int((codes < 0).sum()) + _blank_counts(s.cat.categories, counts)
+        distinct = int((counts > 0).sum())
+    elif s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        missing = int((codes < 0).sum()) + _blank_counts(uniques, counts)
+        distinct = len(uniques)
+    else:
+        # Numeric, datetime and bool values never render as blank strings
+        missing = int(s.isna().sum())
+        distinct = int(s.nunique(dropna=True))
+    return {"missing": missing, "distinct": distinct, "memory_bytes": memory}
+
+def profile_columns(df: pd.DataFrame) -> Dict[str, ColumnProfile]:
+    return {c: profile_column(df[c]) for c in df.columns}
+
+def profile_star(facts: pd.DataFrame, dim: pd.DataFrame, key: str) -> Dict[str, ColumnProfile]:
+    # Profile of facts left-joined with dim on key, computed on the distinct keys without
+    # materializing the join; memory is what the dimension table actually holds
+    out = profile_columns(facts)
+    weights = facts[key].value_counts(dropna=False)
+    looked_up = dim.drop_duplicates(subset=[key]).set_index(key).reindex(weights.index)
+    for c in looked_up.columns:
+        s = looked_up[c]
+        na = s.isna().to_numpy()
+        blank = np.fromiter((not n and str(v).strip() == "" for v, n in zip(s, na)), dtype=bool, count=len(s))
+        out[c] = {
+            "missing": int(weights.to_numpy()[na | blank].sum()),
+            "distinct": int(s.nunique(dropna=True)),
+            "memory_bytes": int(dim[c].memory_usage(index=False, deep=True)),
+        }
+    return out
+
+def missing_counts(profile: Dict[str, ColumnProfile]) -> Dict[str, int]:
+    return {c: p["missing"] for c, p in profile.items()}
+
+class ProfileAccumulator:
+    # Combines per-chunk profiles: missing and memory add up, distinct values are
+    # tracked as 64-bit hashes so the union stays exact without keeping the values
+    def __init__(self):
+        self._sums: Dict[str, Dict[str, int]] = {}
+        self._hashes: Dict[str, List[np.ndarray]] = {}
+
+    def add(self, df: pd.DataFrame) -> None:
+        for c in df.columns:
+            s = df[c]
+            p = profile_column(s)
+            acc = self._sums.setdefault(c, {"missing": 0, "memory_bytes": 0})
+            acc["missing"] += p["missing"]
+            acc["memory_bytes"] += p["memory_bytes"]
+            uniques = pd.unique(s.dropna())
+            if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+                # Hashed as float64 (ints too, so a chunk parsed as float matches one parsed as
+                # int): much faster than hashing the values as Python objects
+                uniques = np.asarray(uniques, dtype=np.float64)
+            else:
+                uniques = np.asarray(uniques, dtype=object)
+            self._hashes.setdefault(c, []).append(pd.util.hash_array(uniques))
+
+    def result(self) -> Dict[str, ColumnProfile]:
+        out = {}
+        for c, acc in self._sums.items():
+            distinct = len(np.unique(np.concatenate(self._hashes[c]))) if self._hashes[c] else 0
+            out[c] = {"missing": acc["missing"], "distinct": distinct, "memory_bytes": acc["memory_bytes"]}
+        return out
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json
+import os
+from dataclasses import asdict
+from typing import List, Tuple
+
+import pandas as pd
+
+from data_prep import DataQualityReport, StarDataset
+
+SNAPSHOT_DIR = os.environ.get("NOVARETAIL_SNAPSHOT_DIR", "snapshots")
+DATA_FILE = "dataset.arrow"
+CAMPAIGNS_FILE = "campaigns.arrow"
+DAILY_FILE = "campaigns_daily.arrow"  # optional: older snapshots have no trend data
+REPORT_FILE = "rapport_qualite.json"
+
+def _write_arrow(df: pd.DataFrame, path: str) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Uncompressed Arrow IPC file: columnar on disk and readable through a memory map
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def save_snapshot(dataset: StarDataset, dq: DataQualityReport, name: str, root: str = SNAPSHOT_DIR) -> str:
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    _write_arrow(dataset.facts, os.path.join(path, DATA_FILE))
+    _write_arrow(dataset.campaigns, os.path.join(path, CAMPAIGNS_FILE))
+    if dataset.daily is not None:
+        _write_arrow(dataset.daily, os.path.join(path, DAILY_FILE))
+    with open(os.path.join(path, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(asdict(dq), f, ensure_ascii=False, indent=2)
+    return path
+
+def load_snapshot(path: str) -> Tuple[StarDataset, DataQualityReport]:
+    daily_path = os.path.join(path, DAILY_FILE)
+    dataset = StarDataset(
+        _read_arrow(os.path.join(path, DATA_FILE)),
+        _read_arrow(os.path.join(path, CAMPAIGNS_FILE)),
+        daily=_read_arrow(daily_path) if os.path.isfile(daily_path) else None,
+    )
+    with open(os.path.join(path, REPORT_FILE), encoding="utf-8") as f:
+        dq = DataQualityReport(**json.load(f))
+    return dataset, dq
+
+def list_snapshots(root: str = SNAPSHOT_DIR) -> List[str]:
+    if not os.path.isdir(root):
+        return []
+    paths = [os.path.join(root, d) for d in os.listdir(root)]
+    paths = [p for p in paths if all(os.path.isfile(os.path.join(p, f)) for f in (DATA_FILE, CAMPAIGNS_FILE, REPORT_FILE))]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
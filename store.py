@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from typing import Any, Dict, MutableMapping
+
+from cache import cache_bytes, nbytes, set_budget_hook, trim_caches
+
+# Memory budget of the process-wide store, byte-bounded stage caches included (cache.cache_bytes):
+# over budget, those caches are trimmed first, then unreferenced datasets are evicted. Datasets
+# still referenced by a session are never evicted.
+STORE_BUDGET_BYTES = int(float(os.environ.get("NOVARETAIL_STORE_MB", "2048")) * 2**20)
+
+class DatasetHandle:
+    # What a session keeps: the key only. Dropping the handle (new dataset, session closed and
+    # garbage-collected) releases the reference through the finalizer.
+    def __init__(self, store: "DatasetStore", key: str, session: str):
+        self.key = key
+        self.session = session
+        self._store = store
+        weakref.finalize(self, store._release, key, session)
+
+    def get(self) -> Any:
+        return self._store.get(self.key)
+
+class DatasetStore:
+    def __init__(self, budget_bytes: int = STORE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._refs: Dict[str, Counter] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def acquire(self, key: str, session: str, value: Any = None) -> DatasetHandle:
+        # With `value`, stores it first when missing; the reference is taken before any eviction
+        with self._lock:
+            if key not in self._entries:
+                if value is None:
+                    raise KeyError(key)
+                self._entries[key] = value
+                self._sizes[key] = nbytes(value)
+            self._refs.setdefault(key, Counter())[session] += 1
+            self._entries.move_to_end(key)
+            self._evict()
+        return DatasetHandle(self, key, session)
+
+    def put(self, key: str, value: Any) -> Any:
+        # Unreferenced entry (evictable) unless a session acquires it; returns the stored value,
+        # which may be one another caller stored first
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._sizes[key] = nbytes(value)
+            self._entries.move_to_end(key)
+            value = self._entries[key]
+            self._evict()
+        return value
+
+    def refresh(self, key: str) -> None:
+        # Re-measures an entry that grew in place (IncrementalDataset after an append)
+        with self._lock:
+            if key in self._entries:
+                self._sizes[key] = nbytes(self._entries[key])
+                self._evict()
+
+    def _release(self, key: str, session: str) -> None:
+        with self._lock:
+            refs = self._refs.get(key)
+            if refs is None:
+                return
+            refs[session] -= 1
+            if refs[session] <= 0:
+                del refs[session]
+            if not refs:
+                del self._refs[key]
+            self._evict()
+
+    def refcount(self, key: str) -> int:
+        with self._lock:
+            return sum(self._refs.get(key, Counter()).values())
+
+    def used_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def enforce(self) -> None:
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caches first, then least recently used unreferenced entries
+        used = self.used_bytes() + cache_bytes()
+        if used > self.budget_bytes:
+            used -= trim_caches(used - self.budget_bytes)
+        for key in list(self._entries):
+            if used <= self.budget_bytes:
+                break
+            if self._refs.get(key):
+                continue
+            used -= self._sizes.pop(key)
+            del self._entries[key]
+            self.evictions += 1
+
+    def session_usage(self, session: str) -> Dict[str, int]:
+        # "bytes": everything the session references; "attributed_bytes": each dataset split
+        # between the sessions sharing it
+        with self._lock:
+            total = attributed = datasets = 0
+            for key, refs in self._refs.items():
+                if refs.get(session):
+                    datasets += 1
+                    total += self._sizes.get(key, 0)
+                    attributed += self._sizes.get(key, 0) // len(refs)
+            return {"datasets": datasets, "bytes": total, "attributed_bytes": attributed}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "referenced": sum(1 for k in self._entries if self._refs.get(k)),
+                "sessions": len({s for refs in self._refs.values() for s in refs}),
+                "used_bytes": self.used_bytes(),
+                "cache_bytes": cache_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions,
+            }
+
+# Process-wide: every Streamlit session goes through the same store
+_STORE = DatasetStore()
+set_budget_hook(_STORE.enforce)
+
+def get_store() -> DatasetStore:
+    return _STORE
+
+def session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx is not None else "local"
+
+def publish(state: MutableMapping[str, Any], key: str, value: Any, slot: str = "dataset") -> Any:
+    # Stores the value unless the key is already there (then every session shares the stored
+    # object) and keeps only a handle in the session
+    current = state.get(f"{slot}_handle")
+    if current is None or current.key != key:
+        current = _STORE.acquire(key, session_id(), value)
+        state[f"{slot}_handle"] = current
+    return current.get()
+
+def resolve(state: MutableMapping[str, Any], slot: str = "dataset") -> Any:
+    handle = state.get(f"{slot}_handle")
+    return handle.get() if handle is not None else None
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import build_rollup, crm_kpis, crosstab_percent, freq, region_clients, sector_client_rate
+
+DIMENSIONS = ["channel", "status", "device", "region", "sector", "company_size"]
+
+def _wide(categorical, n=600, seed=11):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "channel": rng.choice(["Emailing", "Google Ads", "LinkedIn Ads"], n),
+        "status": rng.choice(["Client", "SQL", "MQL", "Lost", None], n),
+        "device": rng.choice(["Desktop", "Mobile", None], n),
+        "region": rng.choice(["Bretagne", "Île-de-France", "NA", None], n),
+        "sector": rng.choice(["Retail", "Industrie", "Santé", None], n),
+        "company_size": rng.choice(["1-10", "10-50", "50-100", None], n),
+    })
+    measures = pd.DataFrame({"channel": ["Emailing", "Google Ads", "LinkedIn Ads"], "cost": [120.5, 900.0, 450.25],
+                             "impressions": [10_000, 50_000, 20_000], "clicks": [300, 1200, 500], "conversions": [12, 30, 9]})
+    df = df.merge(measures, on="channel", how="left")
+    return df.astype({d: "category" for d in DIMENSIONS}) if categorical else df
+
+# The row-level implementations the cube replaced
+def _old_crm_kpis(df):
+    total = len(df)
+    counts = {s: int((df["status"] == s).sum()) for s in ("Client", "SQL", "MQL", "Lost")}
+    return {"total_leads": total, "clients": counts["Client"], "sql": counts["SQL"], "mql": counts["MQL"],
+            "lost": counts["Lost"], "unknown_status": int(df["status"].isna().sum()),
+            "client_rate": counts["Client"] / total if total else 0.0}
+
+def _old_freq(df, col):
+    out = df[col].astype(object).fillna("NA").value_counts(dropna=False).rename("count").to_frame()
+    out["percent"] = out["count"] / out["count"].sum()
+    return out
+
+def _old_sector_client_rate(df):
+    is_client = df["status"].eq("Client")
+    return (is_client.groupby(df["sector"], observed=True).mean().sort_values(ascending=False) * 100).to_frame("%Clients").round(1)
+
+def _old_region_clients(df):
+    return df[df["status"].eq("Client")].groupby("region", observed=True).size().sort_values(ascending=False).rename("clients").to_frame()
+
+def _by_label(frame):
+    return {str(k): v for k, v in frame.to_dict("index").items()}
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_cube_kpis_match_row_level_groupbys(categorical):
+    df = _wide(categorical)
+    cube = build_rollup(df)
+    assert crm_kpis(cube) == _old_crm_kpis(df)
+    for col in DIMENSIONS:
+        assert _by_label(freq(cube, col)) == _by_label(_old_freq(df, col))
+    for a, b in (("channel", "status"), ("company_size", "status"), ("sector", "region")):
+        expected = (pd.crosstab(df[a], df[b], normalize="index").fillna(0) * 100).round(1)
+        pd.testing.assert_frame_equal(crosstab_percent(cube, a, b), expected, check_names=False,
+                                      check_categorical=False, check_column_type=False, check_index_type=False)
+    assert _by_label(sector_client_rate(cube)) == _by_label(_old_sector_client_rate(df))
+    assert _by_label(region_clients(cube)) == _by_label(_old_region_clients(df))
+
+def test_compacted_dataset_keeps_int64_measures():
+    from analysis import compute_kpis_by_channel
+    from data_prep import clean_and_prepare
+
+    leads = pd.DataFrame({"lead_id": [1, 2, 3, 4], "date": ["2025-10-02", "2025-10-05", "2025-10-09", "2025-10-20"],
+                          "channel": ["Emailing", "googleads", "LinkedIn", "Emailing"], "device": "desktop"})
+    campaigns = pd.DataFrame({"channel": ["Emailing", "Google Ads", "LinkedIn Ads"], "cost": [100, 250, 80],
+                              "impressions": [1000, 5000, 800], "clicks": [40, 90, 12], "conversions": [4, 6, 1]})
+    crm = pd.DataFrame({"lead_id": [1, 2, 3], "company_size": "10-50", "sector": "Retail",
+                        "region": "Bretagne", "status": ["Client", "MQL", "SQL"]})
+    dataset, _ = clean_and_prepare(leads, campaigns, crm)
+    measures = ["cost", "impressions", "clicks", "conversions"]
+    assert (compute_kpis_by_channel(build_rollup(dataset.facts, dataset.campaigns))[measures].dtypes == "int64").all()
+    wide = dataset.wide()
+    assert (wide[measures].dtypes == "int64").all()
+    assert wide["lead_id"].dtype == "int64"
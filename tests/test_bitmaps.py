@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import build_rollup, freq
+from bitmaps import build_bitmap_index
+
+def _facts(categorical):
+    facts = pd.DataFrame({
+        "channel": ["Emailing", "Google Ads", "Emailing", "LinkedIn Ads", "Google Ads", "Emailing"],
+        "region": ["NA", np.nan, "Bretagne", "NA", np.nan, "Bretagne"],
+        "status": ["Client", "MQL", np.nan, "SQL", "Client", "Lost"],
+    })
+    return facts.astype("category") if categorical else facts
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_filter_counts_match_freq(categorical):
+    facts = _facts(categorical)
+    campaigns = pd.DataFrame({"channel": ["Emailing", "Google Ads", "LinkedIn Ads"],
+                              "cost": 1, "impressions": 1, "clicks": 1, "conversions": 1})
+    cube = build_rollup(facts, campaigns)
+    index = build_bitmap_index(facts)
+    everything = index.all()
+    for dim in ("channel", "region", "status"):
+        expected = freq(cube, dim)["count"].to_dict()
+        assert {v: index.count(everything, dim, v) for v in index.values(dim)} == expected
+    # The real "NA" region and the missing regions are one filter value, as in freq
+    assert index.count(index.select({"region": ["NA"]})) == 4
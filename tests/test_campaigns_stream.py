@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_prep import aggregate_campaigns, scan_campaigns_json
+from exports import csv_bytes
+from timeseries import MEASURES, campaign_daily
+
+def _campaigns(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "campaign_id": f"c{i % 23}",
+        "channel": ["Emailing", "Google Ads", "LinkedIn Ads"][i % 3],
+        "date": f"2025-10-{1 + i % 31:02d}",
+        "cost": round(float(rng.uniform(10, 1000)), 2),
+        "impressions": int(rng.integers(1000, 50000)),
+        "clicks": int(rng.integers(10, 500)),
+        "conversions": int(rng.integers(0, 20)),
+    } for i in range(n)]
+
+@pytest.mark.parametrize("batch_rows, fold_rows", [(7, 1_000_000), (7, 10), (64, 50)])
+def test_batched_totals_match_unbatched(batch_rows, fold_rows):
+    data = json.dumps(_campaigns()).encode()
+    whole = scan_campaigns_json(data, batch_rows=1_000_000)
+    batched = scan_campaigns_json(data, batch_rows=batch_rows, fold_rows=fold_rows)
+    assert csv_bytes(batched.campaigns) == csv_bytes(whole.campaigns)
+    assert csv_bytes(batched.daily) == csv_bytes(whole.daily)
+
+def test_scanned_totals_match_frame_path():
+    records = _campaigns()
+    frame = pd.DataFrame(records)
+    scan = scan_campaigns_json(json.dumps(records).encode(), batch_rows=7)
+    assert csv_bytes(scan.campaigns) == csv_bytes(aggregate_campaigns(frame))
+    assert csv_bytes(scan.daily) == csv_bytes(campaign_daily(frame))
+
+@pytest.mark.parametrize("cost", [
+    lambda rng: round(float(rng.uniform(10, 1000)), 2),
+    lambda rng: int(rng.integers(10, 1000)),
+])
+def test_batched_totals_match_groupby_sum(cost):
+    rng = np.random.default_rng(1)
+    records = [dict(r, cost=cost(rng)) for r in _campaigns()]
+    expected = pd.DataFrame(records).groupby("channel", as_index=False)[MEASURES].sum()
+    batched = scan_campaigns_json(json.dumps(records).encode(), batch_rows=7, fold_rows=10)
+    assert batched.campaigns["cost"].dtype == expected["cost"].dtype
+    assert csv_bytes(batched.campaigns) == csv_bytes(expected)
+
+@pytest.mark.parametrize("costs, total", [
+    ([0.001, 125199.115, 0.004], 125199.12),
+    ([0.000001, 0.1, 0.2], 0.300001),
+])
+def test_sub_cent_costs_keep_their_precision(costs, total):
+    frame = pd.DataFrame({"channel": ["Emailing"] * 3, "cost": costs,
+                          "impressions": [1, 1, 1], "clicks": [0, 0, 0], "conversions": [0, 0, 0]})
+    assert aggregate_campaigns(frame)["cost"].tolist() == [total]
+
+def test_costs_finer_than_micro_euros_use_the_grouped_sum():
+    costs = [1 / 3, 2 / 3, 1 / 7]
+    frame = pd.DataFrame({"channel": ["Emailing"] * 3, "cost": costs,
+                          "impressions": [1, 1, 1], "clicks": [0, 0, 0], "conversions": [0, 0, 0]})
+    assert aggregate_campaigns(frame)["cost"].tolist() == frame.groupby("channel")["cost"].sum().tolist()
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from data_prep import STATUS_RANK, _dedup_leads, dedup_crm, normalize_crm
+
+def _positions(df):
+    return df.index.tolist()
+
+def test_leads_dedup_matches_sort_and_drop_duplicates():
+    leads = pd.DataFrame({
+        "lead_id": [3, 1, 3, np.nan, 2, 1, np.nan, 2, 3],
+        "date": pd.to_datetime(["2025-10-05", "2025-10-02", "2025-10-01", "2025-10-03", None,
+                                "2025-10-02", "2025-10-01", "2025-10-04", "2025-10-01"]),
+    })
+    old = leads.sort_values(["lead_id", "date"]).drop_duplicates(subset=["lead_id"], keep="first")
+    assert _positions(_dedup_leads(leads)) == _positions(old)
+
+def test_crm_dedup_matches_sort_and_drop_duplicates():
+    crm = normalize_crm(pd.DataFrame({
+        "lead_id": [7, 5, 7, 5, np.nan, 7, 5, np.nan, 6],
+        "status": ["MQL", " Client", "SQL", "Client", "Lost", "SQL ", "", "MQL", "client"],
+    }))
+    ranked = crm.assign(_rank=crm["status"].map(STATUS_RANK).fillna(-1))
+    old = ranked.sort_values(["lead_id", "_rank"], ascending=[True, False]).drop_duplicates(subset=["lead_id"], keep="first")
+    assert _positions(dedup_crm(crm)) == _positions(old)
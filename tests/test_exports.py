@@ -0,0 +1,44 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import exports
+from exports import BLOCK_BYTES, SpooledExport, write_zip
+
+def _zip(members, **kwargs):
+    sink = io.BytesIO()
+    write_zip(members, sink, **kwargs)
+    sink.seek(0)
+    return zipfile.ZipFile(sink)
+
+def test_zip_round_trip():
+    multi_block = os.urandom(BLOCK_BYTES) + b"novaretail;" * (BLOCK_BYTES // 4)
+    spooled = SpooledExport.of(b"lead_id;channel\n" * 200_000)
+    members = {
+        "exports/vide.csv": b"",
+        "exports/multi_blocs.bin": multi_block,
+        "exports/note_métier_été.md": "Synthèse : coût par lead élevé\n".encode("utf-8"),
+        "exports/spooled.csv": spooled.read(),
+    }
+    inputs = [(name, data) for name, data in members.items() if name != "exports/spooled.csv"]
+    inputs.append(("exports/spooled.csv", spooled.chunks(size=64 * 1024)))
+    with _zip(inputs, workers=2) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(members)
+        for name, data in members.items():
+            assert archive.read(name) == data
+
+def test_member_over_the_limit_raises_before_its_data_is_written(monkeypatch):
+    monkeypatch.setattr(exports, "ZIP_MAX_BYTES", 4096)
+    sink = io.BytesIO()
+    with pytest.raises(ValueError, match="gros.bin: membre trop volumineux"):
+        write_zip([("petit.txt", b"ok"), ("gros.bin", os.urandom(3 * BLOCK_BYTES))], sink, workers=1)
+    assert sink.tell() < 4096
+
+def test_archive_over_the_limit_raises(monkeypatch):
+    monkeypatch.setattr(exports, "ZIP_MAX_BYTES", 2 * 1024)
+    members = [(f"m{i}.bin", os.urandom(1000)) for i in range(4)]
+    with pytest.raises(ValueError, match="Archive trop volumineuse"):
+        write_zip(members, io.BytesIO(), workers=1)
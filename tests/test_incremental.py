@@ -0,0 +1,58 @@
+import pandas as pd
+
+from data_prep import IncrementalDataset
+
+def _sources(status="MQL"):
+    leads = pd.DataFrame({
+        "lead_id": [1, 2, 3],
+        "date": ["2025-10-02 09:00", "2025-10-03 10:00", "2025-10-04 11:00"],
+        "channel": ["Emailing", "Google Ads", "LinkedIn Ads"],
+        "device": ["desktop", "mobile", "tablet"],
+    })
+    campaigns = pd.DataFrame({
+        "campaign_id": ["c1", "c2"],
+        "channel": ["Emailing", "Google Ads"],
+        "date": ["2025-10-01", "2025-10-01"],
+        "cost": [100.0, 50.0],
+        "impressions": [1000, 500],
+        "clicks": [10, 5],
+        "conversions": [1, 1],
+    })
+    crm = pd.DataFrame({
+        "lead_id": [1, 2, 3],
+        "company_size": ["PME", "ETI", "PME"],
+        "sector": ["Retail", "Tech", "Retail"],
+        "region": ["IDF", "PACA", "IDF"],
+        "status": [status] * 3,
+    })
+    return leads, campaigns, crm
+
+def _delta():
+    leads = pd.DataFrame({"lead_id": [4], "date": ["2025-10-05 12:00"], "channel": ["Emailing"], "device": ["desktop"]})
+    return leads, pd.DataFrame({"lead_id": [4], "status": ["SQL"]})
+
+def test_version_depends_on_base_content_not_only_row_counts():
+    original = IncrementalDataset(*_sources(), period="2025-10")
+    rewritten = IncrementalDataset(*_sources(status="Client"), period="2025-10")
+    assert original.version != rewritten.version
+
+    leads, crm = _delta()
+    original.append(leads, crm, digest="delta")
+    rewritten.append(leads, crm, digest="delta")
+    assert original.version != rewritten.version
+
+def test_version_is_seeded_from_the_base_digest():
+    first = IncrementalDataset(*_sources(), period="2025-10", digest="base-a")
+    second = IncrementalDataset(*_sources(), period="2025-10", digest="base-b")
+    same = IncrementalDataset(*_sources(), period="2025-10", digest="base-a")
+    assert first.version != second.version
+    assert first.version == same.version
+
+def test_same_extract_is_applied_once():
+    dataset = IncrementalDataset(*_sources(), period="2025-10")
+    leads, crm = _delta()
+    assert dataset.append(leads, crm, digest="delta")
+    version = dataset.version
+    assert not dataset.append(leads, crm, digest="delta")
+    assert dataset.version == version
+    assert dataset.applied == ["delta"]
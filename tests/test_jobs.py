@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from jobs import CANCELLED, DONE, JobRejected, JobRunner
+
+def _wait(job):
+    while job.active:
+        threading.Event().wait(0.01)
+
+def test_shared_result_released_once_every_session_collected():
+    runner = JobRunner(workers=1, queue_limit=1)
+    gate = threading.Event()
+
+    def fn(progress):
+        gate.wait(5)
+        return ["frames"]
+
+    job = runner.submit("a", "key", fn)
+    assert runner.submit("b", "key", fn) is job
+    gate.set()
+    _wait(job)
+    assert job.status == DONE
+    assert runner.collect(job.id, "a") == ["frames"]
+    assert job.result == ["frames"]
+    assert runner.collect(job.id, "b") == ["frames"]
+    assert job.result is None and runner.get(job.id) is None
+
+def test_cancelled_session_does_not_hold_shared_result():
+    runner = JobRunner(workers=1, queue_limit=1)
+    gate = threading.Event()
+
+    def fn(progress):
+        gate.wait(5)
+        return ["frames"]
+
+    job = runner.submit("a", "key", fn)
+    runner.submit("b", "key", fn)
+    runner.cancel(job.id, "a")
+    gate.set()
+    _wait(job)
+    assert job.status == DONE
+    assert runner.collect(job.id, "b") == ["frames"]
+    assert job.result is None
+
+def test_cancel_last_session_stops_job():
+    runner = JobRunner(workers=1, queue_limit=1)
+    gate = threading.Event()
+
+    def fn(progress):
+        gate.wait(5)
+        progress("stage", 1, 2)
+        return ["frames"]
+
+    job = runner.submit("a", "key", fn)
+    runner.cancel(job.id, "a")
+    gate.set()
+    _wait(job)
+    assert job.status == CANCELLED
+    assert runner.collect(job.id, "a") is None
+
+def test_cleanup_runs_once_per_submission():
+    runner = JobRunner(workers=1, queue_limit=0)
+    gate = threading.Event()
+    calls = []
+
+    def fn(progress):
+        gate.wait(5)
+        return None
+
+    job = runner.submit("a", "key", fn, cleanup=lambda: calls.append("a"))
+    assert runner.submit("b", "key", fn, cleanup=lambda: calls.append("b")) is job
+    assert calls == ["b"]
+    with pytest.raises(JobRejected):
+        runner.submit("c", "other", fn, cleanup=lambda: calls.append("c"))
+    assert calls == ["b", "c"]
+    gate.set()
+    _wait(job)
+    threading.Event().wait(0.05)
+    assert calls == ["b", "c", "a"]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from data_prep import (
+    CHANNEL_NORMALIZATION, COMPANY_SIZE_NORMALIZATION, DEVICE_NORMALIZATION,
+    norm_blank, norm_channel, norm_company_size, norm_device,
+)
+from normalization import normalize_values
+
+def _values(s):
+    return [None if pd.isna(v) else v for v in s]
+
+# The historical row-wise rules normalize_values replaced
+def _old_lookup(mapping, fallback=lambda s: s):
+    def rule(x):
+        if pd.isna(x):
+            return np.nan
+        s = str(x).strip()
+        if not s:
+            return np.nan
+        return mapping.get(s.lower(), fallback(s))
+    return rule
+
+def _old_strip_replace(s, mapping):
+    return s.astype(str).str.strip().replace(mapping).replace({"": np.nan, "nan": np.nan})
+
+VARIANTS = ["Google Ads", " googleads ", "GoogleAds", "LINKEDIN", "e-mailing", "Emailing ", "", "   ",
+            np.nan, "nan", "desktop", " MOBILE", "tablet ", "Smart TV", "10 - 50", " 50- 100", "Paris"]
+
+def test_lookup_rules_match_row_wise_apply():
+    s = pd.Series(VARIANTS * 3, dtype=object)
+    assert _values(normalize_values(s, norm_channel)) == _values(s.apply(_old_lookup(CHANNEL_NORMALIZATION)))
+    assert _values(normalize_values(s, norm_device)) == _values(s.apply(_old_lookup(DEVICE_NORMALIZATION, str.title)))
+
+def test_strip_replace_rules_match_astype_str_chain():
+    s = pd.Series(VARIANTS * 3, dtype=object)
+    assert _values(normalize_values(s, norm_company_size)) == _values(_old_strip_replace(s, COMPANY_SIZE_NORMALIZATION))
+    assert _values(normalize_values(s, norm_blank)) == _values(_old_strip_replace(s, {}))
+
+def test_none_is_missing():
+    s = pd.Series(["Client", None, np.nan, " "], dtype=object)
+    assert _values(normalize_values(s, norm_blank)) == ["Client", None, None, None]
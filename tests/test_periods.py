@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from data_prep import (
+    custom_period, index_leads, month_period, parse_period, quarter_period, scan_leads_csv, slice_period, week_period,
+)
+
+def _leads(dates):
+    return pd.DataFrame({
+        "lead_id": range(len(dates)),
+        "date": dates,
+        "channel": "Emailing",
+        "device": "desktop",
+    })
+
+@pytest.mark.parametrize("period, last_day", [
+    (custom_period("2025-10-06", "2025-10-19"), "2025-10-19"),
+    (week_period("2025-10-08"), "2025-10-12"),
+    (month_period("2025-10"), "2025-10-31"),
+    (quarter_period("2025Q4"), "2025-12-31"),
+    (parse_period("2025-10-06:2025-10-19"), "2025-10-19"),
+])
+def test_last_day_is_included_with_intraday_timestamps(period, last_day):
+    last = pd.Timestamp(last_day)
+    dates = [
+        period.start - pd.Timedelta(minutes=1),  # out
+        period.start,  # in
+        last,  # in
+        last + pd.Timedelta(hours=14, minutes=30),  # in
+        last + pd.Timedelta(hours=23, minutes=59, seconds=59),  # in
+        last + pd.Timedelta(days=1),  # out
+    ]
+    raw = _leads([d.strftime("%Y-%m-%d %H:%M:%S") for d in dates])
+    expected = [1, 2, 3, 4]
+
+    sliced = slice_period(index_leads(raw), period)
+    assert sorted(sliced["lead_id"]) == expected
+
+    scan = scan_leads_csv(raw.to_csv(index=False).encode("utf-8"), period)
+    assert sorted(scan.leads["lead_id"]) == expected
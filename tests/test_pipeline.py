@@ -0,0 +1,25 @@
+import numpy as np
+
+from cache import LRUCache, stage_cache
+from pipeline import Pipeline, Stage
+
+def test_oversized_value_keeps_cached_entries():
+    cache = LRUCache(maxsize=8, max_bytes=1000)
+    cache.put("small", np.zeros(10, dtype=np.int64))
+    cache.put("big", np.zeros(1000, dtype=np.int64))
+    assert "small" in cache and "big" not in cache
+
+def test_channel_change_with_parse_evicted():
+    # parse alone is larger than the budget: it is never cached, and a new channel selection
+    # only re-runs the stage that depends on it
+    pipeline = Pipeline("test.evicted_parse", [
+        Stage("parse", ("files",), lambda files: np.arange(files, dtype=np.int64)),
+        Stage("norm", ("parse",), lambda parsed: parsed[:10] * 2),
+        Stage("filt", ("norm", "channels"), lambda norm, channels: norm[:channels]),
+    ], max_bytes=4 * 2**10)
+    stage_cache("pipeline.test.evicted_parse").clear()
+    first = pipeline.run({"files": 1024, "channels": 3})
+    assert first.computed == ["parse", "norm", "filt"]
+    second = pipeline.run({"files": 1024, "channels": 5})
+    assert second.computed == ["filt"]
+    assert second.values["filt"].tolist() == [0, 2, 4, 6, 8]
@@ -0,0 +1,58 @@
+import gc
+
+import numpy as np
+import pytest
+
+from cache import cache_stats, stage_cache
+from store import DatasetStore
+
+MB = 2**20
+
+def _dataset(mb):
+    return np.zeros(mb * MB, dtype=np.uint8)
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    # The byte-bounded caches are process-wide and count against every store's budget
+    for name in cache_stats():
+        stage_cache(name).clear()
+    yield
+    for name in cache_stats():
+        stage_cache(name).clear()
+
+def test_only_unreferenced_entries_are_evicted():
+    store = DatasetStore(budget_bytes=3 * MB)
+    held = store.acquire("a", "s1", _dataset(1))
+    store.put("b", _dataset(1))
+    store.put("c", _dataset(1))
+    store.acquire("d", "s2", _dataset(1))
+    # Over budget: "b", the least recently used unreferenced entry, goes; "a" is older but held
+    assert "a" in store and "b" not in store and "c" in store and "d" in store
+    assert store.evictions == 1
+    assert held.get() is store.get("a")
+
+def test_dropped_handle_releases_its_reference():
+    store = DatasetStore(budget_bytes=2 * MB)
+    handle = store.acquire("a", "s1", _dataset(1))
+    other = store.acquire("a", "s2")
+    assert store.refcount("a") == 2
+    assert store.session_usage("s1") == {"datasets": 1, "bytes": MB, "attributed_bytes": MB // 2}
+    del handle
+    gc.collect()
+    assert store.refcount("a") == 1
+    assert store.session_usage("s1") == {"datasets": 0, "bytes": 0, "attributed_bytes": 0}
+    del other
+    gc.collect()
+    assert store.refcount("a") == 0
+    # Unreferenced now: the next entry over budget evicts it
+    store.put("b", _dataset(2))
+    assert "a" not in store and "b" in store
+
+def test_caches_are_trimmed_before_datasets():
+    store = DatasetStore(budget_bytes=3 * MB)
+    store.put("a", _dataset(1))
+    cache = stage_cache("test.store", maxsize=4, max_bytes=8 * MB)
+    cache.put("stage", _dataset(1))
+    store.put("b", _dataset(2))
+    assert "stage" not in cache
+    assert "a" in store and "b" in store and store.evictions == 0
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from timeseries import KPI_RATIOS, MEASURES, WINDOWS, kpi_series
+
+def _daily():
+    rng = np.random.default_rng(3)
+    rows = []
+    for channel, days in (("Emailing", [0, 1, 2, 9, 10, 40, 41]), ("Google Ads", [3, 30, 31, 32, 60])):
+        for d in days:
+            rows.append({"channel": channel, "date": pd.Timestamp("2025-09-01") + pd.Timedelta(days=d),
+                         "cost": float(rng.integers(1, 500)), "impressions": int(rng.integers(100, 1000)),
+                         "clicks": int(rng.integers(0, 50)), "conversions": int(rng.integers(0, 5))})
+    return pd.DataFrame(rows)
+
+def test_windows_match_rolling_sum_over_gaps():
+    daily = _daily()
+    series = kpi_series(daily).set_index(["channel", "date"])
+    for channel, group in daily.groupby("channel"):
+        calendar = pd.date_range(group["date"].min(), group["date"].max(), freq="D")
+        dense = group.set_index("date")[MEASURES].reindex(calendar, fill_value=0).astype(float)
+        got = series.loc[channel]
+        assert got.index.equals(calendar)
+        for w in WINDOWS:
+            window = dense.rolling(w, min_periods=1).sum()
+            for kpi, (num, den) in KPI_RATIOS.items():
+                expected = (window[num] / window[den].where(window[den] > 0)).to_numpy()
+                np.testing.assert_allclose(got[f"{kpi}_{w}d"].to_numpy(), expected, rtol=1e-12)
@@ -0,0 +1,30 @@
+import io
+import os
+
+from uploads import UploadSpool, hold
+
+def test_replaced_upload_kept_until_released(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    first = spool.spool("leads", io.BytesIO(b"a,b\n1,2\n"))
+    release = hold(first)
+    second = spool.spool("leads", io.BytesIO(b"a,b\n3,4\n"))
+    assert os.path.exists(first.path) and os.path.exists(second.path)
+    release()
+    assert not os.path.exists(first.path) and os.path.exists(second.path)
+    release()
+
+def test_closed_spool_kept_until_last_release(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    f = spool.spool("leads", io.BytesIO(b"a,b\n1,2\n"))
+    first, second = hold(f), hold(f)
+    spool.close()
+    first()
+    assert os.path.exists(f.path)
+    second()
+    assert not os.path.exists(spool.dir)
+
+def test_unheld_spool_removed_on_close(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    f = spool.spool("leads", io.BytesIO(b"a,b\n1,2\n"))
+    spool.close()
+    assert not os.path.exists(f.path) and not os.path.exists(spool.dir)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_prep import VALIDATION_RULES, normalize_leads
+from validation import SAMPLE_ROWS, ValidationAccumulator
+
+def _sources(n=400, seed=5):
+    rng = np.random.default_rng(seed)
+    leads = pd.DataFrame({
+        "lead_id": rng.integers(0, 500, n),
+        "date": rng.choice(["2025-10-03", "2025-10-17", "not a date", "2025-13-45", None], n),
+        "channel": rng.choice(["Emailing", "googleads", "Fax", " LinkedIn ", None], n),
+        "device": rng.choice(["desktop", "MOBILE", None], n),
+    })
+    crm = pd.DataFrame({"lead_id": rng.integers(100, 700, n // 2), "status": "MQL"})
+    campaigns = pd.DataFrame({
+        "channel": rng.choice(["Emailing", "Google Ads", "TikTok"], 60),
+        "impressions": rng.integers(0, 100, 60),
+        "clicks": rng.integers(0, 100, 60),
+    })
+    return leads, crm, campaigns
+
+def _add(acc, source, raw):
+    acc.add(source, normalize_leads(raw.copy()) if source == "leads" else raw, raw)
+
+@pytest.mark.filterwarnings("ignore:Could not infer format")
+def test_batched_merge_matches_single_pass():
+    leads, crm, campaigns = _sources()
+    single = ValidationAccumulator(VALIDATION_RULES)
+    for source, frame in (("leads", leads), ("crm", crm), ("campaigns", campaigns)):
+        _add(single, source, frame)
+
+    # Two workers over consecutive chunks, merged in chunk order
+    first, second = ValidationAccumulator(VALIDATION_RULES), ValidationAccumulator(VALIDATION_RULES)
+    for source, frame in (("leads", leads), ("crm", crm), ("campaigns", campaigns)):
+        chunks = np.array_split(np.arange(len(frame)), 7)
+        for i, rows in enumerate(chunks):
+            _add(first if i < 3 else second, source, frame.iloc[rows])
+    first.merge(second)
+
+    expected, got = single.result(), first.result()
+    assert set(expected) == {r.name for r in VALIDATION_RULES}
+    assert got == expected
+    for result in expected.values():
+        assert result["count"] > 0
+        assert len(result["samples"]) == min(SAMPLE_ROWS, result["count"])
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ["cost", "impressions", "clicks", "conversions"]
+WINDOWS = (1, 7, 28)
+# Costs are euro amounts: when every cost is a whole number of cents (or of micro-euros, for ad
+# spend reported that finely) they are summed as integers at that scale, so totals do not depend on
+# how the rows were batched or in which order partial totals are folded (float sums do)
+COST_SCALES = (100, 10**6)
+
+# KPI name -> (numerator, denominator), same ratios as analysis.compute_kpis_by_channel
+KPI_RATIOS: Dict[str, Tuple[str, str]] = {
+    "CTR": ("clicks", "impressions"),
+    "conversion_rate": ("conversions", "clicks"),
+    "CPL": ("cost", "conversions"),
+}
+
+def _cost_sums(cost: pd.Series, frame: pd.DataFrame, keys, groupby) -> np.ndarray:
+    # Float costs per group, in the order of frame.groupby(keys, **groupby): integer sums at the
+    # first scale the costs are exact at (partial totals of such costs are too), else pandas'
+    # compensated grouped sum
+    groupby = {**groupby, "as_index": True}
+    grouped = lambda values: frame.assign(cost=values).groupby(keys, **groupby)["cost"]
+    for scale in COST_SCALES:
+        units = np.rint(cost.fillna(0) * scale)
+        if (units.abs() < 2**53).all() and ((units / scale == cost) | cost.isna()).all():
+            return (grouped(units.astype("int64")).sum() / scale).to_numpy()
+    return grouped(cost).sum().to_numpy(dtype=np.float64)
+
+def sum_measures(frame: pd.DataFrame, keys, **groupby) -> pd.DataFrame:
+    # Per-group MEASURES sums; also folds frames of partial sums. Integer costs stay integers and
+    # float costs keep their precision
+    cost = pd.to_numeric(frame["cost"])
+    sums = frame.assign(cost=cost).groupby(keys, **groupby)[MEASURES].sum()
+    if not pd.api.types.is_float_dtype(cost.dtype):
+        return sums
+    return sums.assign(cost=_cost_sums(cost, frame, keys, groupby))
+
+def campaign_daily(campaigns: pd.DataFrame) -> pd.DataFrame:
+    # One row per campaign and day; rows whose date does not parse are left out
+    if "date" not in campaigns.columns:
+        campaigns = campaigns.assign(date=pd.NaT)
+    day = pd.to_datetime(campaigns["date"], errors="coerce").dt.normalize()
+    daily = campaigns.assign(date=day).dropna(subset=["date"])
+    if "campaign_id" not in daily.columns:
+        daily = daily.assign(campaign_id=daily["channel"])
+    return sum_measures(daily, ["campaign_id", "channel", "date"], as_index=False, sort=True, dropna=False)
+
+def _dense_calendar(daily: pd.DataFrame, key: str) -> pd.DataFrame:
+    # Every day between a group's first and last activity, measures 0 on idle days, so row
+    # offsets within a group are day offsets
+    sums = daily.groupby([key, "date"], sort=True, observed=True)[MEASURES].sum()
+    keys = sums.index.get_level_values(0)
+    days = sums.index.get_level_values(1)
+    codes, uniques = pd.factorize(keys)
+    first = pd.Series(days).groupby(codes).min().to_numpy()
+    last = pd.Series(days).groupby(codes).max().to_numpy()
+    lengths = ((last - first) // np.timedelta64(1, "D")).astype(np.int64) + 1
+    group = np.repeat(np.arange(len(uniques)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    offsets = np.arange(lengths.sum()) - starts
+    dates = np.repeat(first, lengths) + offsets * np.timedelta64(1, "D")
+    dense = pd.DataFrame({key: uniques.take(group), "date": dates})
+    values = sums.reindex(pd.MultiIndex.from_arrays([dense[key], dense["date"]]), fill_value=0)
+    for m in MEASURES:
+        dense[m] = values[m].to_numpy()
+    dense["_group"] = group
+    dense["_offset"] = offsets
+    return dense
+
+def kpi_series(daily: pd.DataFrame, key: str = "channel", windows: Sequence[int] = WINDOWS) -> pd.DataFrame:
+    # Trailing-window KPIs per key and day from per-group cumulative sums:
+    # window sum = cumsum[t] - cumsum[t - w] (0 before the group's first day)
+    columns: List[str] = [key, "date"] + MEASURES + [f"{k}_{w}d" for w in windows for k in KPI_RATIOS]
+    if daily.empty:
+        return pd.DataFrame(columns=columns)
+    dense = _dense_calendar(daily, key)
+    offset = dense["_offset"].to_numpy()
+    idx = np.arange(len(dense))
+    cum = {m: dense.groupby("_group", sort=False)[m].cumsum().to_numpy(dtype=np.float64) for m in MEASURES}
+    for w in windows:
+        back = idx - w
+        has_back = offset >= w
+        window = {}
+        for m in MEASURES:
+            lagged = np.where(has_back, cum[m][np.maximum(back, 0)], 0.0)
+            window[m] = cum[m] - lagged
+        for k, (num, den) in KPI_RATIOS.items():
+            d = window[den]
+            dense[f"{k}_{w}d"] = np.divide(window[num], d, out=np.full(len(d), np.nan), where=d > 0)
+    return dense.drop(columns=["_group", "_offset"])[columns]
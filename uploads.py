@@ -0,0 +1,142 @@
+from __future__ import annotations
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Set, Tuple
+
+# Uploads are copied once to this directory (one sub-directory per session) and parsed from disk
+SPOOL_ROOT = os.environ.get("NOVARETAIL_SPOOL_DIR") or tempfile.gettempdir()
+SPOOL_CHUNK = 8 * 2**20
+
+class SpooledUpload(os.PathLike):
+    # A path pandas opens directly (os.PathLike) plus the content digest the caches are keyed on;
+    # `digest` equals cache.content_hash(data) so bytes and spooled sources share cache entries
+    def __init__(self, path: str, digest: str, size: int, name: str, ident: Tuple[Any, ...]):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.name = name
+        self.ident = ident
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"SpooledUpload({self.name!r}, {self.size} B, {self.digest[:12]})"
+
+def _digest(view: memoryview) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b"b%d:" % view.nbytes)
+    for start in range(0, view.nbytes, SPOOL_CHUNK):
+        h.update(view[start:start + SPOOL_CHUNK])
+    return h.hexdigest()
+
+def _ident(upload: Any, view: memoryview) -> Tuple[Any, ...]:
+    # Streamlit gives every upload its own file_id; other file objects are told apart by content
+    file_id = getattr(upload, "file_id", None)
+    return ("file_id", file_id) if file_id is not None else ("digest", _digest(view))
+
+def _spool(upload: Any, directory: str) -> SpooledUpload:
+    # Streamlit's UploadedFile is a BytesIO: getbuffer() exposes its bytes without a copy,
+    # written and hashed slice by slice
+    name = getattr(upload, "name", "upload")
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1], dir=directory)
+    with os.fdopen(fd, "wb") as out:
+        if hasattr(upload, "getbuffer"):
+            view = upload.getbuffer()
+        else:
+            view = memoryview(upload.read() if hasattr(upload, "read") else bytes(upload))
+        with view:
+            for start in range(0, view.nbytes, SPOOL_CHUNK):
+                out.write(view[start:start + SPOOL_CHUNK])
+            digest, size = _digest(view), view.nbytes
+    file_id = getattr(upload, "file_id", None)
+    return SpooledUpload(path, digest, size, name, ("file_id", file_id) if file_id is not None else ("digest", digest))
+
+# Spooled files a queued or running job still reads, with their hold count. A file (or a whole
+# session directory) replaced or closed meanwhile is only marked and removed on the last release.
+_held: Dict[str, int] = {}
+_doomed: Set[str] = set()
+_held_lock = threading.Lock()
+
+def _busy(path: str) -> bool:
+    return any(p == path or p.startswith(path + os.sep) for p in _held)
+
+def _delete(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _remove(path: str) -> None:
+    with _held_lock:
+        if _busy(path):
+            _doomed.add(path)
+            return
+    _delete(path)
+
+def hold(*files: Optional[SpooledUpload]) -> Callable[[], None]:
+    # Keeps the spooled files on disk until the returned release is called (once; later calls are no-ops)
+    paths = [os.fspath(f) for f in files if f is not None]
+    with _held_lock:
+        for path in paths:
+            _held[path] = _held.get(path, 0) + 1
+    released: List[bool] = []
+
+    def release() -> None:
+        with _held_lock:
+            if released:
+                return
+            released.append(True)
+            for path in paths:
+                _held[path] -= 1
+                if not _held[path]:
+                    del _held[path]
+            ready: List[str] = [p for p in _doomed if not _busy(p)]
+            _doomed.difference_update(ready)
+        for path in ready:
+            _delete(path)
+
+    return release
+
+class UploadSpool:
+    # One temporary directory per session. The finalizer removes it once the session state is
+    # garbage-collected (session closed), and at interpreter exit at the latest; files a job
+    # still holds (see hold) outlive it until that job releases them.
+    def __init__(self, root: str = SPOOL_ROOT):
+        os.makedirs(root, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix="novaretail-uploads-", dir=root)
+        self._files: Dict[str, SpooledUpload] = {}
+        self._finalizer = weakref.finalize(self, _remove, self.dir)
+
+    def spool(self, slot: str, upload: Any) -> SpooledUpload:
+        # Reruns with the same upload reuse the file; a new upload in the slot replaces it
+        current = self._files.get(slot)
+        if current is not None and hasattr(upload, "getbuffer"):
+            with upload.getbuffer() as view:
+                if current.ident == _ident(upload, view):
+                    return current
+        spooled = _spool(upload, self.dir)
+        self._files[slot] = spooled
+        if current is not None:
+            _remove(current.path)
+        return spooled
+
+    def used_bytes(self) -> int:
+        return sum(f.size for f in self._files.values())
+
+    def close(self) -> None:
+        self._finalizer()
+
+def spool_uploads(state: MutableMapping[str, Any], **uploads: Any) -> Tuple[Optional[SpooledUpload], ...]:
+    # Spooled files in keyword order; missing uploads stay None
+    spool = state.get("upload_spool")
+    if spool is None:
+        spool = state["upload_spool"] = UploadSpool()
+    return tuple(spool.spool(slot, u) if u is not None else None for slot, u in uploads.items())
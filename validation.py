@@ -0,0 +1,125 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_ROWS = 5
+
+RuleResult = Dict[str, object]
+
+@dataclass(frozen=True)
+class RowRule:
+    # Offending rows of one source: `mask(frame, raw)` over the normalized rows and the same
+    # rows as read, vectorized. Skipped when a column is missing from the source.
+    name: str
+    source: str
+    label: str
+    columns: Tuple[str, ...]
+    mask: Callable[[pd.DataFrame, pd.DataFrame], Union[pd.Series, np.ndarray]]
+
+@dataclass(frozen=True)
+class ReferenceRule:
+    # Distinct `key` values of `source` absent from `target_key` of `target` (set difference)
+    name: str
+    source: str
+    key: str
+    target: str
+    target_key: str
+    label: str
+
+Rule = Union[RowRule, ReferenceRule]
+
+def _samples(rows: pd.DataFrame) -> List[Dict[str, object]]:
+    # JSON-safe (the report is written as JSON): timestamps as ISO strings, NaN as null
+    return json.loads(rows.to_json(orient="records", date_format="iso"))
+
+def _distinct(values: pd.Series) -> np.ndarray:
+    # Categoricals through their codes: no per-row object array
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return values.cat.categories.to_numpy()[np.unique(codes[codes >= 0])]
+    return pd.unique(values.dropna().to_numpy())
+
+class ValidationAccumulator:
+    # Every rule of a source is evaluated in one pass over each frame or chunk added; key sets
+    # for the reference rules are collected in the same pass and compared in result()
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self._rows: Dict[str, Dict[str, object]] = {}
+        self._checked: Dict[str, int] = {}
+        self._keys: Dict[Tuple[str, str], List[np.ndarray]] = {}
+
+    def _key_columns(self, source: str) -> List[str]:
+        cols = {r.key for r in self.rules if isinstance(r, ReferenceRule) and r.source == source}
+        cols |= {r.target_key for r in self.rules if isinstance(r, ReferenceRule) and r.target == source}
+        return sorted(cols)
+
+    def add(self, source: str, frame: pd.DataFrame, raw: Optional[pd.DataFrame] = None) -> None:
+        raw = frame if raw is None else raw
+        self._checked[source] = self._checked.get(source, 0) + len(frame)
+        for rule in self.rules:
+            if not isinstance(rule, RowRule) or rule.source != source:
+                continue
+            if any(c not in frame.columns or c not in raw.columns for c in rule.columns):
+                continue
+            mask = np.asarray(rule.mask(frame, raw), dtype=bool)
+            acc = self._rows.setdefault(rule.name, {"count": 0, "samples": []})
+            acc["count"] += int(mask.sum())
+            missing = SAMPLE_ROWS - len(acc["samples"])
+            if missing > 0 and acc["count"]:
+                acc["samples"].extend(_samples(raw[mask].head(missing)))
+        for col in self._key_columns(source):
+            if col in frame.columns:
+                self._keys.setdefault((source, col), []).append(_distinct(frame[col]))
+
+    def merge(self, other: "ValidationAccumulator") -> None:
+        for name, acc in other._rows.items():
+            mine = self._rows.setdefault(name, {"count": 0, "samples": []})
+            mine["count"] += acc["count"]
+            mine["samples"] = (mine["samples"] + acc["samples"])[:SAMPLE_ROWS]
+        for source, n in other._checked.items():
+            self._checked[source] = self._checked.get(source, 0) + n
+        for key, parts in other._keys.items():
+            self._keys.setdefault(key, []).extend(parts)
+
+    def _key_set(self, source: str, column: str) -> np.ndarray:
+        parts = self._keys[(source, column)]
+        values = np.concatenate(parts) if parts else np.array([])
+        if values.dtype.kind not in "iuf":
+            return pd.unique(values)
+        # Numeric keys (lead ids): sorted distinct values, much cheaper than hashing millions of ids
+        values = np.sort(values)
+        return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+    def result(self) -> Dict[str, RuleResult]:
+        out: Dict[str, RuleResult] = {}
+        sets: Dict[Tuple[str, str], np.ndarray] = {}
+        for rule in self.rules:
+            if isinstance(rule, RowRule):
+                acc = self._rows.get(rule.name)
+                if acc is None:
+                    continue
+                out[rule.name] = {
+                    "source": rule.source, "label": rule.label, "count": acc["count"],
+                    "checked": self._checked.get(rule.source, 0), "samples": acc["samples"],
+                }
+            else:
+                if (rule.source, rule.key) not in self._keys or (rule.target, rule.target_key) not in self._keys:
+                    continue
+                for key in ((rule.source, rule.key), (rule.target, rule.target_key)):
+                    if key not in sets:
+                        sets[key] = self._key_set(*key)
+                keys, target = sets[(rule.source, rule.key)], sets[(rule.target, rule.target_key)]
+                if keys.dtype.kind in "iuf" and target.dtype.kind in "iuf":
+                    pos = np.minimum(np.searchsorted(target, keys), max(len(target) - 1, 0))
+                    offending = keys[~(target[pos] == keys)] if len(target) else keys
+                else:
+                    offending = keys[~pd.Index(keys).isin(target)]
+                out[rule.name] = {
+                    "source": rule.source, "label": rule.label, "count": len(offending),
+                    "checked": len(keys), "samples": _samples(pd.DataFrame({rule.key: offending[:SAMPLE_ROWS]})),
+                }
+        return out